@@ -0,0 +1,90 @@
+"""Control adaptativo de calidad: ajusta resolución, escala de rostros y salto de frames a la carga medida"""
+import collections
+import time
+
+# Del nivel de mayor calidad al más liviano
+NIVELES = (
+    {'imgsz': 640, 'escala_rostros': 0.5, 'paso': 1},
+    {'imgsz': 640, 'escala_rostros': 0.25, 'paso': 1},
+    {'imgsz': 512, 'escala_rostros': 0.25, 'paso': 1},
+    {'imgsz': 416, 'escala_rostros': 0.25, 'paso': 2},
+    {'imgsz': 320, 'escala_rostros': 0.2, 'paso': 3},
+)
+
+
+class ControladorAdaptativo:
+    """Mantiene el costo por frame dentro del presupuesto 1 / fps_objetivo.
+
+    registrar() recibe el tiempo de procesamiento de cada frame inferido y lo
+    reparte entre los `paso` frames del nivel; los frames que reutilizan
+    resultados (saltados o sin movimiento) no se registran, así una escena
+    quieta no hace creer que sobra margen. Con el promedio de las últimas
+    `ventana` muestras se baja un nivel si se excede el presupuesto y se sube
+    uno si sobra margen y el nivel superior no se midió ya por encima del
+    presupuesto (se vuelve a probar cada `reintento` segundos). Entre cambios
+    se espera `enfriamiento` segundos para no oscilar.
+    """
+
+    def __init__(self, fps_objetivo=30, niveles=NIVELES, nivel_inicial=1, ventana=20, margen=0.7,
+                 enfriamiento=2.0, reintento=30.0):
+        self.presupuesto = 1.0 / fps_objetivo
+        self.niveles = niveles
+        self.nivel = min(nivel_inicial, len(niveles) - 1)
+        self.margen = margen
+        self.enfriamiento = enfriamiento
+        self.reintento = reintento
+        self.costos = [None] * len(niveles)  # Último costo medio por frame (s) medido en cada nivel
+        self.cambios = 0
+        self._muestras = collections.deque(maxlen=ventana)
+        self._contador = 0
+        self._t_cambio = time.monotonic()
+
+    @property
+    def parametros(self):
+        return self.niveles[self.nivel]
+
+    def debe_inferir(self):
+        """True para uno de cada `paso` frames; el resto reutiliza los últimos resultados"""
+        self._contador += 1
+        return (self._contador - 1) % self.parametros['paso'] == 0
+
+    def registrar(self, segundos):
+        """Costo de un frame inferido; se amortiza sobre el salto de frames del nivel actual"""
+        self._muestras.append(segundos / self.parametros['paso'])
+        if len(self._muestras) < self._muestras.maxlen:
+            return
+        costo = sum(self._muestras) / len(self._muestras)
+        self.costos[self.nivel] = costo
+        ahora = time.monotonic()
+        if ahora - self._t_cambio < self.enfriamiento:
+            return
+
+        if costo > self.presupuesto and self.nivel < len(self.niveles) - 1:
+            self._cambiar(self.nivel + 1, ahora)
+        elif costo < self.presupuesto * self.margen and self.nivel > 0:
+            previsto = self.costos[self.nivel - 1]
+            if previsto is None or previsto < self.presupuesto or ahora - self._t_cambio > self.reintento:
+                self._cambiar(self.nivel - 1, ahora)
+
+    def _cambiar(self, nivel, ahora):
+        self.nivel = nivel
+        self._muestras.clear()
+        self._contador = 0
+        self._t_cambio = ahora
+        self.cambios += 1
+        p = self.parametros
+        print(f"⚙️ Nivel adaptativo {nivel}: imgsz {p['imgsz']}, rostros x{p['escala_rostros']}, "
+              f"1 de cada {p['paso']} frames")
+
+    def espera(self, t_inicio):
+        """Segundos que faltan para completar el presupuesto del frame iniciado en t_inicio (perf_counter)"""
+        return max(0.0, self.presupuesto - (time.perf_counter() - t_inicio))
+
+    def estadisticas(self):
+        return {
+            'nivel': self.nivel,
+            'parametros': dict(self.parametros),
+            'presupuesto_ms': round(self.presupuesto * 1000, 1),
+            'costo_ms': [round(c * 1000, 2) if c is not None else None for c in self.costos],
+            'cambios': self.cambios,
+        }
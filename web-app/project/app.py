@@ -3,181 +3,304 @@ import cv2
 import os
 import numpy as np
 from datetime import datetime
-from ultralytics import YOLO
-import face_recognition as fr
-from openpyxl import Workbook, load_workbook
+from urllib.parse import urlsplit
 from werkzeug.utils import secure_filename
 import threading
+import atexit
 import time
 import subprocess
 import platform
+from concurrent.futures import Future
+from pipeline import FramePipeline
+from broadcaster import FrameBroadcaster
+from streams import MultiStreamServer, parse_source
+from detections import Detecciones, CLASES_EPP, estilos_clases, dibujar_cajas
+from attendance import RegistroAsistencia
+from face_cache import CacheRostros
+from face_index import IndiceRostros
+from tracker import SeguidorPersonas
+from compliance import EvaluadorCumplimiento, mapa_violaciones
+from events import StatusHub
+from batch_jobs import GestorTrabajos
+from gating import FiltroMovimiento
+from result_cache import CacheResultados, ResultadoImagen, clave_contenido, huella_contenido
+from backends import crear_backend
+from metrics import Metricas
+from adaptive import ControladorAdaptativo
+from face_regions import localizar_y_codificar, localizar_y_codificar_en_personas
+from incidents import MotorIncidentes
+from detection_log import RegistroDetecciones
+from process_pool import PoolProcesos
+from snapshots import CanalSnapshots, CicloFuente
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['RESULTS_FOLDER'] = 'Resultados'
 app.config['PERSONAL_FOLDER'] = 'Personal'
+app.config['FACE_CACHE_FOLDER'] = 'cache_rostros'  # Codificaciones faciales persistidas
+app.config['FACE_TOLERANCE'] = 0.6  # Distancia máxima para aceptar una coincidencia
+app.config['FACE_INDEX_PARTITION_THRESHOLD'] = 2000  # Rostros a partir de los cuales se particiona el índice
+app.config['FACE_TRACKING'] = True  # Reconocer una vez por persona seguida en lugar de cada frame
+app.config['FACE_REVALIDATE_FRAMES'] = 150  # Frames entre revalidaciones de una identidad ya reconocida
+app.config['FACE_RETRY_FRAMES'] = 10  # Frames entre reintentos para personas aún sin identificar
+app.config['FACE_PERSON_REGIONS'] = True  # Buscar rostros solo en la parte superior de las cajas 'persona'
+app.config['FACE_REGION_TOP'] = 0.35  # Fracción superior de la caja 'persona' donde se busca el rostro
+app.config['FACE_REGION_HEIGHT'] = 256  # Alto (px) al que se lleva cada región antes de buscar rostros
+app.config['MOTION_GATING'] = True  # Reutilizar detecciones si la escena no cambió
+app.config['MOTION_MAX_INTERVAL'] = 2.0  # Segundos máximos sin inferir aunque la escena esté quieta
+app.config['MODEL_WEIGHTS'] = 'best6.pt'  # Pesos del modelo YOLO de EPP
+app.config['MODEL_BACKEND'] = 'ultralytics'  # 'ultralytics' (PyTorch), 'onnx' (ONNX Runtime) u 'openvino'
+app.config['MODEL_IMGSZ'] = 640  # Tamaño fijo de entrada del modelo
+app.config['MODEL_THREADS'] = None  # Hilos intra-op de inferencia (None = todos los núcleos)
+app.config['MODEL_PRECISION'] = 'fp32'  # 'fp32', 'fp16' (openvino) o 'int8' (onnx/openvino, calibrado)
+app.config['MODEL_EXPORT_FOLDER'] = 'modelos_exportados'  # Modelos exportados/cuantizados reutilizables
+app.config['MODEL_CALIBRATION_FOLDER'] = 'uploads'  # Imágenes para calibrar la cuantización INT8
+app.config['MODEL_WARMUP'] = 2  # Inferencias de calentamiento al iniciar
+app.config['DETECTION_CONF'] = 0.25  # Umbral de confianza de la detección EPP
+app.config['ADAPTIVE_CONTROL'] = True  # Ajustar resolución, escala de rostros y salto de frames a la carga
+app.config['TARGET_FPS'] = 30  # Presupuesto por frame del control adaptativo y de la cámara/video
+app.config['METRICS_OVERLAY'] = False  # Dibujar FPS y latencias por etapa sobre el video
+app.config['LAZY_LOADING'] = True  # Cargar modelo y galería en segundo plano: el servidor responde de inmediato
+app.config['RESULT_CACHE_MB'] = 64  # Tamaño máximo de la caché de resultados de imágenes subidas
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+app.config['PIPELINE_MODE'] = True  # Captura, inferencia y codificación en hilos separados
+app.config['MULTISTREAM_MAX_BATCH'] = 16  # Frames por llamada al modelo en modo multi-cámara
+app.config['MULTISTREAM_SOURCES'] = []  # Fuentes a abrir al iniciar (índices, archivos o URLs)
+app.config['MULTISTREAM_ALLOWED_URLS'] = []  # Orígenes aceptados por POST /streams (p. ej. 'rtsp://192.168.1.20:554')
+app.config['SSE_HEARTBEAT'] = 15  # Segundos sin cambios antes de enviar un latido por /events
+app.config['ASGI_SEND_TIMEOUT'] = 10.0  # Modo ASGI: segundos máximos esperando a un cliente antes de cortarlo
+app.config['ASGI_WSGI_WORKERS'] = 16  # Modo ASGI: hilos para las rutas Flask no streaming
+app.config['JOBS_FOLDER'] = os.path.join(app.config['RESULTS_FOLDER'], 'Trabajos')  # Salidas del análisis por lotes
+app.config['JOBS_INPUT_FOLDER'] = app.config['UPLOAD_FOLDER']  # Única carpeta de la que /jobs acepta rutas
+app.config['JOBS_PROCESSES'] = None  # Procesos del pool de análisis por lotes (None = núcleos - 1)
+app.config['PROCESS_POOL'] = False  # YOLO y rostros de cámara/video/multi-cámara en procesos (memoria compartida)
+app.config['PROCESS_POOL_WORKERS'] = None  # Procesos del pool de análisis en vivo (None = núcleos - 1)
+app.config['INCIDENTS'] = True  # Guardar clips de violaciones EPP persistentes (cámara, video y multi-cámara)
+app.config['INCIDENTS_FOLDER'] = os.path.join(app.config['RESULTS_FOLDER'], 'Incidentes')  # Clips e incidentes.jsonl
+app.config['INCIDENT_ELEMENTS'] = ('casco', 'chaleco')  # Violaciones ('sin ...') que generan incidentes
+app.config['INCIDENT_MIN_FRAMES'] = 15  # Frames consecutivos con la violación para confirmar un incidente
+app.config['INCIDENT_PRE_ROLL'] = 5.0  # Segundos guardados antes de la primera violación
+app.config['INCIDENT_POST_ROLL'] = 5.0  # Segundos guardados después de la última violación
+app.config['INCIDENT_MAX_SECONDS'] = 60.0  # Duración máxima de un clip
+app.config['INCIDENT_BUFFER_MB'] = 32  # Memoria máxima del búfer de frames recientes por stream
+app.config['DETECTION_LOG'] = True  # Registrar las detecciones de cada frame (cámara, video y multi-cámara)
+app.config['DETECTION_LOG_FOLDER'] = os.path.join(app.config['RESULTS_FOLDER'], 'Registro')  # Particiones por hora
 
 # Crear directorios si no existen
 for folder in [app.config['UPLOAD_FOLDER'], app.config['RESULTS_FOLDER'], app.config['PERSONAL_FOLDER']]:
     os.makedirs(folder, exist_ok=True)
 
+def estado_epp_vacio():
+    """Estado EPP sin detecciones (indicadores globales y registro por persona)"""
+    return {
+        'casco': False,
+        'gafas': False,
+        'chaleco': False,
+        'persona': False,
+        'guantes': False,
+        'safe': False,
+        'personas': [],
+        'no_conformes': 0
+    }
+
 # Variables globales para el estado de la aplicación
 class AppState:
+    """Estado compartido por el hilo de la fuente y los hilos de Flask.
+    
+    epp_status y detecciones se reemplazan completos en cada frame (nunca se
+    modifican en el lugar), así un lector siempre ve una versión consistente.
+    La fuente principal (captura, hilo y tipo) la maneja `fuente`.
+    """
     def __init__(self):
-        self.cap = None
+        self.lock = threading.Lock()  # Cambios de los interruptores desde las rutas
+        self.fuente = CicloFuente()
         self.detection_active = False
         self.recognition_active = False
-        self.current_source = None  # 'camera', 'image', 'video'
-        self.current_frame = None
-        self.epp_status = {
-            'casco': False,
-            'gafas': False,
-            'chaleco': False,
-            'persona': False,
-            'guantes': False,
-            'safe': False
-        }
-        self.camera_thread = None
-        self.camera_running = False
+        self.epp_status = estado_epp_vacio()
+        self.pipeline = None
+        self.detecciones = Detecciones.vacias()  # Última detección EPP (registro compacto)
+        self.marcas_rostros = []  # Últimas cajas/etiquetas de reconocimiento facial dibujadas
+        self.source_image = None  # Imagen subida actual (640x480), en memoria
+        self.source_hash = None  # sha1 de la imagen subida actual (para la caché de resultados)
+    
+    @property
+    def current_source(self):
+        return self.fuente.tipo  # 'camera', 'image', 'video' o None
 
 state = AppState()
+canal_frames = CanalSnapshots()  # Último frame publicado (FrameSnapshot inmutable)
+broadcaster = FrameBroadcaster(jpeg_quality=85)
+status_hub = StatusHub(heartbeat=app.config['SSE_HEARTBEAT'])
+metricas = Metricas()
 
-# Cargar modelo YOLO
-try:
-    model = YOLO('best6.pt')
-    print("✅ Modelo YOLO cargado correctamente")
-except Exception as e:
-    print(f"❌ Error cargando modelo YOLO: {e}")
-    model = None
-
-# Cargar imágenes y nombres para reconocimiento facial
-def load_face_recognition_data():
-    """Carga las imágenes y nombres del directorio Personal"""
-    images = []
-    nombres = []
-    
-    if not os.path.exists(app.config['PERSONAL_FOLDER']):
-        print("⚠️ Directorio Personal no encontrado")
-        return [], []
-    
-    lista_archivos = os.listdir(app.config['PERSONAL_FOLDER'])
+def cargar_modelo():
+    """Carga el detector con el backend configurado (si falla, vuelve a ultralytics) y lo calienta"""
+    backend = app.config['MODEL_BACKEND']
+    intentos = [(backend, app.config['MODEL_PRECISION'])]
+    if backend != 'ultralytics':
+        intentos.append(('ultralytics', 'fp32'))
     
-    for archivo in lista_archivos:
+    for tipo, precision in intentos:
         try:
-            img_path = os.path.join(app.config['PERSONAL_FOLDER'], archivo)
-            imgdb = cv2.imread(img_path)
-            if imgdb is not None:
-                images.append(imgdb)
-                nombres.append(os.path.splitext(archivo)[0])
+            detector = crear_backend(tipo, app.config['MODEL_WEIGHTS'],
+                                     imgsz=app.config['MODEL_IMGSZ'],
+                                     hilos=app.config['MODEL_THREADS'],
+                                     precision=precision,
+                                     carpeta=app.config['MODEL_EXPORT_FOLDER'],
+                                     calibracion=app.config['MODEL_CALIBRATION_FOLDER'])
+            if app.config['MODEL_WARMUP']:
+                detector.calentar(app.config['MODEL_WARMUP'])
+            print(f"✅ Modelo YOLO cargado correctamente ({tipo}, {precision}, "
+                  f"calentamiento {detector.ms_calentamiento} ms)")
+            return detector
         except Exception as e:
-            print(f"Error cargando {archivo}: {e}")
+            print(f"❌ Error cargando modelo YOLO con backend {tipo}: {e}")
+    return None
+
+# Modelo YOLO: se publica al terminar la carga en segundo plano (ver cargar_recursos)
+model = None
+modelo_id = app.config['MODEL_WEIGHTS']
+estilos_por_clase = {}
+evaluador_cumplimiento = None
+cache_resultados = CacheResultados(max_bytes=app.config['RESULT_CACHE_MB'] * 1024 * 1024)
+# Registros con hilo escritor y galería en disco: se crean en iniciar_servidor(), en la primera
+# petición o el primer frame si nadie lo llamó antes (flask run, gunicorn)
+motor_incidentes = None
+registro_detecciones = None
+registro_asistencia = None
+galeria = None
+pool_procesos = PoolProcesos(procesos=app.config['PROCESS_POOL_WORKERS'])
+
+# Galería de rostros para reconocimiento facial (caché persistente de codificaciones)
+def codificar_rostro(img):
+    """Codifica el primer rostro de una imagen de referencia (None si no hay rostro)"""
+    import face_recognition as fr
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    codificacion = fr.face_encodings(img_rgb)
+    return codificacion[0] if codificacion else None
+
+def crear_indice_rostros():
+    """Apila la galería actual en un índice de búsqueda vectorizada"""
+    return IndiceRostros(galeria.codificaciones, galeria.nombres,
+                         tolerancia=app.config['FACE_TOLERANCE'],
+                         umbral_particion=app.config['FACE_INDEX_PARTITION_THRESHOLD'])
+
+def recargar_galeria():
+    """Sincroniza la caché con Personal/ y publica el nuevo índice de una sola vez"""
+    global galeria_rostros
+    resumen = galeria.refrescar()
+    galeria_rostros = crear_indice_rostros()
+    resumen['particionado'] = galeria_rostros.particionado
+    print(f"✅ Galería de rostros: {resumen['rostros']} rostros "
+          f"({resumen['codificadas']} codificados, {resumen['reutilizadas']} desde caché) en {resumen['ms']} ms")
+    return resumen
+
+galeria_rostros = IndiceRostros([], [])  # Vacía hasta que termine la carga en segundo plano
+
+filtro_movimiento = FiltroMovimiento(intervalo_max=app.config['MOTION_MAX_INTERVAL'])
+controlador = ControladorAdaptativo(fps_objetivo=app.config['TARGET_FPS'])
+
+seguidor = SeguidorPersonas(revalidar_cada=app.config['FACE_REVALIDATE_FRAMES'],
+                            reintentar_cada=app.config['FACE_RETRY_FRAMES'])
+
+def parametros_rostros():
+    """(escala del frame completo, alto de las regiones por persona) según el control adaptativo"""
+    escala = controlador.parametros['escala_rostros'] if app.config['ADAPTIVE_CONTROL'] else 0.25
+    alto = app.config['FACE_REGION_HEIGHT']
+    if app.config['ADAPTIVE_CONTROL']:
+        alto = int(alto * min(1.0, escala / 0.25))
+    return escala, alto
+
+def rostros_en_pool(frame, cajas=None):
+    """Modo pool de procesos: ubica y codifica los rostros en un proceso y espera el resultado.
+    Con `cajas`, solo en la parte superior de esas personas"""
+    escala, alto = parametros_rostros()
+    resultado = pool_procesos.enviar(frame, rostros=True, por_personas=cajas is not None, cajas=cajas,
+                                     escala=escala, fraccion=app.config['FACE_REGION_TOP'], alto=alto).result()
+    metricas.observar('proceso', resultado['segundos'] * 1000)
+    metricas.contar('face_regions', resultado['regiones'])
+    return resultado['rostros']
+
+def localizar_rostros(frame):
+    """Ubica y codifica rostros a escala reducida; devuelve ubicaciones a escala completa"""
+    if pool_procesos.activo:
+        rostros = rostros_en_pool(frame)
+        return [ubicacion for _, ubicacion, _ in rostros], [codificacion for _, _, codificacion in rostros]
+    return localizar_y_codificar(frame, parametros_rostros()[0], medir=metricas.medir)
+
+def localizar_rostros_en_personas(frame, cajas):
+    """Ubica y codifica rostros solo en la parte superior de cada caja persona, a resolución completa.
     
-    print(f"✅ Cargadas {len(images)} imágenes para reconocimiento facial")
-    return images, nombres
+    Las regiones se reúnen en un mosaico para ubicar y codificar todos los rostros
+    en una sola pasada. Devuelve [(índice de caja, (top, right, bottom, left), codificación)]
+    con a lo sumo un rostro por caja.
+    """
+    if not len(cajas):
+        return []
+    if pool_procesos.activo:
+        return rostros_en_pool(frame, cajas)
+    rostros, regiones = localizar_y_codificar_en_personas(frame, cajas, app.config['FACE_REGION_TOP'],
+                                                          parametros_rostros()[1], medir=metricas.medir)
+    metricas.contar('face_regions', regiones)
+    return rostros
 
-images, nombres = load_face_recognition_data()
+def dibujar_marcas(frame, marcas):
+    """Dibuja las cajas y etiquetas de reconocimiento facial"""
+    with metricas.medir('dibujo'):
+        for (x1, y1, x2, y2), texto, color, color_texto, grosor in marcas:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, grosor)
+            cv2.putText(frame, texto, (x1 + 6, y2 - 6), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color_texto, 1)
+    return frame
 
-def codificar_rostros(images):
-    """Codifica los rostros de las imágenes de referencia"""
-    lista_codificaciones = []
-    for img in images:
-        try:
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            codificacion = fr.face_encodings(img_rgb)
-            if codificacion:
-                lista_codificaciones.append(codificacion[0])
-        except Exception as e:
-            print(f"Error codificando rostro: {e}")
-    return lista_codificaciones
-
-rostros_codificados = codificar_rostros(images)
-
-# Mapeo de clases del modelo
-class_mapping = {
-    'casco': 'Casco',
-    'sin casco': 'Sin Casco',
-    'chaleco': 'Chaleco',
-    'sin chaleco': 'Sin Chaleco',
-    'gafas': 'Gafas',
-    'sin gafas': 'Sin Gafas',
-    'guante': 'Guantes',
-    'persona': 'Persona'
-}
-
-def is_class_detected(results, class_id):
-    """Verifica si una clase específica fue detectada"""
-    for result in results:
-        if hasattr(result, 'boxes') and result.boxes:
-            for box in result.boxes:
-                if int(box.cls[0].item()) == class_id:
-                    return True
-    return False
-
-def realizar_reconocimiento(frame):
-    """Realiza reconocimiento facial en el frame"""
-    if not rostros_codificados or not nombres:
-        return frame
+def realizar_reconocimiento(frame, detecciones=None, rostros=None):
+    """Realiza reconocimiento facial en el frame; devuelve las marcas a dibujar
+    
+    Con detecciones de YOLO y FACE_PERSON_REGIONS activo, los rostros solo se buscan
+    dentro de las cajas 'persona'; sin ellas se recorre el frame completo a escala reducida.
+    `rostros` ([(índice, ubicación, codificación)]) viene ya calculado en el modo pool de procesos.
+    """
+    marcas = []
+    indice = galeria_rostros
+    if len(indice) == 0:
+        return marcas
     
     try:
-        frame_pequeño = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        frame_pequeño = cv2.cvtColor(frame_pequeño, cv2.COLOR_BGR2RGB)
+        if rostros is not None:
+            ubicaciones_rostros = [ubicacion for _, ubicacion, _ in rostros]
+            codificaciones_rostros = [codificacion for _, _, codificacion in rostros]
+        elif detecciones is not None and app.config['FACE_PERSON_REGIONS']:
+            cajas = detecciones.xyxy[detecciones.cls == CLASES_EPP['persona']]
+            rostros = localizar_rostros_en_personas(frame, cajas)
+            ubicaciones_rostros = [ubicacion for _, ubicacion, _ in rostros]
+            codificaciones_rostros = [codificacion for _, _, codificacion in rostros]
+        else:
+            ubicaciones_rostros, codificaciones_rostros = localizar_rostros(frame)
         
-        ubicaciones_rostros = fr.face_locations(frame_pequeño, model='hog')
-        codificaciones_rostros = fr.face_encodings(frame_pequeño, ubicaciones_rostros, num_jitters=1)
+        # Todos los rostros del frame contra toda la galería en una sola operación
+        coincidencias = indice.buscar(codificaciones_rostros)
         
-        for codificacion_rostro, ubicacion_rostro in zip(codificaciones_rostros, ubicaciones_rostros):
-            coincidencias = fr.compare_faces(rostros_codificados, codificacion_rostro, tolerance=0.6)
-            nombre = "Desconocido"
-            
-            if True in coincidencias:
-                indice_coincidencia = coincidencias.index(True)
-                nombre = nombres[indice_coincidencia]
+        for (nombre, distancia, _), ubicacion_rostro in zip(coincidencias, ubicaciones_rostros):
+            if nombre is None:
+                nombre = "Desconocido"
+            else:
                 registrar_horario(nombre)
             
-            # Dibujar rectángulo y nombre
+            # Rectángulo y nombre
             top, right, bottom, left = ubicacion_rostro
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
-            
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            cv2.putText(frame, nombre, (left + 6, bottom - 6), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+            marcas.append(((left, top, right, bottom), nombre, (0, 255, 0), (255, 255, 255), 2))
     
     except Exception as e:
+        metricas.contar('errors', stage='reconocimiento')
         print(f"Error en reconocimiento facial: {e}")
     
-    return frame
+    return marcas
 
 def registrar_horario(nombre):
-    """Registra la asistencia en el archivo Excel"""
-    archivo_excel = "Horario.xlsx"
-    
+    """Registra la asistencia (índice en memoria; el Excel se actualiza en segundo plano)"""
     try:
-        # Crear archivo si no existe
-        if not os.path.exists(archivo_excel):
-            wb = Workbook()
-            ws = wb.active
-            ws.append(["Nombre", "Fecha", "Hora"])
-            wb.save(archivo_excel)
-        
-        wb = load_workbook(archivo_excel)
-        ws = wb.active
-        fecha_actual = datetime.now().strftime('%Y-%m-%d')
-        
-        # Verificar si ya se registró hoy
-        for fila in ws.iter_rows(min_row=2, values_only=True):
-            if fila[0] == nombre and fila[1] == fecha_actual:
-                return  # Ya registrado hoy
-        
-        # Registrar nueva entrada
-        hora_actual = datetime.now().strftime('%H:%M:%S')
-        ws.append([nombre, fecha_actual, hora_actual])
-        wb.save(archivo_excel)
-        print(f"✅ Registrado: {nombre} - {fecha_actual} {hora_actual}")
-        
+        with metricas.medir('asistencia'):
+            registro_asistencia.registrar(nombre)
     except Exception as e:
         print(f"Error registrando horario: {e}")
 
@@ -186,101 +309,491 @@ def procesar_frame(frame):
     if frame is None:
         return frame
     
-    frame_copy = frame.copy()
+    frame_copy, detecciones = analizar_frame(frame)
+    return anotar_frame(frame_copy, detecciones)
+
+def reconocer_pistas(frame, detecciones):
+    """Sigue a las personas detectadas y solo codifica rostros de pistas nuevas o por revalidar.
+    Devuelve (marcas, pistas en el orden de las personas detectadas).
     
-    # Reconocimiento facial
+    En el modo pool de procesos los rostros de las pistas pendientes se codifican en un proceso
+    después de actualizar el seguimiento (ver rostros_en_pool).
+    """
+    marcas, pistas = [], None
+    try:
+        cajas = detecciones.xyxy[detecciones.cls == CLASES_EPP['persona']]
+        pistas = seguidor.actualizar(cajas)
+        pendientes = [p for p in pistas if seguidor.necesita_reconocimiento(p)]
+        indice = galeria_rostros
+        
+        if pendientes and len(indice) and app.config['FACE_PERSON_REGIONS']:
+            for pista in pendientes:
+                seguidor.marcar_intento(pista)
+            # Solo se recorren las cabezas de las pistas pendientes; cada rostro ya sabe a qué pista pertenece
+            rostros = localizar_rostros_en_personas(frame, [p.caja for p in pendientes])
+            coincidencias = indice.buscar([codificacion for _, _, codificacion in rostros])
+            for (nombre, distancia, _), (i, _, _) in zip(coincidencias, rostros):
+                if nombre is not None:
+                    seguidor.asignar_identidad(pendientes[i], nombre, distancia)
+                    registrar_horario(nombre)
+        
+        elif pendientes and len(indice):
+            for pista in pendientes:
+                seguidor.marcar_intento(pista)
+            ubicaciones_rostros, codificaciones_rostros = localizar_rostros(frame)
+            coincidencias = indice.buscar(codificaciones_rostros)
+            
+            for (nombre, distancia, _), (top, right, bottom, left) in zip(coincidencias, ubicaciones_rostros):
+                if nombre is None:
+                    continue
+                # Asignar el rostro a la pista pendiente más pequeña que contenga su centro
+                cx, cy = (left + right) / 2, (top + bottom) / 2
+                candidatas = [p for p in pendientes
+                              if p.caja[0] <= cx <= p.caja[2] and p.caja[1] <= cy <= p.caja[3]]
+                if candidatas:
+                    pista = min(candidatas, key=lambda p: (p.caja[2] - p.caja[0]) * (p.caja[3] - p.caja[1]))
+                    seguidor.asignar_identidad(pista, nombre, distancia)
+                    registrar_horario(nombre)
+        
+        # Id e identidad de cada persona seguida
+        for pista in pistas:
+            color = (0, 255, 0) if pista.nombre else (255, 255, 255)
+            marcas.append((tuple(map(int, pista.caja)), pista.etiqueta, color, color, 1))
+    
+    except Exception as e:
+        metricas.contar('errors', stage='reconocimiento')
+        print(f"Error en reconocimiento por seguimiento: {e}")
+    
+    return marcas, pistas
+
+def tareas_frame(frame):
+    """Qué hay que calcular para el frame: None si se reutilizan los resultados anteriores,
+    si no (detección YOLO, seguimiento, rostros por persona)"""
+    # Frame saltado por el control adaptativo o escena sin cambios
+    if (state.detection_active or state.recognition_active) and (
+            (app.config['ADAPTIVE_CONTROL'] and not controlador.debe_inferir()) or
+            (app.config['MOTION_GATING'] and not filtro_movimiento.necesita_inferencia(frame))):
+        return None
+    
+    # El seguimiento y la búsqueda de rostros por persona necesitan las cajas 'persona' de YOLO
+    # aunque la detección EPP esté apagada
+    seguimiento = state.recognition_active and app.config['FACE_TRACKING'] and model is not None
+    por_personas = state.recognition_active and app.config['FACE_PERSON_REGIONS'] and model is not None
+    deteccion = bool((state.detection_active or seguimiento or por_personas) and model)
+    return deteccion, seguimiento, por_personas
+
+def reutilizar_resultados(frame_copy):
+    """Frame sin inferencia: se dibujan las marcas y detecciones del último frame analizado.
+    No se informa al control adaptativo, que solo mide frames inferidos"""
     if state.recognition_active:
-        frame_copy = realizar_reconocimiento(frame_copy)
+        dibujar_marcas(frame_copy, state.marcas_rostros)
+    return frame_copy, state.detecciones if state.detection_active else None
+
+def analizar_frame(frame):
+    """Ejecuta reconocimiento facial e inferencia EPP; devuelve (frame, detecciones)"""
+    t_inicio = time.perf_counter()
+    frame_copy = frame.copy()
+    tareas = tareas_frame(frame)
+    if tareas is None:
+        return reutilizar_resultados(frame_copy)
     
-    # Detección EPP
-    if state.detection_active and model:
+    # Detección EPP (siempre antes del reconocimiento)
+    detecciones = None
+    if tareas[0]:
         try:
-            results = model(frame_copy, conf=0.25)
-            
-            # Actualizar estados EPP (solo 4 elementos)
-            state.epp_status['casco'] = is_class_detected(results, 0)
-            state.epp_status['chaleco'] = is_class_detected(results, 1)
-            state.epp_status['gafas'] = is_class_detected(results, 2)
-            state.epp_status['guantes'] = is_class_detected(results, 3)
-            state.epp_status['persona'] = is_class_detected(results, 4)
-            
-            # Calcular cumplimiento (sin incluir persona en el cálculo)
-            epp_count = sum([state.epp_status['casco'], state.epp_status['chaleco'], 
-                           state.epp_status['gafas'], state.epp_status['guantes']])
-            state.epp_status['safe'] = epp_count == 4
-            
-            # Dibujar detecciones
-            frame_copy = dibujar_detecciones(frame_copy, results)
-            
+            imgsz = controlador.parametros['imgsz'] if app.config['ADAPTIVE_CONTROL'] else None
+            with metricas.medir('yolo'):
+                detecciones = model.predict([frame_copy], conf=app.config['DETECTION_CONF'], imgsz=imgsz)[0]
         except Exception as e:
+            metricas.contar('errors', stage='yolo')
             print(f"Error en detección EPP: {e}")
     
-    return frame_copy
+    return completar_analisis(frame_copy, tareas, detecciones, None, t_inicio)
+
+def completar_analisis(frame_copy, tareas, detecciones, rostros, t_inicio, costo_externo=0.0):
+    """Parte del análisis que depende del estado compartido y va en orden de frames: estado EPP,
+    seguimiento, búsqueda en la galería y registro. `rostros` viene calculado o es None"""
+    iniciar_servidor()
+    seguimiento = tareas[1]
+    pistas = None
+    
+    if state.detection_active and detecciones is not None:
+        try:
+            state.detecciones = detecciones
+            state.epp_status = calcular_estado_epp(detecciones)
+            publicar_estado()
+        except Exception as e:
+            metricas.contar('errors', stage='estado_epp')
+            print(f"Error calculando estado EPP: {e}")
+    
+    # Reconocimiento facial
+    if state.recognition_active:
+        if seguimiento and detecciones is not None:
+            state.marcas_rostros, pistas = reconocer_pistas(frame_copy, detecciones)
+        else:
+            state.marcas_rostros = realizar_reconocimiento(frame_copy, detecciones, rostros)
+        dibujar_marcas(frame_copy, state.marcas_rostros)
+    
+    # Registro de detecciones (solo frames inferidos de cámara o video)
+    if (app.config['DETECTION_LOG'] and state.detection_active and detecciones is not None
+            and state.current_source in ('camera', 'video')):
+        registro_detecciones.agregar('principal', detecciones, state.epp_status['personas'], pistas)
+    
+    if app.config['ADAPTIVE_CONTROL']:
+        controlador.registrar(time.perf_counter() - t_inicio + costo_externo)
+    return frame_copy, detecciones if state.detection_active else None
+
+def despachar_frame(frame):
+    """Modo pool de procesos: decide qué calcular y envía el frame a un proceso (Future del resultado)"""
+    tareas = tareas_frame(frame)
+    if tareas is None:
+        futuro = Future()
+        futuro.set_result(None)
+        return futuro
+    deteccion, seguimiento, por_personas = tareas
+    escala, alto = parametros_rostros()
+    # Con seguimiento, los rostros se piden después de actualizar las pistas y solo para las pendientes
+    rostros = state.recognition_active and not seguimiento and len(galeria_rostros) > 0
+    return pool_procesos.enviar(
+        frame, deteccion=deteccion, rostros=rostros, por_personas=por_personas, conf=app.config['DETECTION_CONF'],
+        imgsz=controlador.parametros['imgsz'] if app.config['ADAPTIVE_CONTROL'] else None,
+        escala=escala, fraccion=app.config['FACE_REGION_TOP'], alto=alto, contexto=tareas)
+
+def completar_frame(frame, futuro):
+    """Modo pool de procesos: toma el resultado de un frame enviado (en orden de captura) y lo completa"""
+    t_inicio = time.perf_counter()
+    frame_copy = frame.copy()
+    try:
+        resultado = futuro.result()
+    except Exception as e:
+        metricas.contar('errors', stage='pool_procesos')
+        print(f"Error en proceso de análisis: {e}")
+        return frame_copy, None
+    if resultado is None:
+        return reutilizar_resultados(frame_copy)
+    
+    metricas.observar('proceso', resultado['segundos'] * 1000)
+    if resultado['regiones']:
+        metricas.contar('face_regions', resultado['regiones'])
+    # Costo por frame para el control adaptativo: el tiempo del proceso se reparte entre todos
+    return completar_analisis(frame_copy, resultado['contexto'], resultado['detecciones'], resultado['rostros'],
+                              t_inicio, resultado['segundos'] / pool_procesos.procesos)
+
+def calcular_estado_epp(detecciones):
+    """Calcula el diccionario de estado EPP a partir del registro de detecciones"""
+    nombres_epp = list(CLASES_EPP)
+    presentes = detecciones.presentes([CLASES_EPP[k] for k in nombres_epp])
+    estado = {k: bool(p) for k, p in zip(nombres_epp, presentes)}
+    
+    # Cumplimiento por persona: cada caja de EPP cuenta solo para quien la lleva
+    personas, no_conformes = [], 0
+    if evaluador_cumplimiento is not None:
+        personas, no_conformes = evaluador_cumplimiento.evaluar(detecciones)
+    estado['personas'] = personas
+    estado['no_conformes'] = no_conformes
+    
+    if personas:
+        estado['safe'] = no_conformes == 0
+    else:
+        # Sin personas detectadas: criterio global (sin incluir persona en el cálculo)
+        estado['safe'] = bool(presentes[:4].all())
+    return estado
+
+def conteos_por_clase(detecciones):
+    """{nombre de clase: cantidad de cajas} de las clases presentes"""
+    names = model.names if model else {}
+    if not names:
+        return {}
+    conteos = detecciones.conteos(len(names))
+    return {names[i]: int(n) for i, n in enumerate(conteos) if n}
 
-def dibujar_detecciones(frame, results):
+def publicar_estado():
+    """Empuja a /events el estado EPP y el resumen del frame (sin coordenadas de cajas)"""
+    epp_status = state.epp_status
+    estado = {k: v for k, v in epp_status.items() if k != 'personas'}
+    estado['total_personas'] = len(epp_status['personas'])
+    estado['conteos'] = conteos_por_clase(state.detecciones) if state.detection_active else {}
+    estado['detection_active'] = state.detection_active
+    status_hub.publicar(estado)
+
+def anotar_frame(frame, detecciones):
+    """Dibuja las detecciones EPP (si las hay) y, opcionalmente, las métricas sobre el frame"""
+    if detecciones is not None:
+        frame = dibujar_detecciones(frame, detecciones)
+    if app.config['METRICS_OVERLAY']:
+        metricas.dibujar(frame)
+    return frame
+
+def resultado_imagen_fuente(clave):
+    """Entrada de caché de la imagen subida actual; el modelo solo corre en el primer acceso"""
+    if not model:
+        return ResultadoImagen(Detecciones.vacias())  # Modelo aún cargando: no se cachea
+    entrada = cache_resultados.obtener(clave)
+    if entrada is None:
+        with metricas.medir('yolo'):
+            detecciones = model.predict([state.source_image], conf=app.config['DETECTION_CONF'])[0]
+        entrada = cache_resultados.guardar(clave, detecciones)
+    return entrada
+
+def procesar_imagen_fuente():
+    """Publica la imagen subida con los overlays activos reutilizando detecciones y JPEG en caché"""
+    if not state.detection_active and not state.recognition_active:
+        publicar_frame(state.source_image.copy())
+        return
+    
+    detecciones = personas = None
+    if state.detection_active or (state.recognition_active and app.config['FACE_PERSON_REGIONS'] and model):
+        clave = clave_contenido(state.source_hash, modelo_id, app.config['DETECTION_CONF'])
+        entrada = resultado_imagen_fuente(clave)
+        personas = entrada.detecciones if model is not None else None
+    
+    if state.detection_active:
+        detecciones = entrada.detecciones
+        state.detecciones = detecciones
+        state.epp_status = calcular_estado_epp(detecciones)
+        publicar_estado()
+        
+        # Sin reconocimiento el resultado es determinista: se sirve el JPEG ya codificado
+        if not state.recognition_active:
+            jpeg = entrada.jpegs.get('deteccion')
+            if jpeg is not None:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            else:
+                frame = anotar_frame(state.source_image.copy(), detecciones)
+                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, broadcaster.jpeg_quality])
+                jpeg = buffer.tobytes() if ret else None
+                if jpeg is not None:
+                    cache_resultados.guardar_jpeg(clave, 'deteccion', jpeg)
+            publicar_frame(frame, jpeg)
+            return
+    
+    # El reconocimiento facial registra asistencia, por lo que siempre se ejecuta
+    frame = state.source_image.copy()
+    state.marcas_rostros = realizar_reconocimiento(frame, personas)
+    dibujar_marcas(frame, state.marcas_rostros)
+    publicar_frame(anotar_frame(frame, detecciones))
+
+def dibujar_detecciones(frame, detecciones):
     """Dibuja las cajas de detección en el frame"""
     try:
-        for result in results:
-            if hasattr(result, 'boxes') and result.boxes:
-                for box in result.boxes:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                    class_id = int(box.cls[0].item())
-                    confidence = box.conf[0].item()
-                    
-                    if class_id < len(model.names):
-                        class_name = model.names[class_id]
-                        label = class_mapping.get(class_name, "Desconocido")
-                        
-                        # Color según el tipo de detección
-                        if 'sin' in class_name.lower():
-                            color = (0, 0, 255)  # Rojo para elementos faltantes
-                        else:
-                            color = (0, 255, 0)  # Verde para elementos detectados
-                        
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        cv2.putText(frame, f"{label} ({confidence:.2f})", 
-                                   (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        with metricas.medir('dibujo'):
+            dibujar_cajas(frame, detecciones, estilos_por_clase)
     except Exception as e:
         print(f"Error dibujando detecciones: {e}")
     
     return frame
 
-def camera_worker():
-    """Hilo para manejar la cámara"""
-    while state.camera_running and state.cap and state.cap.isOpened():
+def publicar_frame(frame, jpeg=None, detecciones=None):
+    """Publica el frame procesado (y su JPEG si ya fue codificado)
+    
+    En cámara y video el mismo JPEG pasa al búfer de incidentes junto con las detecciones del frame.
+    """
+    iniciar_servidor()
+    if frame is not None:
+        metricas.frame()
+        if jpeg is None:
+            with metricas.medir('jpeg'):
+                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, broadcaster.jpeg_quality])
+            jpeg = buffer.tobytes() if ret else None
+        if app.config['INCIDENTS'] and state.current_source in ('camera', 'video'):
+            motor_incidentes.observar('principal', jpeg, detecciones)
+    canal_frames.publicar(state.current_source, frame, jpeg, detecciones, state.epp_status)
+    broadcaster.publish(frame, jpeg)
+
+def capturar_frame_fuente(cap):
+    """Lee y redimensiona el siguiente frame de la captura (None al terminar)"""
+    if cap is None or not cap.isOpened():
+        return None
+    with metricas.medir('captura'):
+        ret, frame = cap.read()
+    if not ret:
+        return None
+    with metricas.medir('redimension'):
+        return cv2.resize(frame, (640, 480))
+
+def camera_worker(cap, parar):
+    """Hilo de la cámara o video: procesa su propia captura hasta que se active `parar`"""
+    if app.config['PIPELINE_MODE']:
+        fps_fuente = None
+        if state.current_source == 'video':
+            fps_fuente = cap.get(cv2.CAP_PROP_FPS) or 30
+        state.pipeline = FramePipeline(
+            capturar=lambda: capturar_frame_fuente(cap),
+            inferir=analizar_frame,
+            anotar=anotar_frame,
+            publicar=lambda frame, jpeg, paquete: publicar_frame(frame, jpeg, paquete.inferencia),
+            keep_running=lambda: not parar.is_set(),
+            fps_fuente=fps_fuente,
+            despachar=despachar_frame if pool_procesos.activo else None,
+            completar=completar_frame,
+            en_vuelo=pool_procesos.n_ranuras
+        )
+        state.pipeline.run()
+        return
+    
+    while not parar.is_set() and cap.isOpened():
+        t_inicio = time.perf_counter()
         try:
-            ret, frame = state.cap.read()
+            ret, frame = cap.read()
             if ret:
                 # Redimensionar frame para mejor performance
                 frame = cv2.resize(frame, (640, 480))
-                state.current_frame = procesar_frame(frame)
+                frame, detecciones = analizar_frame(frame)
+                publicar_frame(anotar_frame(frame, detecciones), detecciones=detecciones)
             else:
                 break
         except Exception as e:
+            metricas.contar('errors', stage='camera_worker')
             print(f"Error en camera_worker: {e}")
             break
         
-        time.sleep(0.033)  # ~30 FPS
+        parar.wait(controlador.espera(t_inicio))  # Lo que falta del presupuesto del frame; despierta al detener
 
 def generate_frames():
-    """Generador de frames para el stream de video"""
-    while True:
-        if state.current_frame is not None:
-            try:
-                # Codificar frame como JPEG
-                ret, buffer = cv2.imencode('.jpg', state.current_frame, 
-                                         [cv2.IMWRITE_JPEG_QUALITY, 85])
-                if ret:
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            except Exception as e:
-                print(f"Error generando frame: {e}")
-        
-        time.sleep(0.033)  # ~30 FPS
+    """Generador de frames para el stream de video (JPEG compartido entre clientes)"""
+    return broadcaster.frames()
+
+def inferir_lote(frames):
+    """Una sola llamada al modelo para los frames de todas las cámaras (un resultado por frame)"""
+    with metricas.medir('yolo_lote', stream='multi'):
+        if pool_procesos.activo and pool_procesos.con_modelo:
+            # Un frame por proceso; los resultados vuelven en el orden de las cámaras
+            return [r['detecciones'] for r in pool_procesos.mapear(frames, deteccion=True,
+                                                                   conf=app.config['DETECTION_CONF'])]
+        return model.predict(frames, conf=app.config['DETECTION_CONF'])
+
+multistream = MultiStreamServer(
+    infer_batch=inferir_lote,
+    annotate=dibujar_detecciones,
+    estado=calcular_estado_epp,
+    max_batch=app.config['MULTISTREAM_MAX_BATCH'],
+    observar=lambda stream_id, jpeg, detecciones: observar_stream(stream_id, jpeg, detecciones)
+)
+
+def observar_stream(stream_id, jpeg, detecciones):
+    """Incidentes y registro de detecciones de un frame publicado por una cámara multi-stream"""
+    iniciar_servidor()
+    if app.config['INCIDENTS']:
+        motor_incidentes.observar(stream_id, jpeg, detecciones)
+    stream = multistream.get(stream_id)
+    if app.config['DETECTION_LOG'] and detecciones is not None and stream is not None:
+        registro_detecciones.agregar(stream_id, detecciones, stream.epp_status.get('personas', []))
+
+gestor_trabajos = GestorTrabajos(app.config['MODEL_WEIGHTS'], app.config['JOBS_FOLDER'],
+                                 procesos=app.config['JOBS_PROCESSES'], conf=app.config['DETECTION_CONF'],
+                                 backend=app.config['MODEL_BACKEND'],
+                                 imgsz=app.config['MODEL_IMGSZ'],
+                                 precision=app.config['MODEL_PRECISION'],
+                                 carpeta_modelos=app.config['MODEL_EXPORT_FOLDER'],
+                                 calibracion=app.config['MODEL_CALIBRATION_FOLDER'])
+
+# ====== CARGA DIFERIDA ======
+
+inicio_servidor = time.monotonic()
+carga = {'modelo': 'pendiente', 'galeria': 'pendiente'}  # pendiente / cargando / listo / error
+carga_ms = {}
+carga_errores = {}
+recursos_listos = {'modelo': threading.Event(), 'galeria': threading.Event()}
+
+def activar_modelo():
+    """Carga el detector y publica todo lo que depende de sus clases"""
+    global model, modelo_id, estilos_por_clase, evaluador_cumplimiento
+    detector = cargar_modelo()
+    if detector is None:
+        raise RuntimeError('Modelo YOLO no disponible')
+    estilos_por_clase = estilos_clases(detector.names)
+    evaluador_cumplimiento = EvaluadorCumplimiento(detector.names)
+    modelo_id = detector.id
+    gestor_trabajos.backend = (detector.tipo, detector.imgsz, detector.precision, app.config['MODEL_EXPORT_FOLDER'],
+                               app.config['MODEL_CALIBRATION_FOLDER'])
+    motor_incidentes.fijar_clases({clase: elemento for clase, elemento in mapa_violaciones(detector.names).items()
+                                   if elemento in app.config['INCIDENT_ELEMENTS']})
+    model = detector  # Al final: quien vea model ya encuentra estilos y evaluador listos
+    if app.config['PROCESS_POOL']:
+        try:
+            pool_procesos.iniciar(app.config['MODEL_WEIGHTS'], gestor_trabajos.backend)
+        except Exception as e:
+            print(f"❌ Error iniciando pool de procesos (se analiza en hilos): {e}")
+
+def cargar_recurso(nombre, funcion):
+    """Ejecuta la carga de un recurso registrando estado, duración y error"""
+    carga[nombre] = 'cargando'
+    t0 = time.monotonic()
+    try:
+        funcion()
+        carga[nombre] = 'listo'
+    except Exception as e:
+        carga[nombre] = 'error'
+        carga_errores[nombre] = str(e)
+        print(f"❌ Error cargando {nombre}: {e}")
+    carga_ms[nombre] = round((time.monotonic() - t0) * 1000)
+    recursos_listos[nombre].set()
+
+def cargar_recursos():
+    """Carga modelo y galería; con LAZY_LOADING en hilos para no retrasar el arranque del servidor"""
+    tareas = [('modelo', activar_modelo), ('galeria', recargar_galeria)]
+    if not app.config['LAZY_LOADING']:
+        for nombre, funcion in tareas:
+            cargar_recurso(nombre, funcion)
+        return
+    for nombre, funcion in tareas:
+        threading.Thread(target=cargar_recurso, args=(nombre, funcion), daemon=True).start()
+
+def iniciar_servidor():
+    """Crea los registros (con sus hilos), la galería y la limpieza al cerrar, y lanza la carga de recursos.
+    
+    Se llama solo desde el proceso del servidor: python app.py y asgi.py lo
+    hacen al arrancar, y con flask run o gunicorn lo dispara la primera
+    petición o el primer frame. Nunca al importar: los procesos 'spawn' de
+    los pools vuelven a importar este módulo como __mp_main__ y no deben
+    repetir nada de esto. Es idempotente.
+    """
+    global servidor_iniciado
+    if servidor_iniciado:
+        return
+    with lock_inicio:
+        if servidor_iniciado:
+            return
+        crear_registros()
+        servidor_iniciado = True  # Al final: quien lo vea ya encuentra los registros creados
+    atexit.register(cleanup)
+    cargar_recursos()
+
+def crear_registros():
+    """Registros de incidentes, detecciones y asistencia y la galería de rostros"""
+    global motor_incidentes, registro_detecciones, registro_asistencia, galeria
+    motor_incidentes = MotorIncidentes(app.config['INCIDENTS_FOLDER'],
+                                       frames_min=app.config['INCIDENT_MIN_FRAMES'],
+                                       pre_roll=app.config['INCIDENT_PRE_ROLL'],
+                                       post_roll=app.config['INCIDENT_POST_ROLL'],
+                                       duracion_max=app.config['INCIDENT_MAX_SECONDS'],
+                                       max_bytes=app.config['INCIDENT_BUFFER_MB'] * 1024 * 1024)
+    registro_detecciones = RegistroDetecciones(app.config['DETECTION_LOG_FOLDER'])
+    registro_asistencia = RegistroAsistencia("Horario.xlsx")
+    galeria = CacheRostros(app.config['PERSONAL_FOLDER'], app.config['FACE_CACHE_FOLDER'],
+                           codificar=codificar_rostro)
+
+servidor_iniciado = False
+lock_inicio = threading.Lock()
+
+def abrir_streams_configurados():
+    """Abre las cámaras de MULTISTREAM_SOURCES en cuanto el modelo esté listo (en un hilo)"""
+    def abrir():
+        recursos_listos['modelo'].wait()
+        if model:
+            for source in app.config['MULTISTREAM_SOURCES']:
+                stream_id = multistream.add_stream(source)
+                print(f"📹 Stream {stream_id}: {source}" if stream_id else f"⚠️ No se pudo abrir {source}")
+    
+    threading.Thread(target=abrir, daemon=True).start()
 
 # ====== RUTAS FLASK ======
 
+@app.before_request
+def iniciar_en_primera_peticion():
+    """Con flask run o gunicorn nadie llama a iniciar_servidor(): lo hace la primera petición"""
+    iniciar_servidor()
+
 @app.route('/')
 def index():
     """Página principal"""
@@ -292,6 +805,96 @@ def video_feed():
     return Response(generate_frames(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/video_feed/<stream_id>')
+def video_feed_stream(stream_id):
+    """Stream de video de una cámara del modo multi-cámara"""
+    stream = multistream.get(stream_id)
+    if stream is None:
+        return jsonify({'success': False, 'error': 'Stream no encontrado'}), 404
+    return Response(stream.broadcaster.frames(),
+                   mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/streams', methods=['GET'])
+def list_streams():
+    """Estado de todas las cámaras y de la inferencia por lotes"""
+    return jsonify(multistream.status())
+
+def ruta_permitida(ruta, carpetas=('JOBS_INPUT_FOLDER',)):
+    """Ruta real de un archivo o carpeta pedido por un cliente; None si queda fuera de las carpetas dadas"""
+    ruta = os.path.realpath(str(ruta))
+    for clave in carpetas:
+        base = os.path.realpath(app.config[clave])
+        if os.path.commonpath([base, ruta]) == base:
+            return ruta
+    return None
+
+def origen_url(url):
+    """(esquema, host, puerto) de una URL, sin usuario ni contraseña"""
+    partes = urlsplit(url)
+    return partes.scheme.lower(), (partes.hostname or '').lower(), partes.port
+
+def fuente_permitida(source):
+    """Fuente pedida a POST /streams ya validada; None si no se acepta.
+    
+    Índices de cámara local siempre; URLs solo de los orígenes de MULTISTREAM_ALLOWED_URLS;
+    archivos solo dentro de UPLOAD_FOLDER o JOBS_INPUT_FOLDER.
+    """
+    source = parse_source(source)
+    if isinstance(source, int):
+        return source
+    if '://' in source:
+        try:
+            permitidos = {origen_url(url) for url in app.config['MULTISTREAM_ALLOWED_URLS']}
+            return source if origen_url(source) in permitidos else None
+        except ValueError:
+            return None
+    return ruta_permitida(source, ('UPLOAD_FOLDER', 'JOBS_INPUT_FOLDER'))
+
+@app.route('/streams', methods=['POST'])
+def add_stream():
+    """Agregar una fuente: índice de cámara, ruta de archivo o URL (rtsp://...)"""
+    try:
+        if model is None:
+            return jsonify({'success': False, 'error': 'Modelo YOLO no disponible'})
+        
+        data = request.get_json(silent=True) or request.form
+        source = data.get('source')
+        if source is None or str(source).strip() == '':
+            return jsonify({'success': False, 'error': 'No source provided'})
+        
+        source = fuente_permitida(source)
+        if source is None:
+            return jsonify({'success': False, 'error': 'Fuente no permitida'}), 400
+        
+        loop = str(data.get('loop', '')).lower() in ('1', 'true', 'yes')
+        stream_id = multistream.add_stream(source, stream_id=data.get('id'), loop=loop)
+        if stream_id is None:
+            return jsonify({'success': False, 'error': 'No se pudo abrir la fuente'})
+        
+        print(f"✅ Stream {stream_id} agregado: {source}")
+        return jsonify({'success': True, 'id': stream_id, 'url': f'/video_feed/{stream_id}'})
+        
+    except Exception as e:
+        print(f"Error adding stream: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/streams/<stream_id>', methods=['GET'])
+def stream_status(stream_id):
+    """Estado EPP y FPS de una cámara"""
+    stream = multistream.get(stream_id)
+    if stream is None:
+        return jsonify({'success': False, 'error': 'Stream no encontrado'}), 404
+    return jsonify(stream.status())
+
+@app.route('/streams/<stream_id>', methods=['DELETE'])
+def remove_stream(stream_id):
+    """Detener y quitar una cámara"""
+    if not multistream.remove_stream(stream_id):
+        return jsonify({'success': False, 'error': 'Stream no encontrado'}), 404
+    motor_incidentes.cerrar_activos(stream_id)
+    print(f"✅ Stream {stream_id} detenido")
+    return jsonify({'success': True})
+
 @app.route('/upload_file', methods=['POST'])
 def upload_file():
     """Subir archivo de imagen o video"""
@@ -310,37 +913,35 @@ def upload_file():
         # Determinar tipo de archivo
         file_type = 'image' if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')) else 'video'
         
-        # Limpiar estado anterior
-        state.camera_running = False
-        if state.camera_thread and state.camera_thread.is_alive():
-            state.camera_thread.join(timeout=1)
-        
-        if state.cap:
-            state.cap.release()
-            state.cap = None
-        
-        if file_type == 'image':
-            # Cargar imagen
-            img = cv2.imread(filepath)
-            if img is not None:
-                img = cv2.resize(img, (640, 480))
-                state.current_frame = procesar_frame(img)
-                state.current_source = 'image'
+        with state.fuente.lock:
+            # Limpiar estado anterior
+            state.fuente.detener()
+            motor_incidentes.cerrar_activos('principal')
+            seguidor.reiniciar()
+            filtro_movimiento.reiniciar()
+            state.source_image = None
+            state.source_hash = None
+            
+            if file_type == 'image':
+                # Cargar imagen (se conserva en memoria; sus resultados se cachean por contenido)
+                with open(filepath, 'rb') as f:
+                    datos = f.read()
+                img = cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    return jsonify({'success': False, 'error': 'Invalid image file'})
+                state.source_image = cv2.resize(img, (640, 480))
+                state.source_hash = huella_contenido(datos)
+                state.fuente.iniciar('image')
+                procesar_imagen_fuente()
                 print(f"✅ Imagen cargada: {filename}")
             else:
-                return jsonify({'success': False, 'error': 'Invalid image file'})
-        else:
-            # Cargar video
-            state.cap = cv2.VideoCapture(filepath)
-            if state.cap.isOpened():
-                state.current_source = 'video'
-                state.camera_running = True
-                state.camera_thread = threading.Thread(target=camera_worker)
-                state.camera_thread.daemon = True
-                state.camera_thread.start()
+                # Cargar video
+                cap = cv2.VideoCapture(filepath)
+                if not cap.isOpened():
+                    cap.release()
+                    return jsonify({'success': False, 'error': 'Invalid video file'})
+                state.fuente.iniciar('video', cap, camera_worker)
                 print(f"✅ Video cargado: {filename}")
-            else:
-                return jsonify({'success': False, 'error': 'Invalid video file'})
         
         return jsonify({
             'success': True, 
@@ -353,6 +954,66 @@ def upload_file():
         print(f"Error uploading file: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Enviar video(s) grabados a análisis por lotes (archivo subido, ruta o carpeta)"""
+    try:
+        data = request.get_json(silent=True) or request.form
+        rutas = request.form.getlist('paths') if data is request.form else data.get('paths') or []
+        rutas = [rutas] if isinstance(rutas, str) else list(rutas)
+        if data.get('path'):
+            rutas.append(data['path'])
+        if data.get('filename'):
+            rutas.append(os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(data['filename'])))
+        if not rutas:
+            return jsonify({'success': False, 'error': 'No video provided'})
+        
+        # Solo archivos y carpetas dentro de JOBS_INPUT_FOLDER (nada del resto del servidor)
+        permitidas = [ruta_permitida(ruta) for ruta in rutas]
+        if None in permitidas:
+            return jsonify({'success': False, 'error': 'Ruta fuera de JOBS_INPUT_FOLDER'}), 400
+        rutas = permitidas
+        
+        trabajo = gestor_trabajos.enviar(
+            rutas,
+            paso=data.get('stride', 1),
+            lote=data.get('batch', 8),
+            segundos_trozo=data.get('chunk_seconds', 60),
+            anotar=str(data.get('annotate', 'true')).lower() in ('1', 'true', 'yes')
+        )
+        print(f"✅ Trabajo {trabajo.id} enviado: {len(trabajo.rutas)} video(s)")
+        return jsonify({'success': True, 'id': trabajo.id, 'videos': trabajo.rutas})
+        
+    except Exception as e:
+        print(f"Error submitting job: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Progreso de todos los trabajos"""
+    return jsonify(gestor_trabajos.listar())
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Progreso y archivos de salida de un trabajo"""
+    trabajo = gestor_trabajos.obtener(job_id)
+    if trabajo is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify(trabajo.to_dict())
+
+@app.route('/jobs/<job_id>/timeline')
+def job_timeline(job_id):
+    """Línea de tiempo de cumplimiento por segundo de un video del trabajo (?video=0)"""
+    trabajo = gestor_trabajos.obtener(job_id)
+    if trabajo is None or trabajo.estado != 'terminado':
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado o sin terminar'}), 404
+    try:
+        ruta = trabajo.rutas[int(request.args.get('video', 0))]
+        with open(trabajo.resultados[ruta]['timeline'], encoding='utf-8') as f:
+            return Response(f.read(), mimetype='application/json')
+    except (IndexError, KeyError, ValueError):
+        return jsonify({'success': False, 'error': 'Video no encontrado en el trabajo'}), 404
+
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
     """Servir archivos subidos"""
@@ -367,34 +1028,31 @@ def uploaded_file(filename):
 def start_camera():
     """Activar cámara"""
     try:
-        # Limpiar estado anterior
-        if state.cap:
-            state.cap.release()
-            state.cap = None
-        
-        # Intentar abrir cámara (probar índices 0, 1, 2)
-        for camera_index in [0, 1, 2]:
-            state.cap = cv2.VideoCapture(camera_index)
-            if state.cap.isOpened():
-                # Configurar cámara
-                state.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                state.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                state.cap.set(cv2.CAP_PROP_FPS, 30)
-                
-                state.current_source = 'camera'
-                state.camera_running = True
-                
-                # Iniciar hilo de cámara
-                if state.camera_thread and state.camera_thread.is_alive():
-                    state.camera_running = False
-                    state.camera_thread.join()
-                
-                state.camera_thread = threading.Thread(target=camera_worker)
-                state.camera_thread.daemon = True
-                state.camera_thread.start()
-                
-                print(f"✅ Cámara activada en índice {camera_index}")
-                return jsonify({'success': True, 'camera_index': camera_index})
+        with state.fuente.lock:
+            # Limpiar estado anterior (libera la cámara antes de volver a abrirla)
+            state.fuente.detener()
+            motor_incidentes.cerrar_activos('principal')
+            seguidor.reiniciar()
+            filtro_movimiento.reiniciar()
+            state.source_image = None
+            state.source_hash = None
+            
+            # Intentar abrir cámara (probar índices 0, 1, 2)
+            for camera_index in [0, 1, 2]:
+                cap = cv2.VideoCapture(camera_index)
+                if cap.isOpened():
+                    # Configurar cámara
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                    cap.set(cv2.CAP_PROP_FPS, 30)
+                    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Evitar frames atrasados en el buffer
+                    
+                    # Iniciar hilo de cámara
+                    state.fuente.iniciar('camera', cap, camera_worker)
+                    
+                    print(f"✅ Cámara activada en índice {camera_index}")
+                    return jsonify({'success': True, 'camera_index': camera_index})
+                cap.release()
         
         return jsonify({'success': False, 'error': 'No se pudo acceder a ninguna cámara'})
         
@@ -406,17 +1064,12 @@ def start_camera():
 def stop_camera():
     """Desactivar cámara"""
     try:
-        state.camera_running = False
-        
-        if state.camera_thread and state.camera_thread.is_alive():
-            state.camera_thread.join(timeout=2)
-        
-        if state.cap:
-            state.cap.release()
-            state.cap = None
-        
-        state.current_source = None
-        state.current_frame = None
+        with state.fuente.lock:
+            state.fuente.detener()
+            state.source_image = None
+            state.source_hash = None
+            publicar_frame(None)
+            motor_incidentes.cerrar_activos('principal')
         
         print("✅ Cámara desactivada")
         return jsonify({'success': True})
@@ -429,26 +1082,20 @@ def stop_camera():
 def toggle_detection():
     """Activar/desactivar detección EPP"""
     try:
-        state.detection_active = not state.detection_active
+        with state.lock:
+            state.detection_active = not state.detection_active
+            filtro_movimiento.reiniciar()
+            
+            # Si se desactiva, resetear estados EPP
+            if not state.detection_active:
+                state.epp_status = estado_epp_vacio()
+                state.detecciones = Detecciones.vacias()
         
-        # Si se desactiva, resetear estados EPP
-        if not state.detection_active:
-            state.epp_status = {key: False for key in state.epp_status}
-        else:
-            # Si se activa y hay una imagen cargada, reprocesar
-            if state.current_source == 'image' and state.current_frame is not None:
-                # Recargar y procesar la imagen original
-                upload_folder = app.config['UPLOAD_FOLDER']
-                image_files = [f for f in os.listdir(upload_folder) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
-                if image_files:
-                    # Tomar la imagen más reciente
-                    latest_image = max(image_files, key=lambda x: os.path.getctime(os.path.join(upload_folder, x)))
-                    img_path = os.path.join(upload_folder, latest_image)
-                    img = cv2.imread(img_path)
-                    if img is not None:
-                        img = cv2.resize(img, (640, 480))
-                        state.current_frame = procesar_frame(img)
+        # Con una imagen cargada, volver a publicarla con o sin overlay (desde la caché)
+        if state.current_source == 'image' and state.source_image is not None:
+            procesar_imagen_fuente()
         
+        publicar_estado()
         print(f"✅ Detección EPP {'activada' if state.detection_active else 'desactivada'}")
         return jsonify({'success': True, 'active': state.detection_active})
         
@@ -456,11 +1103,27 @@ def toggle_detection():
         print(f"Error toggling detection: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/reload_personal', methods=['POST'])
+def reload_personal():
+    """Recargar la galería Personal/ sin reiniciar (solo codifica imágenes nuevas o cambiadas)"""
+    try:
+        resumen = recargar_galeria()
+        return jsonify({'success': True, **resumen})
+        
+    except Exception as e:
+        print(f"Error reloading gallery: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/toggle_recognition', methods=['POST'])
 def toggle_recognition():
     """Activar/desactivar reconocimiento facial"""
     try:
-        state.recognition_active = not state.recognition_active
+        with state.lock:
+            state.recognition_active = not state.recognition_active
+            filtro_movimiento.reiniciar()
+        
+        if state.current_source == 'image' and state.source_image is not None:
+            procesar_imagen_fuente()
         
         print(f"✅ Reconocimiento facial {'activado' if state.recognition_active else 'desactivado'}")
         return jsonify({'success': True, 'active': state.recognition_active})
@@ -471,9 +1134,12 @@ def toggle_recognition():
 
 @app.route('/capture_frame', methods=['POST'])
 def capture_frame():
-    """Capturar frame actual"""
+    """Capturar frame actual (?next=1 espera el próximo frame publicado, hasta 2 s)"""
     try:
-        if state.current_frame is None:
+        snapshot = canal_frames.actual
+        if request.args.get('next') in ('1', 'true') and snapshot is not None:
+            snapshot = canal_frames.esperar(snapshot.seq, timeout=2.0) or snapshot
+        if snapshot is None or snapshot.frame is None:
             return jsonify({'success': False, 'error': 'No hay frame activo para capturar'})
         
         # Generar nombre único basado en timestamp
@@ -481,21 +1147,212 @@ def capture_frame():
         filename = f"Captura_{timestamp}.jpg"
         filepath = os.path.join(app.config['RESULTS_FOLDER'], filename)
         
-        # Guardar frame actual
-        cv2.imwrite(filepath, state.current_frame)
+        # Guardar el JPEG ya codificado del frame (o codificarlo si no lo tiene)
+        if snapshot.jpeg is not None:
+            with open(filepath, 'wb') as f:
+                f.write(snapshot.jpeg)
+        else:
+            cv2.imwrite(filepath, snapshot.frame)
         
         print(f"✅ Captura guardada: {filename}")
-        return jsonify({'success': True, 'filename': filename})
+        return jsonify({'success': True, 'filename': filename, 'seq': snapshot.seq})
         
     except Exception as e:
         print(f"Error capturing frame: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/incidents')
+def list_incidents():
+    """Últimos incidentes de EPP guardados y estado del búfer de evidencia"""
+    n = request.args.get('n', 50, type=int)
+    return jsonify({'success': True, 'incidents': motor_incidentes.recientes(n),
+                    'stats': motor_incidentes.estadisticas()})
+
+@app.route('/incidents/<incidente_id>/clip')
+def incident_clip(incidente_id):
+    """Reproduce el clip de un incidente como MJPEG a su velocidad original"""
+    registro = motor_incidentes.buscar(incidente_id)
+    if registro is None:
+        return jsonify({'success': False, 'error': 'Incidente no encontrado'}), 404
+    return Response(motor_incidentes.reproducir(registro),
+                   mimetype='multipart/x-mixed-replace; boundary=frame')
+
+def rango_consulta():
+    """(desde, hasta, stream) de los parámetros from/to (epoch o ISO local) y stream; por defecto la última hora"""
+    def instante(valor, defecto):
+        if not valor:
+            return defecto
+        try:
+            return float(valor)
+        except ValueError:
+            return datetime.fromisoformat(valor).timestamp()
+    hasta = instante(request.args.get('to'), time.time())
+    desde = instante(request.args.get('from'), hasta - 3600)
+    return desde, hasta, request.args.get('stream') or None
+
+def nombre_clase(clase):
+    return model.names.get(clase, str(clase)) if model is not None else str(clase)
+
+@app.route('/detection_log/compliance')
+def detection_log_compliance():
+    """Serie de cumplimiento EPP por intervalos de `step` segundos en el rango pedido"""
+    try:
+        desde, hasta, stream = rango_consulta()
+        serie = registro_detecciones.serie_cumplimiento(desde, hasta, request.args.get('step', 60, type=int),
+                                                        stream)
+        return jsonify({'success': True, **serie})
+    except Exception as e:
+        print(f"Error consultando registro de detecciones: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/detection_log/aggregates')
+def detection_log_aggregates():
+    """Totales por clase y por persona en el rango pedido"""
+    try:
+        desde, hasta, stream = rango_consulta()
+        agregados = registro_detecciones.agregados(desde, hasta, stream)
+        agregados['clases'] = {nombre_clase(c): v for c, v in agregados['clases'].items()}
+        return jsonify({'success': True, **agregados})
+    except Exception as e:
+        print(f"Error consultando registro de detecciones: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/detection_log/classes/<clase>')
+def detection_log_class(clase):
+    """Detecciones de una clase (id o nombre del modelo) por intervalo"""
+    try:
+        if not clase.isdigit():
+            ids = {nombre: i for i, nombre in (model.names.items() if model is not None else [])}
+            if clase not in ids:
+                return jsonify({'success': False, 'error': f'Clase desconocida: {clase}'}), 404
+            clase = ids[clase]
+        desde, hasta, stream = rango_consulta()
+        serie = registro_detecciones.serie_clase(int(clase), desde, hasta, request.args.get('step', 60, type=int),
+                                                 stream)
+        return jsonify({'success': True, 'clase': nombre_clase(int(clase)), **serie})
+    except Exception as e:
+        print(f"Error consultando registro de detecciones: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/detection_log/stats')
+def detection_log_stats():
+    """Escritura del registro de detecciones y catálogo de streams y personas"""
+    return jsonify({'success': True, 'stats': registro_detecciones.estadisticas(),
+                    'catalog': registro_detecciones.catalogo})
+
 @app.route('/get_detection_status')
 def get_detection_status():
     """Obtener estado actual de detección EPP"""
     return jsonify(state.epp_status)
 
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """Latencias por etapa y frames descartados del pipeline activo"""
+    estadisticas = state.pipeline.estadisticas() if state.pipeline else {'running': False}
+    estadisticas['motion_gating'] = filtro_movimiento.estadisticas()
+    estadisticas['adaptive'] = controlador.estadisticas() if app.config['ADAPTIVE_CONTROL'] else None
+    estadisticas['process_pool'] = pool_procesos.estadisticas()
+    return jsonify(estadisticas)
+
+def actualizar_medidores():
+    """Copia a las métricas el estado de pipeline, multi-cámara, clientes y colas (al consultar /metrics)"""
+    if state.pipeline is not None:
+        estadisticas = state.pipeline.estadisticas()
+        for etapa, resumen in estadisticas['stages'].items():
+            for cuantil in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if resumen[cuantil] is not None:
+                    metricas.fijar('pipeline_latency_ms', resumen[cuantil], stage=etapa, quantile=cuantil[1:-3])
+        for cola, n in estadisticas['dropped'].items():
+            metricas.fijar('dropped_frames', n, queue=cola)
+        for cola, n in estadisticas['queues'].items():
+            metricas.fijar('queue_depth', n, queue=cola)
+    
+    estado_multi = multistream.status()
+    for stream in estado_multi['streams']:
+        metricas.fijar('stream_fps', stream['fps'], stream=stream['id'])
+        metricas.fijar('stream_frames_read', stream['frames_read'], stream=stream['id'])
+        metricas.fijar('stream_frames_processed', stream['frames_processed'], stream=stream['id'])
+        metricas.fijar('stream_dropped_frames', stream['frames_read'] - stream['frames_processed'], stream=stream['id'])
+    metricas.fijar('batch_size_mean', estado_multi['mean_batch_size'], stream='multi')
+    
+    metricas.fijar('mjpeg_clients', broadcaster.subscribers)
+    metricas.fijar('sse_clients', status_hub.subscribers)
+    metricas.fijar('queue_depth', registro_asistencia.en_cola, queue='asistencia')
+    incidentes = motor_incidentes.estadisticas()
+    metricas.fijar('queue_depth', incidentes['pendientes'], queue='incidentes')
+    metricas.fijar('incidents_written', incidentes['escritos'])
+    metricas.fijar('incidents_active', len(incidentes['activos']))
+    for stream, buffer in incidentes['buffers'].items():
+        metricas.fijar('evidence_buffer_bytes', buffer['bytes'], stream=stream)
+    registro = registro_detecciones.estadisticas()
+    metricas.fijar('queue_depth', registro['pendientes'], queue='registro_detecciones')
+    metricas.fijar('detection_log_frames', registro['frames'])
+    metricas.fijar('detection_log_dropped_frames', registro['frames_descartados'])
+    metricas.fijar('detection_log_bytes', registro['bytes_escritos'])
+    pool = pool_procesos.estadisticas()
+    metricas.fijar('queue_depth', pool['en_vuelo'], queue='pool_procesos')
+    metricas.fijar('process_pool_workers', pool['procesos'] if pool['activo'] else 0)
+    metricas.fijar('motion_skip_ratio', filtro_movimiento.estadisticas()['skip_ratio'])
+    if app.config['ADAPTIVE_CONTROL']:
+        metricas.fijar('adaptive_level', controlador.nivel)
+
+@app.route('/metrics')
+def metrics():
+    """Métricas de rendimiento en formato de texto de Prometheus"""
+    actualizar_medidores()
+    return Response(metricas.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/ready')
+def ready():
+    """Estado de carga de modelo y galería (503 mientras alguno sigue cargando)"""
+    listo = all(evento.is_set() for evento in recursos_listos.values())
+    return jsonify({
+        'ready': listo,
+        'modelo': carga['modelo'],
+        'galeria': carga['galeria'],
+        'rostros': len(galeria_rostros),
+        'load_ms': carga_ms,
+        'errors': carga_errores,
+        'uptime_s': round(time.monotonic() - inicio_servidor, 1)
+    }), 200 if listo else 503
+
+@app.route('/model_info')
+def model_info():
+    """Backend de inferencia activo, precisión, hilos y tiempo de calentamiento"""
+    if model is None:
+        return jsonify({'loaded': False})
+    return jsonify({'loaded': True, **model.info()})
+
+@app.route('/result_cache')
+def result_cache_stats():
+    """Aciertos, tamaño y descartes de la caché de resultados de imágenes"""
+    return jsonify(cache_resultados.estadisticas())
+
+@app.route('/stream_stats')
+def stream_stats():
+    """Codificaciones, clientes conectados y frames enviados/saltados del stream"""
+    return jsonify(broadcaster.estadisticas())
+
+@app.route('/get_detections')
+def get_detections():
+    """Última detección EPP en forma compacta y conteo por clase"""
+    detecciones = state.detecciones
+    return jsonify({
+        'detections': detecciones.to_dict(model.names if model else {}),
+        'counts': conteos_por_clase(detecciones)
+    })
+
+@app.route('/tracks')
+def tracks():
+    """Personas seguidas con su id e identidad, y cuántas veces se ejecutó el reconocimiento"""
+    return jsonify(seguidor.estadisticas())
+
+@app.route('/events')
+def events():
+    """Canal SSE: estado EPP completo al conectar y luego solo los cambios, con latido"""
+    return Response(status_hub.eventos(), mimetype='text/event-stream',
+                   headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/get_initial_state')
 def get_initial_state():
     """Obtener estado inicial de la aplicación"""
@@ -510,21 +1367,20 @@ def get_initial_state():
 def reset_system():
     """Resetear todo el sistema"""
     try:
-        # Detener cámara
-        state.camera_running = False
-        if state.camera_thread and state.camera_thread.is_alive():
-            state.camera_thread.join(timeout=2)
-        
-        if state.cap:
-            state.cap.release()
-            state.cap = None
-        
-        # Resetear estados
-        state.detection_active = False
-        state.recognition_active = False
-        state.current_source = None
-        state.current_frame = None
-        state.epp_status = {key: False for key in state.epp_status}
+        with state.fuente.lock, state.lock:
+            # Detener cámara
+            state.fuente.detener()
+            
+            # Resetear estados
+            state.detection_active = False
+            state.recognition_active = False
+            state.source_image = None
+            state.source_hash = None
+            publicar_frame(None)
+            motor_incidentes.cerrar_activos('principal')
+            state.epp_status = estado_epp_vacio()
+            state.detecciones = Detecciones.vacias()
+        publicar_estado()
         
         print("✅ Sistema reiniciado")
         return jsonify({'success': True})
@@ -539,8 +1395,12 @@ def open_excel():
     try:
         excel_file = "Horario.xlsx"
         
+        # Volcar entradas pendientes antes de abrir
+        registro_asistencia.flush()
+        
         # Crear archivo si no existe
         if not os.path.exists(excel_file):
+            from openpyxl import Workbook
             wb = Workbook()
             ws = wb.active
             ws.append(["Nombre", "Fecha", "Hora"])
@@ -578,18 +1438,16 @@ def file_too_large(error):
 
 # ====== LIMPIEZA AL CERRAR ======
 
-import atexit
-
 def cleanup():
     """Limpieza al cerrar la aplicación"""
     print("🧹 Limpiando recursos...")
-    state.camera_running = False
-    if state.cap:
-        state.cap.release()
-    if state.camera_thread and state.camera_thread.is_alive():
-        state.camera_thread.join(timeout=2)
-
-atexit.register(cleanup)
+    state.fuente.detener()
+    multistream.stop()
+    gestor_trabajos.cerrar()
+    for registro in (registro_asistencia, motor_incidentes, registro_detecciones):
+        if registro is not None:
+            registro.close()
+    pool_procesos.cerrar()
 
 # ====== CONFIGURACIÓN ADICIONAL ======
 
@@ -606,11 +1464,15 @@ logging.getLogger('werkzeug').setLevel(logging.ERROR)
 if __name__ == '__main__':
     print("🚀 Iniciando Sistema de Detección EPP...")
     print("📁 Estructura de directorios creada")
-    print("🔍 Modelo YOLO cargado" if model else "⚠️ Modelo YOLO no disponible")
-    print(f"👥 {len(rostros_codificados)} rostros codificados para reconocimiento")
+    print("⏳ Modelo YOLO y galería de rostros cargando en segundo plano (ver /ready)")
     print("🌐 Servidor iniciando en http://localhost:5000")
     
-    # Iniciar servidor Flask
+    iniciar_servidor()
+    
+    # Abrir cámaras configuradas para el modo multi-cámara en cuanto el modelo esté listo
+    abrir_streams_configurados()
+    
+    # Iniciar servidor Flask (un hilo por conexión; ver asgi.py para el modo asíncrono)
     app.run(
         host='0.0.0.0',
         port=5000,
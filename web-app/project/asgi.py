@@ -0,0 +1,265 @@
+"""Modo de servicio asíncrono (ASGI): MJPEG, SSE y clips como corrutinas; el resto de las rutas va a Flask
+
+Uso: python asgi.py  (o: uvicorn asgi:aplicacion --host 0.0.0.0 --port 5000)
+
+Cada espectador de /video_feed o /events es una corrutina del event loop y
+no un hilo del servidor. La captura y la inferencia siguen en sus hilos (o
+procesos): el FrameBroadcaster y el StatusHub avisan al loop con
+call_soon_threadsafe y cada cliente toma el frame/estado más reciente cuando
+puede enviarlo. Un cliente lento no acumula cola: se salta frames, y si un
+envío tarda más de ASGI_SEND_TIMEOUT se corta la conexión. Las rutas Flask
+(JSON, subidas, páginas) corren en un pool de ASGI_WSGI_WORKERS hilos.
+"""
+import asyncio
+import contextlib
+import time
+
+import app as aplicacion_flask
+from app import app, broadcaster, status_hub, multistream
+from broadcaster import mjpeg_part
+from events import formatear_evento, evento_cambios
+
+TIPO_MJPEG = b'multipart/x-mixed-replace; boundary=frame'
+
+
+def crear_wsgi(app_flask, hilos):
+    """Adaptador WSGI -> ASGI para las rutas Flask: a2wsgi (pool de hilos) o asgiref (un hilo)"""
+    try:
+        from a2wsgi import WSGIMiddleware
+        return WSGIMiddleware(app_flask, workers=hilos)
+    except ImportError:
+        from asgiref.wsgi import WsgiToAsgi
+        print("⚠️ a2wsgi no disponible: las rutas Flask se atienden de a una con asgiref")
+        return WsgiToAsgi(app_flask)
+
+
+class Difusion:
+    """Puente de un FrameBroadcaster (hilos) a las corrutinas de un event loop.
+
+    El hilo que publica solo agenda _actualizar() en el loop; ahí se guarda la
+    última parte MJPEG y se resuelve el futuro que esperan los clientes.
+    """
+
+    def __init__(self, broadcaster, loop):
+        self.broadcaster = broadcaster
+        self.loop = loop
+        self.seq, self.parte = broadcaster.latest()
+        self.clientes = 0
+        self._futuro = loop.create_future()
+        broadcaster.agregar_oyente(self._al_publicar)
+
+    def _al_publicar(self, seq, parte):
+        self.loop.call_soon_threadsafe(self._actualizar, seq, parte)
+
+    def _actualizar(self, seq, parte):
+        if seq <= self.seq:
+            return
+        self.seq, self.parte = seq, parte
+        futuro, self._futuro = self._futuro, self.loop.create_future()
+        futuro.set_result(None)
+
+    async def esperar(self, ultimo, timeout):
+        """(seq, parte) posterior a `ultimo`, o (ultimo, None) si no llegó nada en `timeout` segundos"""
+        if self.seq == ultimo or self.parte is None:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.shield(self._futuro), timeout)
+        if self.seq == ultimo or self.parte is None:
+            return ultimo, None
+        return self.seq, self.parte
+
+    def cerrar(self):
+        self.broadcaster.quitar_oyente(self._al_publicar)
+
+
+class Estado:
+    """Puente del StatusHub al event loop (misma idea que Difusion)"""
+
+    def __init__(self, hub, loop):
+        self.loop = loop
+        self.version, self.estado = hub.snapshot()
+        self._futuro = loop.create_future()
+        hub.agregar_oyente(self._al_publicar)
+
+    def _al_publicar(self, version, estado):
+        self.loop.call_soon_threadsafe(self._actualizar, version, estado)
+
+    def _actualizar(self, version, estado):
+        if version <= self.version:
+            return
+        self.version, self.estado = version, estado
+        futuro, self._futuro = self._futuro, self.loop.create_future()
+        futuro.set_result(None)
+
+    async def esperar(self, version, timeout):
+        if self.version == version:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.shield(self._futuro), timeout)
+        if self.version == version:
+            return version, None
+        return self.version, self.estado
+
+
+class ServidorAsgi:
+    """Aplicación ASGI: enruta los endpoints de streaming a corrutinas y el resto a Flask"""
+
+    def __init__(self, app_flask):
+        self.app_flask = app_flask
+        self.timeout_envio = app_flask.config['ASGI_SEND_TIMEOUT']
+        self.heartbeat = app_flask.config['SSE_HEARTBEAT']
+        self.wsgi = crear_wsgi(app_flask, app_flask.config['ASGI_WSGI_WORKERS'])
+        self.principal = None
+        self.estado = None
+        self.streams = {}  # stream_id -> (Stream, Difusion)
+        self.cortados = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.ciclo_de_vida(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            ruta = scope['path']
+            if ruta == '/video_feed':
+                return await self.atender(receive, send, self.mjpeg(send, self.difusion_principal()))
+            if ruta.startswith('/video_feed/'):
+                stream_id = ruta[len('/video_feed/'):]
+                difusion = self.difusion_stream(stream_id)
+                if difusion is not None:
+                    return await self.atender(receive, send, self.mjpeg(send, difusion, stream_id))
+            if ruta == '/events':
+                return await self.atender(receive, send, self.sse(send))
+            if ruta.startswith('/incidents/') and ruta.endswith('/clip'):
+                registro = aplicacion_flask.motor_incidentes.buscar(ruta[len('/incidents/'):-len('/clip')])
+                if registro is not None:
+                    return await self.atender(receive, send, self.clip(send, registro))
+        await self.wsgi(scope, receive, send)
+
+    async def ciclo_de_vida(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                # Aquí y no al importar: los procesos de los pools importan este módulo de nuevo
+                aplicacion_flask.iniciar_servidor()
+                aplicacion_flask.abrir_streams_configurados()
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ====== PUENTES ======
+
+    def difusion_principal(self):
+        if self.principal is None:
+            self.principal = Difusion(broadcaster, asyncio.get_running_loop())
+        return self.principal
+
+    def difusion_stream(self, stream_id):
+        """Puente del broadcaster de una cámara multi-stream (se rehace si el id cambió de fuente)"""
+        stream = multistream.get(stream_id)
+        actual = self.streams.get(stream_id)
+        if actual is not None and actual[0] is not stream:
+            actual[1].cerrar()
+            del self.streams[stream_id]
+            actual = None
+        if stream is None:
+            return None
+        if actual is None:
+            actual = self.streams[stream_id] = (stream, Difusion(stream.broadcaster, asyncio.get_running_loop()))
+        return actual[1]
+
+    # ====== CONEXIONES ======
+
+    async def atender(self, receive, send, corrutina):
+        """Corre el stream hasta que termine o el cliente se desconecte (lo que ocurra primero)"""
+        async def desconexion():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tareas = [asyncio.ensure_future(corrutina), asyncio.ensure_future(desconexion())]
+        try:
+            await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            for tarea in tareas:
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await tarea
+
+    async def enviar(self, send, datos, mas=True):
+        """Envía respetando el control de flujo del servidor; False si el cliente no drenó a tiempo"""
+        try:
+            await asyncio.wait_for(send({'type': 'http.response.body', 'body': datos, 'more_body': mas}),
+                                   self.timeout_envio)
+            return True
+        except asyncio.TimeoutError:
+            self.cortados += 1
+            return False
+
+    async def iniciar_respuesta(self, send, tipo, extra=()):
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', tipo), (b'cache-control', b'no-cache'), *extra]})
+
+    async def mjpeg(self, send, difusion, stream_id=None):
+        await self.iniciar_respuesta(send, TIPO_MJPEG)
+        difusion.clientes += 1
+        difusion.broadcaster.conectar()
+        ultimo = 0
+        try:
+            while True:
+                seq, parte = await difusion.esperar(ultimo, 1.0)
+                if parte is None:
+                    if stream_id is not None and multistream.get(stream_id) is None:
+                        break  # La cámara se quitó
+                    continue
+                # Solo el frame más reciente: un cliente lento se salta los intermedios
+                if not await self.enviar(send, parte):
+                    break
+                difusion.broadcaster.registrar_envio(seq, ultimo)
+                ultimo = seq
+            await self.enviar(send, b'', mas=False)
+        finally:
+            difusion.clientes -= 1
+            difusion.broadcaster.desconectar()
+            if stream_id is not None and difusion.clientes == 0 and multistream.get(stream_id) is None:
+                self.difusion_stream(stream_id)  # Suelta el puente de una cámara ya quitada
+
+    async def sse(self, send):
+        if self.estado is None:
+            self.estado = Estado(status_hub, asyncio.get_running_loop())
+        await self.iniciar_respuesta(send, b'text/event-stream', [(b'x-accel-buffering', b'no')])
+        status_hub.conectar()
+        try:
+            version, enviado = self.estado.version, self.estado.estado
+            if not await self.enviar(send, formatear_evento('status', {'full': True, 'status': enviado}).encode()):
+                return
+            while True:
+                version, estado = await self.estado.esperar(version, self.heartbeat)
+                if estado is None:
+                    mensaje = ": heartbeat\n\n"
+                else:
+                    mensaje = evento_cambios(enviado, estado)
+                    enviado = estado
+                if mensaje and not await self.enviar(send, mensaje.encode()):
+                    return
+        finally:
+            status_hub.desconectar()
+
+    async def clip(self, send, registro):
+        jpegs, periodo = await asyncio.to_thread(aplicacion_flask.motor_incidentes.leer_clip, registro)
+        await self.iniciar_respuesta(send, TIPO_MJPEG)
+        proximo = time.monotonic()
+        for seq, jpeg in enumerate(jpegs, 1):
+            if not await self.enviar(send, mjpeg_part(jpeg, seq)):
+                return
+            proximo += periodo
+            await asyncio.sleep(max(0.0, proximo - time.monotonic()))
+        await self.enviar(send, b'', mas=False)
+
+
+aplicacion = ServidorAsgi(app)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("🚀 Iniciando Sistema de Detección EPP (modo ASGI)...")
+    print("⏳ Modelo YOLO y galería de rostros cargando en segundo plano (ver /ready)")
+    print("🌐 Servidor iniciando en http://localhost:5000")
+    uvicorn.run(aplicacion, host='0.0.0.0', port=5000, log_level='warning')
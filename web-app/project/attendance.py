@@ -0,0 +1,198 @@
+"""Registro de asistencia indexado en memoria con diario en disco y volcado diferido a Excel"""
+import csv
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+ENCABEZADO = ["Nombre", "Fecha", "Hora"]
+_SIN_VERIFICAR = object()  # Marca de las entradas encoladas antes de terminar la carga inicial
+
+
+class RegistroAsistencia:
+    """Índice (nombre, fecha) en memoria; el disco solo lo toca un hilo escritor.
+
+    registrar() consulta el índice y encola la entrada nueva sin bloquear. El
+    hilo escritor la agrega de inmediato a un diario CSV (append + fsync) y cada
+    `intervalo_volcado` segundos vuelca en lote las entradas pendientes al Excel,
+    tras lo cual vacía el diario. Si el proceso muere, las entradas del diario
+    se recuperan al iniciar. La carga inicial también la hace el hilo escritor,
+    así que crear el registro no bloquea; mientras no termine, registrar()
+    encola las entradas sin verificar y el escritor descarta las que ya
+    estaban en el Excel o en el diario.
+    """
+
+    def __init__(self, archivo_excel="Horario.xlsx", archivo_diario="Horario.journal.csv",
+                 intervalo_volcado=10.0):
+        self.archivo_excel = archivo_excel
+        self.archivo_diario = archivo_diario
+        self.intervalo_volcado = intervalo_volcado
+        self._vistos = set()
+        self._sin_verificar = set()  # Claves encoladas antes de terminar la carga
+        self._lock = threading.Lock()
+        self._cola = queue.Queue()
+        self._pendientes = []  # Entradas ya en el diario que faltan en el Excel
+        self._ultimo_volcado = time.monotonic()
+        self.cargado = threading.Event()
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ====== CARGA INICIAL ======
+
+    def _cargar(self):
+        """Lee el Excel una sola vez y recupera el diario de una ejecución anterior"""
+        try:
+            if os.path.exists(self.archivo_excel):
+                from openpyxl import load_workbook
+                wb = load_workbook(self.archivo_excel, read_only=True)
+                for fila in wb.active.iter_rows(min_row=2, values_only=True):
+                    if fila and fila[0] is not None:
+                        self._vistos.add((fila[0], fila[1]))
+                wb.close()
+        except Exception as e:
+            print(f"Error leyendo {self.archivo_excel}: {e}")
+
+        try:
+            if os.path.exists(self.archivo_diario):
+                with open(self.archivo_diario, newline='', encoding='utf-8') as f:
+                    for fila in csv.reader(f):
+                        if len(fila) == 3 and (fila[0], fila[1]) not in self._vistos:
+                            self._vistos.add((fila[0], fila[1]))
+                            self._pendientes.append(tuple(fila))
+                if self._pendientes:
+                    print(f"♻️ Recuperadas {len(self._pendientes)} entradas del diario de asistencia")
+        except Exception as e:
+            print(f"Error leyendo {self.archivo_diario}: {e}")
+
+        print(f"✅ Índice de asistencia cargado ({len(self._vistos)} registros)")
+
+    # ====== CAMINO CALIENTE ======
+
+    def registrar(self, nombre, cuando=None):
+        """Registra la primera aparición del día sin bloquear; devuelve True si la entrada es nueva.
+        Antes de terminar la carga inicial, True solo indica que es nueva en esta ejecución"""
+        cuando = cuando or datetime.now()
+        fecha = cuando.strftime('%Y-%m-%d')
+        hora = cuando.strftime('%H:%M:%S')
+        clave = (nombre, fecha)
+        with self._lock:
+            if not self.cargado.is_set():
+                # El índice aún se está cargando: el escritor verifica la entrada después de cargarlo
+                if clave in self._sin_verificar:
+                    return False
+                self._sin_verificar.add(clave)
+                self._cola.put((_SIN_VERIFICAR, nombre, fecha, hora))
+                return True
+            if clave in self._vistos:
+                return False  # Ya registrado hoy
+            self._vistos.add(clave)
+        self._cola.put((nombre, fecha, hora))
+        print(f"✅ Registrado: {nombre} - {fecha} {hora}")
+        return True
+
+    def ya_registrado(self, nombre, fecha=None, timeout=1.0):
+        fecha = fecha or datetime.now().strftime('%Y-%m-%d')
+        self.cargado.wait(timeout)
+        with self._lock:
+            return (nombre, fecha) in self._vistos or (nombre, fecha) in self._sin_verificar
+
+    # ====== HILO ESCRITOR ======
+
+    def _verificar(self, nombre, fecha, hora):
+        """Entrada encolada durante la carga: None si el índice ya la tenía"""
+        with self._lock:
+            if (nombre, fecha) in self._vistos:
+                return None
+            self._vistos.add((nombre, fecha))
+        print(f"✅ Registrado: {nombre} - {fecha} {hora}")
+        return nombre, fecha, hora
+
+    def _run(self):
+        self._cargar()
+        with self._lock:
+            self.cargado.set()
+        while self._running or not self._cola.empty():
+            try:
+                item = self._cola.get(timeout=0.5)
+            except queue.Empty:
+                item = None
+
+            entradas, esperas = [], []
+            while item is not None:
+                if isinstance(item, threading.Event):
+                    esperas.append(item)
+                elif item[0] is _SIN_VERIFICAR:
+                    entrada = self._verificar(*item[1:])
+                    if entrada is not None:
+                        entradas.append(entrada)
+                else:
+                    entradas.append(item)
+                try:
+                    item = self._cola.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if entradas:
+                self._escribir_diario(entradas)
+            vencido = time.monotonic() - self._ultimo_volcado >= self.intervalo_volcado
+            if self._pendientes and (vencido or esperas):
+                self._volcar_excel()
+            for evento in esperas:
+                evento.set()
+
+    def _escribir_diario(self, entradas):
+        try:
+            with open(self.archivo_diario, 'a', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerows(entradas)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            print(f"Error escribiendo diario de asistencia: {e}")
+        self._pendientes.extend(entradas)
+
+    def _volcar_excel(self):
+        """Agrega en una sola escritura todas las entradas pendientes al Excel"""
+        self._ultimo_volcado = time.monotonic()
+        try:
+            from openpyxl import Workbook, load_workbook
+            if os.path.exists(self.archivo_excel):
+                wb = load_workbook(self.archivo_excel)
+            else:
+                wb = Workbook()
+                wb.active.append(ENCABEZADO)
+            ws = wb.active
+            for entrada in self._pendientes:
+                ws.append(list(entrada))
+            temporal = self.archivo_excel + '.tmp'
+            wb.save(temporal)
+            os.replace(temporal, self.archivo_excel)
+        except Exception as e:
+            # El diario conserva las entradas; se reintenta en el próximo volcado
+            print(f"Error volcando asistencia a Excel: {e}")
+            return
+        self._pendientes = []
+        try:
+            open(self.archivo_diario, 'w').close()
+        except Exception as e:
+            print(f"Error vaciando diario de asistencia: {e}")
+
+    @property
+    def en_cola(self):
+        """Entradas aún no escritas en el diario"""
+        return self._cola.qsize()
+
+    # ====== CONTROL ======
+
+    def flush(self, timeout=10):
+        """Fuerza el volcado al Excel y espera a que termine (p. ej. antes de abrirlo)"""
+        evento = threading.Event()
+        self._cola.put(evento)
+        return evento.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self._running = False
+        self._thread.join(timeout=5)
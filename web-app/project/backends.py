@@ -0,0 +1,310 @@
+"""Backends de inferencia intercambiables para el detector EPP (PyTorch, ONNX Runtime, OpenVINO)"""
+import ast
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from detections import Detecciones
+
+BACKENDS = ('ultralytics', 'onnx', 'openvino')
+PRECISIONES = ('fp32', 'fp16', 'int8')
+
+
+def huella_pesos(ruta):
+    """Identifica los pesos por nombre, tamaño y fecha de modificación"""
+    try:
+        st = os.stat(ruta)
+        return f"{os.path.basename(ruta)}@{st.st_size}-{st.st_mtime_ns}"
+    except OSError:
+        return os.path.basename(ruta)
+
+
+def _desactualizado(ruta, origen):
+    return not os.path.exists(ruta) or (os.path.exists(origen) and os.path.getmtime(ruta) < os.path.getmtime(origen))
+
+
+# ====== EXPORTACIÓN ======
+
+def letterbox(frame, tamano, relleno=114):
+    """Redimensiona manteniendo proporción y centra en un lienzo cuadrado; devuelve (img, escala, (dx, dy))"""
+    h, w = frame.shape[:2]
+    escala = min(tamano / h, tamano / w)
+    nw, nh = int(round(w * escala)), int(round(h * escala))
+    dx, dy = (tamano - nw) / 2, (tamano - nh) / 2
+    if (nw, nh) != (w, h):
+        frame = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    arriba, izquierda = int(round(dy - 0.1)), int(round(dx - 0.1))
+    frame = cv2.copyMakeBorder(frame, arriba, tamano - nh - arriba, izquierda, tamano - nw - izquierda,
+                               cv2.BORDER_CONSTANT, value=(relleno, relleno, relleno))
+    return frame, escala, (izquierda, arriba)
+
+
+def blob_entrada(frames, tamano):
+    """Tensor NCHW float32 RGB normalizado a [0, 1] y la transformación de cada frame"""
+    lienzos, transformaciones = [], []
+    for frame in frames:
+        lienzo, escala, desplazamiento = letterbox(frame, tamano)
+        lienzos.append(lienzo)
+        transformaciones.append((escala, desplazamiento, frame.shape[:2]))
+    blob = cv2.dnn.blobFromImages(lienzos, scalefactor=1 / 255.0, swapRB=True)
+    return blob, transformaciones
+
+
+def exportar_onnx(pesos, imgsz, carpeta):
+    """Exporta los pesos a ONNX con entrada fija imgsz x imgsz (solo si no existe o los pesos cambiaron)"""
+    os.makedirs(carpeta, exist_ok=True)
+    destino = os.path.join(carpeta, f"{os.path.splitext(os.path.basename(pesos))[0]}_{imgsz}.onnx")
+    if _desactualizado(destino, pesos):
+        from ultralytics import YOLO
+        print(f"⚙️ Exportando {pesos} a ONNX ({imgsz}x{imgsz})...")
+        # ultralytics escribe junto a los pesos: se exporta una copia en un directorio propio y
+        # el resultado reemplaza al destino de una vez, así nadie carga un archivo a medio escribir
+        temporal = tempfile.mkdtemp(prefix='exportando-', dir=carpeta)
+        try:
+            copia = shutil.copy2(pesos, temporal)
+            exportado = YOLO(copia).export(format='onnx', imgsz=imgsz, dynamic=False, simplify=True, batch=1)
+            os.replace(exportado, destino)
+        finally:
+            shutil.rmtree(temporal, ignore_errors=True)
+    return destino
+
+
+def cuantizar_int8(ruta_onnx, imagenes, imgsz, max_imagenes=32):
+    """Cuantización estática INT8 (QDQ) calibrada con imágenes del sitio"""
+    destino = ruta_onnx.replace('.onnx', '_int8.onnx')
+    if not _desactualizado(destino, ruta_onnx):
+        return destino
+    if not imagenes:
+        raise ValueError("La cuantización int8 necesita una carpeta de imágenes de calibración")
+
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    rutas = []
+    for patron in ('*.jpg', '*.jpeg', '*.png', '*.bmp'):
+        rutas.extend(glob.glob(os.path.join(imagenes, patron)))
+    rutas = sorted(rutas)[:max_imagenes]
+    if not rutas:
+        raise ValueError(f"No hay imágenes de calibración en {imagenes}")
+
+    class LectorCalibracion(CalibrationDataReader):
+        def __init__(self):
+            self._rutas = iter(rutas)
+
+        def get_next(self):
+            for ruta in self._rutas:
+                img = cv2.imread(ruta)
+                if img is not None:
+                    return {'images': blob_entrada([img], imgsz)[0]}
+            return None
+
+    print(f"⚙️ Cuantizando {ruta_onnx} a INT8 con {len(rutas)} imágenes...")
+    temporal = destino.replace('.onnx', f'.{os.getpid()}.tmp.onnx')
+    try:
+        quantize_static(ruta_onnx, temporal, LectorCalibracion(), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+        os.replace(temporal, destino)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return destino
+
+
+def preparar_modelo(tipo, pesos, imgsz=640, precision='fp32', carpeta='modelos_exportados', calibracion=None):
+    """Exporta y cuantiza lo que haga falta antes de lanzar procesos trabajadores.
+
+    Se llama en el proceso principal: así los trabajadores solo cargan el
+    archivo terminado y no exportan en paralelo sobre el mismo destino.
+    Devuelve la ruta del modelo (None para ultralytics, que usa los pesos).
+    """
+    if tipo == 'ultralytics':
+        return None
+    ruta = exportar_onnx(pesos, imgsz, carpeta)
+    if precision == 'int8':
+        ruta = cuantizar_int8(ruta, calibracion, imgsz)
+    return ruta
+
+
+def nombres_onnx(ruta_onnx):
+    """model.names guardado por ultralytics en los metadatos del ONNX"""
+    import onnx
+    modelo = onnx.load(ruta_onnx, load_external_data=False)
+    for prop in modelo.metadata_props:
+        if prop.key == 'names':
+            return {int(k): v for k, v in ast.literal_eval(prop.value).items()}
+    return {}
+
+
+def decodificar_salida(salida, transformacion, conf, iou=0.7, max_det=300):
+    """Salida cruda YOLO (4 + nc, N) -> Detecciones en coordenadas del frame original"""
+    pred = salida.T
+    puntajes = pred[:, 4:]
+    cls = puntajes.argmax(axis=1)
+    confianza = puntajes[np.arange(len(pred)), cls]
+    m = confianza >= conf
+    if not m.any():
+        return Detecciones.vacias()
+    pred, cls, confianza = pred[m], cls[m], confianza[m]
+
+    escala, (dx, dy), (h, w) = transformacion
+    cx, cy, bw, bh = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    xyxy = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+    xyxy -= np.array([dx, dy, dx, dy], dtype=np.float32)
+    xyxy /= escala
+    np.clip(xyxy, 0, [w, h, w, h], out=xyxy)
+
+    # NMS por clase en una sola llamada: se desplaza cada clase a una región distinta
+    desplazadas = xyxy + (cls[:, None] * 7680.0)
+    cajas = np.concatenate([desplazadas[:, :2], desplazadas[:, 2:] - desplazadas[:, :2]], axis=1)
+    keep = cv2.dnn.NMSBoxes(cajas.tolist(), confianza.tolist(), conf, iou, top_k=max_det)
+    keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+    return Detecciones(xyxy[keep], confianza[keep], cls[keep])
+
+
+# ====== BACKENDS ======
+
+class BackendDetector:
+    """Interfaz común: predict(frames, conf, imgsz) -> [Detecciones], names e id estable.
+
+    imgsz permite reducir la entrada frame a frame; los modelos exportados
+    tienen entrada fija (entrada_fija = True) y lo ignoran.
+    """
+    tipo = None
+    entrada_fija = True
+
+    def __init__(self, pesos, imgsz=640, hilos=None, precision='fp32'):
+        self.pesos = pesos
+        self.imgsz = imgsz
+        self.hilos = hilos or os.cpu_count() or 1
+        self.precision = precision
+        self.names = {}
+        self.ms_calentamiento = None
+
+    @property
+    def id(self):
+        return f"{self.tipo}:{huella_pesos(self.pesos)}:{self.imgsz}:{self.precision}"
+
+    def predict(self, frames, conf=0.25, imgsz=None):
+        raise NotImplementedError
+
+    def calentar(self, iteraciones=2, tamano=(480, 640)):
+        """Primeras inferencias en vacío para reservar memoria y compilar kernels antes del primer frame real"""
+        frame = np.zeros((*tamano, 3), dtype=np.uint8)
+        t0 = time.perf_counter()
+        for _ in range(iteraciones):
+            self.predict([frame])
+        self.ms_calentamiento = round((time.perf_counter() - t0) * 1000, 1)
+        return self.ms_calentamiento
+
+    def info(self):
+        return {
+            'backend': self.tipo,
+            'pesos': self.pesos,
+            'imgsz': self.imgsz,
+            'hilos': self.hilos,
+            'precision': self.precision,
+            'fixed_input': self.entrada_fija,
+            'warmup_ms': self.ms_calentamiento
+        }
+
+
+class BackendUltralytics(BackendDetector):
+    """Modelo .pt ejecutado por ultralytics/PyTorch"""
+    tipo = 'ultralytics'
+    entrada_fija = False
+
+    def __init__(self, pesos, imgsz=640, hilos=None, precision='fp32'):
+        if precision != 'fp32':
+            raise ValueError("El backend ultralytics en CPU solo admite fp32")
+        super().__init__(pesos, imgsz, hilos, precision)
+        import torch
+        from ultralytics import YOLO
+        torch.set_num_threads(self.hilos)
+        self.model = YOLO(pesos)
+        self.names = self.model.names
+
+    def predict(self, frames, conf=0.25, imgsz=None):
+        resultados = self.model(frames, conf=conf, imgsz=imgsz or self.imgsz, verbose=False)
+        return [Detecciones.from_result(resultado) for resultado in resultados]
+
+
+class BackendOnnx(BackendDetector):
+    """Modelo exportado a ONNX y ejecutado con ONNX Runtime (CPU) con hilos intra-op configurables"""
+    tipo = 'onnx'
+
+    def __init__(self, pesos, imgsz=640, hilos=None, precision='fp32', carpeta='modelos_exportados',
+                 calibracion=None):
+        if precision == 'fp16':
+            raise ValueError("ONNX Runtime en CPU no acelera fp16; usar fp32, int8 u openvino")
+        super().__init__(pesos, imgsz, hilos, precision)
+        import onnxruntime as ort
+        ruta = exportar_onnx(pesos, imgsz, carpeta)
+        self.names = nombres_onnx(ruta)
+        if precision == 'int8':
+            ruta = cuantizar_int8(ruta, calibracion, imgsz)
+        self.ruta = ruta
+
+        opciones = ort.SessionOptions()
+        opciones.intra_op_num_threads = self.hilos
+        opciones.inter_op_num_threads = 1
+        opciones.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.sesion = ort.InferenceSession(ruta, sess_options=opciones, providers=['CPUExecutionProvider'])
+        self.entrada = self.sesion.get_inputs()[0].name
+
+    def predict(self, frames, conf=0.25, imgsz=None):
+        # Entrada fija de lote 1: un run() por frame
+        detecciones = []
+        for frame in frames:
+            blob, (transformacion,) = blob_entrada([frame], self.imgsz)
+            salida = self.sesion.run(None, {self.entrada: blob})[0]
+            detecciones.append(decodificar_salida(salida[0], transformacion, conf))
+        return detecciones
+
+
+class BackendOpenVino(BackendDetector):
+    """El mismo ONNX compilado por OpenVINO para CPU (fp16 vía pista de precisión, int8 vía QDQ)"""
+    tipo = 'openvino'
+
+    def __init__(self, pesos, imgsz=640, hilos=None, precision='fp32', carpeta='modelos_exportados',
+                 calibracion=None):
+        super().__init__(pesos, imgsz, hilos, precision)
+        import openvino as ov
+        ruta = exportar_onnx(pesos, imgsz, carpeta)
+        self.names = nombres_onnx(ruta)
+        if precision == 'int8':
+            ruta = cuantizar_int8(ruta, calibracion, imgsz)
+        self.ruta = ruta
+
+        configuracion = {'INFERENCE_NUM_THREADS': self.hilos, 'PERFORMANCE_HINT': 'LATENCY'}
+        if precision == 'fp16':
+            configuracion['INFERENCE_PRECISION_HINT'] = 'f16'
+        core = ov.Core()
+        self.compilado = core.compile_model(core.read_model(ruta), 'CPU', configuracion)
+        self.solicitud = self.compilado.create_infer_request()
+
+    def predict(self, frames, conf=0.25, imgsz=None):
+        detecciones = []
+        for frame in frames:
+            blob, (transformacion,) = blob_entrada([frame], self.imgsz)
+            salida = self.solicitud.infer([blob])[self.compilado.output(0)]
+            detecciones.append(decodificar_salida(salida[0], transformacion, conf))
+        return detecciones
+
+
+def crear_backend(tipo, pesos, imgsz=640, hilos=None, precision='fp32', carpeta='modelos_exportados',
+                  calibracion=None):
+    """Construye el backend pedido; las dependencias opcionales se importan solo al usarlo"""
+    if precision not in PRECISIONES:
+        raise ValueError(f"Precisión no soportada: {precision}")
+    if tipo == 'ultralytics':
+        return BackendUltralytics(pesos, imgsz, hilos, precision)
+    if tipo == 'onnx':
+        return BackendOnnx(pesos, imgsz, hilos, precision, carpeta, calibracion)
+    if tipo == 'openvino':
+        return BackendOpenVino(pesos, imgsz, hilos, precision, carpeta, calibracion)
+    raise ValueError(f"Backend no soportado: {tipo}")
@@ -0,0 +1,326 @@
+"""Análisis por lotes de video grabado: trozos en paralelo, inferencia por lotes y línea de tiempo"""
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from backends import crear_backend, preparar_modelo
+from compliance import EvaluadorCumplimiento
+from detections import CLASES_EPP, dibujar_cajas, estilos_clases
+
+EXTENSIONES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+ELEMENTOS = ('casco', 'chaleco', 'gafas', 'guantes', 'persona')
+
+# Columnas de la línea de tiempo por frame analizado
+COLUMNAS = {
+    'frame': np.int32,
+    'tiempo': np.float32,
+    **{elemento: np.bool_ for elemento in ELEMENTOS},
+    'personas': np.int16,
+    'no_conformes': np.int16,
+    'safe': np.bool_,
+    'cajas': np.int16,
+}
+
+# ====== PROCESO TRABAJADOR ======
+
+_modelo = None
+_evaluador = None
+_estilos = None
+
+
+def _iniciar_trabajador(pesos, hilos, backend='ultralytics', imgsz=640, precision='fp32',
+                        carpeta_modelos='modelos_exportados', calibracion=None):
+    """Carga el modelo una sola vez por proceso (ya exportado por el gestor)"""
+    global _modelo, _evaluador, _estilos
+    cv2.setNumThreads(1)
+    _modelo = crear_backend(backend, pesos, imgsz=imgsz, hilos=hilos, precision=precision,
+                            carpeta=carpeta_modelos, calibracion=calibracion)
+    _evaluador = EvaluadorCumplimiento(_modelo.names)
+    _estilos = estilos_clases(_modelo.names)
+
+
+def _procesar_trozo(tarea):
+    """Analiza los frames [inicio, fin) de un video cada `paso` frames, en lotes de `lote`"""
+    cap = cv2.VideoCapture(tarea['ruta'])
+    cap.set(cv2.CAP_PROP_POS_FRAMES, tarea['inicio'])
+    paso, fps, tamano = tarea['paso'], tarea['fps'], tarea['tamano']
+    writer = None
+    if tarea['video_parcial']:
+        writer = cv2.VideoWriter(tarea['video_parcial'], cv2.VideoWriter_fourcc(*'mp4v'),
+                                 max(fps / paso, 1.0), tamano)
+
+    columnas = {nombre: [] for nombre in COLUMNAS}
+    frames, indices = [], []
+    ids_epp = [CLASES_EPP[elemento] for elemento in ELEMENTOS]
+
+    def vaciar():
+        if not frames:
+            return
+        for frame, indice, detecciones in zip(frames, indices, _modelo.predict(frames, conf=tarea['conf'])):
+            presentes = detecciones.presentes(ids_epp)
+            personas, no_conformes = _evaluador.evaluar(detecciones)
+            columnas['frame'].append(indice)
+            columnas['tiempo'].append(indice / fps)
+            for elemento, presente in zip(ELEMENTOS, presentes):
+                columnas[elemento].append(presente)
+            columnas['personas'].append(len(personas))
+            columnas['no_conformes'].append(no_conformes)
+            columnas['safe'].append(no_conformes == 0 if personas else bool(presentes[:4].all()))
+            columnas['cajas'].append(len(detecciones))
+            if writer is not None:
+                writer.write(dibujar_cajas(frame, detecciones, _estilos))
+        frames.clear()
+        indices.clear()
+
+    indice = tarea['inicio']
+    while indice < tarea['fin']:
+        # grab() evita decodificar por completo los frames que el paso descarta
+        if indice % paso == 0:
+            ok, frame = cap.read()
+            if ok:
+                frames.append(cv2.resize(frame, tamano))
+                indices.append(indice)
+        else:
+            ok = cap.grab()
+        if not ok:
+            break
+        if len(frames) >= tarea['lote']:
+            vaciar()
+        indice += 1
+    vaciar()
+
+    cap.release()
+    if writer is not None:
+        writer.release()
+    return {
+        'orden': tarea['orden'],
+        'columnas': {nombre: np.asarray(valores, dtype=COLUMNAS[nombre]) for nombre, valores in columnas.items()},
+        'leidos': indice - tarea['inicio'],
+    }
+
+
+# ====== LÍNEA DE TIEMPO ======
+
+def resumen_por_segundo(columnas):
+    """Agrega las columnas por frame a una línea de tiempo por segundo (formato columnar)"""
+    if len(columnas['tiempo']) == 0:
+        return {'segundo': []}
+    segundo = np.floor(columnas['tiempo']).astype(np.int64)
+    segundos, grupo = np.unique(segundo, return_inverse=True)
+    n = np.bincount(grupo).astype(np.float64)
+    resumen = {'segundo': segundos.tolist(), 'frames': n.astype(int).tolist()}
+    for nombre in ELEMENTOS + ('safe',):
+        resumen[f'{nombre}_ratio'] = np.round(np.bincount(grupo, weights=columnas[nombre]) / n, 3).tolist()
+    resumen['personas_media'] = np.round(np.bincount(grupo, weights=columnas['personas']) / n, 2).tolist()
+    maximo = np.zeros(len(segundos), dtype=np.int64)
+    np.maximum.at(maximo, grupo, columnas['no_conformes'])
+    resumen['no_conformes_max'] = maximo.tolist()
+    return resumen
+
+
+def unir_videos(partes, destino, fps, tamano):
+    """Concatena los videos anotados de cada trozo en un solo archivo"""
+    writer = cv2.VideoWriter(destino, cv2.VideoWriter_fourcc(*'mp4v'), fps, tamano)
+    for parte in partes:
+        cap = cv2.VideoCapture(parte)
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            writer.write(frame)
+        cap.release()
+        try:
+            os.remove(parte)
+        except OSError:
+            pass
+    writer.release()
+
+
+# ====== GESTOR DE TRABAJOS ======
+
+class TrabajoLote:
+    """Estado y progreso de un análisis enviado"""
+
+    def __init__(self, rutas, parametros):
+        self.id = uuid.uuid4().hex[:12]
+        self.rutas = rutas
+        self.parametros = parametros
+        self.estado = 'en_cola'
+        self.trozos_total = 0
+        self.trozos_listos = 0
+        self.frames_total = 0
+        self.frames_leidos = 0
+        self.resultados = {}
+        self.error = None
+        self.t_envio = time.time()
+        self.t_inicio = None
+        self.t_fin = None
+
+    def to_dict(self):
+        transcurrido = (self.t_fin or time.time()) - self.t_inicio if self.t_inicio else 0.0
+        return {
+            'id': self.id,
+            'estado': self.estado,
+            'videos': self.rutas,
+            'parametros': self.parametros,
+            'progreso': round(self.frames_leidos / self.frames_total, 3) if self.frames_total else 0.0,
+            'trozos': f"{self.trozos_listos}/{self.trozos_total}",
+            'frames_leidos': self.frames_leidos,
+            'segundos': round(transcurrido, 1),
+            'fps': round(self.frames_leidos / transcurrido, 1) if transcurrido else 0.0,
+            'resultados': self.resultados,
+            'error': self.error,
+        }
+
+
+class GestorTrabajos:
+    """Reparte cada video en trozos de `segundos_trozo` entre un pool de procesos.
+
+    Cada proceso carga el modelo una vez y analiza sus trozos con inferencia por
+    lotes; el gestor une los resultados en orden y escribe por video una línea
+    de tiempo por frame (.npz columnar), un resumen por segundo (.json) y,
+    opcionalmente, el video anotado.
+    """
+
+    def __init__(self, pesos, carpeta_salida, procesos=None, conf=0.25, tamano=(640, 480), contexto='spawn',
+                 backend='ultralytics', imgsz=640, precision='fp32', carpeta_modelos='modelos_exportados',
+                 calibracion=None):
+        self.pesos = pesos
+        self.backend = (backend, imgsz, precision, carpeta_modelos, calibracion)
+        self.carpeta_salida = carpeta_salida
+        self.procesos = procesos or max(1, (os.cpu_count() or 2) - 1)
+        self.conf = conf
+        self.tamano = tamano
+        self.contexto = contexto
+        self.trabajos = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                backend, imgsz, precision, carpeta_modelos, calibracion = self.backend
+                preparar_modelo(backend, self.pesos, imgsz, precision, carpeta_modelos, calibracion)
+                hilos = max(1, (os.cpu_count() or 1) // self.procesos)
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.procesos,
+                    mp_context=multiprocessing.get_context(self.contexto),
+                    initializer=_iniciar_trabajador,
+                    initargs=(self.pesos, hilos, *self.backend))
+            return self._executor
+
+    @staticmethod
+    def expandir_rutas(rutas):
+        """Acepta archivos de video y carpetas que los contengan"""
+        videos = []
+        for ruta in rutas:
+            if os.path.isdir(ruta):
+                videos += [os.path.join(ruta, f) for f in sorted(os.listdir(ruta))
+                           if f.lower().endswith(EXTENSIONES_VIDEO)]
+            elif os.path.isfile(ruta):
+                videos.append(ruta)
+        return videos
+
+    def enviar(self, rutas, paso=1, lote=8, segundos_trozo=60, anotar=True):
+        """Crea un trabajo y lo ejecuta en segundo plano; devuelve el trabajo"""
+        videos = self.expandir_rutas(rutas)
+        if not videos:
+            raise ValueError('No se encontraron videos para analizar')
+        parametros = {'paso': max(1, int(paso)), 'lote': max(1, int(lote)),
+                      'segundos_trozo': max(1.0, float(segundos_trozo)), 'anotar': bool(anotar)}
+        trabajo = TrabajoLote(videos, parametros)
+        self.trabajos[trabajo.id] = trabajo
+        threading.Thread(target=self._ejecutar, args=(trabajo,), daemon=True).start()
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        return self.trabajos.get(trabajo_id)
+
+    def listar(self):
+        return [trabajo.to_dict() for trabajo in self.trabajos.values()]
+
+    def _ejecutar(self, trabajo):
+        trabajo.estado = 'procesando'
+        trabajo.t_inicio = time.time()
+        p = trabajo.parametros
+        try:
+            carpeta = os.path.join(self.carpeta_salida, trabajo.id)
+            os.makedirs(carpeta, exist_ok=True)
+
+            # Dividir todos los videos en trozos y enviarlos juntos para ocupar todos los núcleos
+            futuros, videos = {}, []
+            for v, ruta in enumerate(trabajo.rutas):
+                cap = cv2.VideoCapture(ruta)
+                total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                cap.release()
+                if total <= 0:
+                    trabajo.resultados[ruta] = {'error': 'No se pudo leer el video'}
+                    continue
+                por_trozo = max(p['paso'], int(p['segundos_trozo'] * fps))
+                partes = []
+                for orden, inicio in enumerate(range(0, total, por_trozo)):
+                    parcial = os.path.join(carpeta, f"{v}_{orden:05d}.mp4") if p['anotar'] else None
+                    tarea = {'ruta': ruta, 'orden': orden, 'inicio': inicio, 'fin': min(total, inicio + por_trozo),
+                             'paso': p['paso'], 'lote': p['lote'], 'fps': fps, 'conf': self.conf,
+                             'tamano': self.tamano, 'video_parcial': parcial}
+                    futuros[self._pool().submit(_procesar_trozo, tarea)] = v
+                    if parcial:
+                        partes.append(parcial)
+                videos.append({'indice': v, 'ruta': ruta, 'fps': fps, 'partes': partes, 'trozos': []})
+                trabajo.frames_total += total
+                trabajo.trozos_total += len(range(0, total, por_trozo))
+
+            por_indice = {video['indice']: video for video in videos}
+            for futuro in concurrent.futures.as_completed(futuros):
+                resultado = futuro.result()
+                por_indice[futuros[futuro]]['trozos'].append(resultado)
+                trabajo.trozos_listos += 1
+                trabajo.frames_leidos += resultado['leidos']
+
+            trabajo.estado = 'combinando'
+            for video in videos:
+                trabajo.resultados[video['ruta']] = self._combinar(carpeta, video, p)
+            trabajo.estado = 'terminado'
+        except Exception as e:
+            print(f"Error en trabajo {trabajo.id}: {e}")
+            trabajo.error = str(e)
+            trabajo.estado = 'error'
+        finally:
+            trabajo.t_fin = time.time()
+
+    def _combinar(self, carpeta, video, p):
+        """Une los trozos de un video en orden y escribe sus archivos de salida"""
+        trozos = sorted(video['trozos'], key=lambda r: r['orden'])
+        columnas = {nombre: np.concatenate([t['columnas'][nombre] for t in trozos]) for nombre in COLUMNAS}
+        base = os.path.join(carpeta, f"{video['indice']}_{os.path.splitext(os.path.basename(video['ruta']))[0]}")
+
+        np.savez_compressed(base + '_timeline.npz', **columnas)
+        resumen = {
+            'video': video['ruta'],
+            'fps': video['fps'],
+            'paso': p['paso'],
+            'frames_analizados': int(len(columnas['frame'])),
+            'safe_ratio': round(float(columnas['safe'].mean()), 3) if len(columnas['safe']) else None,
+            'no_conformes_max': int(columnas['no_conformes'].max()) if len(columnas['no_conformes']) else 0,
+            'por_segundo': resumen_por_segundo(columnas),
+        }
+        with open(base + '_timeline.json', 'w', encoding='utf-8') as f:
+            json.dump(resumen, f)
+
+        salida = {'timeline': base + '_timeline.json', 'frames': base + '_timeline.npz'}
+        if video['partes']:
+            unir_videos(video['partes'], base + '_anotado.mp4', max(video['fps'] / p['paso'], 1.0), self.tamano)
+            salida['video'] = base + '_anotado.mp4'
+        return salida
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,137 @@
+"""Benchmark: latencia y FPS del detector EPP por backend de inferencia
+
+Carga best6.pt con cada backend/precisión pedido, mide la primera inferencia
+(arranque en frío), el calentamiento y la latencia por frame sobre las
+imágenes y videos de uploads/, y compara las cajas contra ultralytics fp32.
+
+Uso: python benchmarks/bench_backends.py [--backends ultralytics:fp32 onnx:fp32 onnx:int8 openvino:fp32]
+                                         [--threads 4] [--imgsz 640] [--frames 100]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from backends import crear_backend  # noqa: E402
+from tracker import iou_matriz  # noqa: E402
+
+
+def cargar_media(carpeta, max_frames):
+    """Frames 640x480 de las imágenes y de los videos de la carpeta (muestreados de forma pareja)"""
+    frames = []
+    for ruta in sorted(glob.glob(os.path.join(carpeta, '*'))):
+        if ruta.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
+            img = cv2.imread(ruta)
+            if img is not None:
+                frames.append(cv2.resize(img, (640, 480)))
+        elif ruta.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
+            cap = cv2.VideoCapture(ruta)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1
+            paso = max(1, total // max(1, max_frames // 2))
+            indice = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if indice % paso == 0:
+                    frames.append(cv2.resize(frame, (640, 480)))
+                indice += 1
+            cap.release()
+    return frames[:max_frames]
+
+
+def coincidencia(referencia, detecciones, umbral=0.5):
+    """Fracción de cajas de referencia con una caja de la misma clase e IoU >= umbral"""
+    total = aciertos = 0
+    for ref, det in zip(referencia, detecciones):
+        total += len(ref.cls)
+        if len(ref.cls) == 0 or len(det.cls) == 0:
+            continue
+        iou = iou_matriz(ref.xyxy, det.xyxy) * (ref.cls[:, None] == det.cls[None, :])
+        aciertos += int((iou.max(axis=1) >= umbral).sum())
+    return round(aciertos / total, 3) if total else None
+
+
+def medir(tipo, precision, args, frames):
+    t0 = time.perf_counter()
+    backend = crear_backend(tipo, args.weights, imgsz=args.imgsz, hilos=args.threads, precision=precision,
+                            carpeta=args.export_folder, calibracion=args.media)
+    carga_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    backend.predict([frames[0]], conf=args.conf)
+    primera_ms = (time.perf_counter() - t0) * 1000
+    backend.calentar(args.warmup)
+
+    latencias, detecciones = [], []
+    t_total = time.perf_counter()
+    for frame in frames:
+        t0 = time.perf_counter()
+        detecciones.extend(backend.predict([frame], conf=args.conf))
+        latencias.append((time.perf_counter() - t0) * 1000)
+    t_total = time.perf_counter() - t_total
+
+    return {
+        'backend': tipo,
+        'precision': precision,
+        'load_ms': round(carga_ms, 1),
+        'first_frame_ms': round(primera_ms, 1),
+        'mean_ms': round(float(np.mean(latencias)), 2),
+        'p50_ms': round(float(np.percentile(latencias, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencias, 95)), 2),
+        'fps': round(len(frames) / t_total, 2),
+        'boxes': sum(len(d.cls) for d in detecciones),
+    }, detecciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+',
+                        default=['ultralytics:fp32', 'onnx:fp32', 'onnx:int8', 'openvino:fp32', 'openvino:fp16'])
+    parser.add_argument('--weights', default=os.path.join(RAIZ, 'best6.pt'))
+    parser.add_argument('--media', default=os.path.join(RAIZ, 'uploads'))
+    parser.add_argument('--export-folder', default=os.path.join(RAIZ, 'modelos_exportados'))
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    frames = cargar_media(args.media, args.frames)
+    if not frames:
+        sys.exit(f"No hay imágenes ni videos en {args.media}")
+
+    resultados, referencia = [], None
+    print(f"{'backend':>20} {'load ms':>9} {'1st ms':>8} {'mean ms':>8} {'p95 ms':>8} {'fps':>7} {'match':>6}")
+    for spec in args.backends:
+        tipo, _, precision = spec.partition(':')
+        try:
+            resultado, detecciones = medir(tipo, precision or 'fp32', args, frames)
+        except Exception as e:
+            print(f"{spec:>20} omitido: {e}")
+            continue
+        if referencia is None and spec == 'ultralytics:fp32':
+            referencia = detecciones
+        resultado['match_vs_ultralytics'] = coincidencia(referencia, detecciones) if referencia else None
+        resultados.append(resultado)
+        print(f"{spec:>20} {resultado['load_ms']:>9.0f} {resultado['first_frame_ms']:>8.0f} "
+              f"{resultado['mean_ms']:>8.1f} {resultado['p95_ms']:>8.1f} {resultado['fps']:>7.1f} "
+              f"{resultado['match_vs_ultralytics'] if resultado['match_vs_ultralytics'] is not None else '-':>6}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'backends', 'frames': len(frames), 'threads': args.threads,
+                       'imgsz': args.imgsz, 'results': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
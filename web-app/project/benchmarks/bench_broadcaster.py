@@ -0,0 +1,111 @@
+"""Benchmark: costo de CPU por espectador del stream MJPEG
+
+Compara el esquema anterior (cada cliente recodifica el frame cada 33 ms) con
+FrameBroadcaster (una codificación por frame compartida entre clientes).
+
+Uso: python benchmarks/bench_broadcaster.py [--viewers 1 4 16 64] [--seconds 3]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from broadcaster import FrameBroadcaster  # noqa: E402
+
+FPS = 30
+
+
+def cargar_frame():
+    ruta = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads', 'prueba.jpg')
+    img = cv2.imread(ruta)
+    if img is None:
+        img = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    return cv2.resize(img, (640, 480))
+
+
+def medir(fn, segundos):
+    """Ejecuta fn(stop_event) y devuelve segundos de CPU del proceso consumidos"""
+    stop = threading.Event()
+    cpu0 = time.process_time()
+    hilos = fn(stop)
+    time.sleep(segundos)
+    stop.set()
+    for hilo in hilos:
+        hilo.join()
+    return time.process_time() - cpu0
+
+
+def legacy(frame, viewers):
+    """Un bucle por cliente que codifica el frame actual cada tick"""
+    def run(stop):
+        def cliente():
+            while not stop.is_set():
+                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+                buffer.tobytes()
+                time.sleep(1 / FPS)
+        hilos = [threading.Thread(target=cliente) for _ in range(viewers)]
+        for hilo in hilos:
+            hilo.start()
+        return hilos
+    return run
+
+
+def compartido(frame, viewers):
+    """Un productor a 30 FPS y N clientes leyendo del broadcaster"""
+    def run(stop):
+        b = FrameBroadcaster()
+
+        def productor():
+            while not stop.is_set():
+                b.publish(frame)
+                time.sleep(1 / FPS)
+            b.clear()
+
+        def cliente():
+            # Mismo recorrido que FrameBroadcaster.frames(), pero interrumpible
+            last_seq = 0
+            while not stop.is_set():
+                last_seq, part = b.wait(last_seq, timeout=0.1)
+
+        hilos = [threading.Thread(target=productor)]
+        hilos += [threading.Thread(target=cliente) for _ in range(viewers)]
+        for hilo in hilos:
+            hilo.start()
+        return hilos
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--viewers', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    frame = cargar_frame()
+    resultados = []
+    print(f"{'viewers':>8} {'legacy cpu%':>12} {'shared cpu%':>12} {'shared ms/viewer/s':>20}")
+    for n in args.viewers:
+        cpu_legacy = medir(legacy(frame, n), args.seconds) / args.seconds
+        cpu_shared = medir(compartido(frame, n), args.seconds) / args.seconds
+        resultados.append({
+            'viewers': n,
+            'legacy_cpu_fraction': round(cpu_legacy, 4),
+            'shared_cpu_fraction': round(cpu_shared, 4),
+            'shared_ms_per_viewer_per_s': round(cpu_shared * 1000 / n, 3),
+        })
+        print(f"{n:>8} {cpu_legacy * 100:>11.1f}% {cpu_shared * 100:>11.1f}% {cpu_shared * 1000 / n:>20.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'broadcaster', 'fps': FPS, 'results': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
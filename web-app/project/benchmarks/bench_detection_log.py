@@ -0,0 +1,185 @@
+"""Benchmark: escritura sostenida y consultas por rango del registro columnar de detecciones
+
+1. Escritura en tiempo real: `--cameras` cámaras a `--fps` durante `--seconds`
+   segundos con detecciones sintéticas; mide latencia de agregar(), lotes
+   descartados, bytes por frame y crecimiento de memoria.
+2. Escritura sin pausa: frames por segundo que acepta agregar() (capacidad
+   equivalente en cámaras a `--fps`).
+3. Un día sintético (`--day-fps` frames por segundo y cámara con marcas de
+   tiempo explícitas) y la latencia de las consultas sobre ese día.
+
+Uso: python benchmarks/bench_detection_log.py [--cameras 8] [--fps 30] [--seconds 10] [--day-fps 1]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from detection_log import RegistroDetecciones, HORA  # noqa: E402
+from detections import Detecciones, CLASES_EPP  # noqa: E402
+from compliance import EPP_REQUERIDO  # noqa: E402
+
+
+class Pista:
+    __slots__ = ('id', 'nombre')
+
+    def __init__(self, pista_id, nombre):
+        self.id = pista_id
+        self.nombre = nombre
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        campos = dict(linea.split(':', 1) for linea in f if ':' in linea)
+    return int(campos['VmRSS'].split()[0]) / 1024
+
+
+def frames_sinteticos(n, personas, cajas, semilla=0):
+    """n combinaciones (Detecciones, registros por persona, pistas) que se reparten entre los frames"""
+    rng = np.random.default_rng(semilla)
+    nombres = ['Fabricio', 'Jose Moreno', None, None]
+    resultado = []
+    for _ in range(n):
+        detecciones = Detecciones.__new__(Detecciones)
+        detecciones.xyxy = rng.uniform(0, 1280, (cajas, 4)).astype(np.float32)
+        detecciones.conf = rng.uniform(0.25, 1.0, cajas).astype(np.float32)
+        cls = rng.integers(0, 8, cajas).astype(np.int32)
+        cls[:personas] = CLASES_EPP['persona']
+        detecciones.cls = cls
+        registros, pistas = [], []
+        for j in range(personas):
+            tiene = rng.random(len(EPP_REQUERIDO)) < 0.8
+            registro = {e: bool(t) for e, t in zip(EPP_REQUERIDO, tiene)}
+            registro['violaciones'] = [e for e, t in zip(EPP_REQUERIDO[:2], tiene[:2]) if not t]
+            registro['cumple'] = not registro['violaciones']
+            registros.append(registro)
+            pistas.append(Pista(j, nombres[int(rng.integers(len(nombres)))]))
+        resultado.append((detecciones, registros, pistas))
+    return resultado
+
+
+def escritura_tiempo_real(carpeta, muestras, camaras, fps, segundos):
+    registro = RegistroDetecciones(carpeta)
+    rss0 = rss_mb()
+    latencias = []
+    periodo = 1.0 / (camaras * fps)
+    inicio = proximo = time.perf_counter()
+    k = 0
+    while time.perf_counter() - inicio < segundos:
+        detecciones, personas, pistas = muestras[k % len(muestras)]
+        t0 = time.perf_counter()
+        registro.agregar(f'cam{k % camaras}', detecciones, personas, pistas)
+        latencias.append(time.perf_counter() - t0)
+        k += 1
+        proximo += periodo
+        espera = proximo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+    duracion = time.perf_counter() - inicio
+    registro.close()
+    estadisticas = registro.estadisticas()
+    latencias = np.array(latencias) * 1e6
+    return {
+        'frames': k,
+        'fps_logrado': round(k / duracion, 1),
+        'fps_objetivo': camaras * fps,
+        'agregar_p50_us': round(float(np.percentile(latencias, 50)), 1),
+        'agregar_p99_us': round(float(np.percentile(latencias, 99)), 1),
+        'agregar_max_ms': round(float(latencias.max()) / 1000, 2),
+        'lotes_descartados': estadisticas['lotes_descartados'],
+        'bytes_por_frame': round(estadisticas['bytes_escritos'] / max(1, k), 1),
+        'rss_crecimiento_mb': round(rss_mb() - rss0, 1),
+    }
+
+
+def escritura_maxima(carpeta, muestras, camaras, frames, fps):
+    registro = RegistroDetecciones(carpeta)
+    inicio = time.perf_counter()
+    for k in range(frames):
+        detecciones, personas, pistas = muestras[k % len(muestras)]
+        registro.agregar(f'cam{k % camaras}', detecciones, personas, pistas)
+    duracion = time.perf_counter() - inicio
+    registro.close()
+    return {'frames_s': round(frames / duracion), 'camaras_equivalentes': int(frames / duracion / fps),
+            'lotes_descartados': registro.estadisticas()['lotes_descartados']}
+
+
+def llenar_dia(carpeta, muestras, camaras, fps_dia, dia):
+    registro = RegistroDetecciones(carpeta, max_lotes=1024)
+    paso = 1.0 / (camaras * fps_dia)
+    total = int(HORA * 24 / paso)
+    inicio = time.perf_counter()
+    for k in range(total):
+        detecciones, personas, pistas = muestras[k % len(muestras)]
+        registro.agregar(f'cam{k % camaras}', detecciones, personas, pistas, t=dia + k * paso)
+    registro.close()
+    return registro, total, time.perf_counter() - inicio
+
+
+def cronometrar(fn, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return round(min(tiempos), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cameras', type=int, default=8)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--people', type=int, default=3, help='Personas por frame')
+    parser.add_argument('--boxes', type=int, default=10, help='Cajas por frame (incluye personas)')
+    parser.add_argument('--day-fps', type=float, default=1.0, help='Densidad del día sintético por cámara')
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    muestras = frames_sinteticos(64, args.people, args.boxes)
+    carpeta = tempfile.mkdtemp(prefix='registro_detecciones_')
+    resultados = {'benchmark': 'detection_log', 'cameras': args.cameras, 'fps': args.fps}
+    try:
+        r = resultados['tiempo_real'] = escritura_tiempo_real(os.path.join(carpeta, 'tiempo_real'), muestras,
+                                                              args.cameras, args.fps, args.seconds)
+        print(f"Tiempo real: {r['fps_logrado']}/{r['fps_objetivo']} frames/s, agregar p50 {r['agregar_p50_us']} µs "
+              f"p99 {r['agregar_p99_us']} µs, {r['bytes_por_frame']} B/frame, "
+              f"descartados {r['lotes_descartados']}, memoria +{r['rss_crecimiento_mb']} MB")
+
+        r = resultados['maxima'] = escritura_maxima(os.path.join(carpeta, 'maxima'), muestras, args.cameras,
+                                                    200000, args.fps)
+        print(f"Sin pausa: {r['frames_s']} frames/s (~{r['camaras_equivalentes']} cámaras a {args.fps:g} FPS), "
+              f"descartados {r['lotes_descartados']}")
+
+        dia = (int(time.time()) // 86400 - 1) * 86400
+        registro, total, duracion = llenar_dia(os.path.join(carpeta, 'dia'), muestras, args.cameras, args.day_fps,
+                                               dia)
+        print(f"Día sintético: {total} frames en {duracion:.1f} s")
+        consultas = {
+            'cumplimiento_dia_paso_60': lambda: registro.serie_cumplimiento(dia, dia + 86400, 60),
+            'cumplimiento_dia_paso_900_cam0': lambda: registro.serie_cumplimiento(dia, dia + 86400, 900, 'cam0'),
+            'cumplimiento_hora_paso_10': lambda: registro.serie_cumplimiento(dia + 3600, dia + 7200, 10),
+            'agregados_dia': lambda: registro.agregados(dia, dia + 86400),
+            'agregados_dia_desalineado': lambda: registro.agregados(dia + 1234.5, dia + 86400 - 1234.5),
+            'clase_dia_paso_300': lambda: registro.serie_clase(CLASES_EPP['casco'], dia, dia + 86400, 300),
+        }
+        resultados['consultas_ms'] = {nombre: cronometrar(fn) for nombre, fn in consultas.items()}
+        for nombre, ms in resultados['consultas_ms'].items():
+            print(f"{nombre:>32}: {ms:8.2f} ms")
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
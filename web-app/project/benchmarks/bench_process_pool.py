@@ -0,0 +1,135 @@
+"""Benchmark: escalado del pool de procesos (memoria compartida) frente al análisis en un solo proceso
+
+1. Transporte: frames por segundo que llegan a los procesos y vuelven, con
+   los frames en ranuras de memoria compartida (PoolProcesos) o serializados
+   con pickle (ProcessPoolExecutor común), sin trabajo en el proceso.
+2. Rostros y detección: frames por segundo al ubicar y codificar rostros
+   (face_recognition) y al detectar EPP (best6.pt) sobre las imágenes de
+   uploads/, en el proceso actual y con 1..N procesos. Cada tarea se omite si
+   su dependencia no está instalada.
+
+Uso: python benchmarks/bench_process_pool.py [--workers 1 2 4 8] [--frames 64] [--tasks transporte rostros deteccion]
+"""
+import argparse
+import concurrent.futures
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from process_pool import PoolProcesos  # noqa: E402
+from face_regions import localizar_y_codificar  # noqa: E402
+
+
+def cargar_frames(n, tamano=(640, 480)):
+    rutas = sorted(glob.glob(os.path.join(RAIZ, 'uploads', '*.jpg')) +
+                   glob.glob(os.path.join(RAIZ, 'uploads', '*.png')))
+    imagenes = [cv2.resize(img, tamano) for img in map(cv2.imread, rutas) if img is not None]
+    if not imagenes:
+        imagenes = [np.random.randint(0, 255, (tamano[1], tamano[0], 3), dtype=np.uint8)]
+    return [imagenes[i % len(imagenes)] for i in range(n)]
+
+
+def _eco(frame):
+    """Tarea vacía del pool con pickle: recibe el frame serializado y devuelve algo pequeño"""
+    return frame.shape
+
+
+def disponible(modulo):
+    try:
+        __import__(modulo)
+        return True
+    except ImportError:
+        return False
+
+
+def medir_pool(frames, procesos, pesos=None, **opciones):
+    pool = PoolProcesos(procesos=procesos)
+    pool.iniciar(pesos, ('ultralytics', 640, 'fp32', os.path.join(RAIZ, 'modelos_exportados'), None) if pesos else None)
+    try:
+        pool.mapear(frames[:procesos * 2], **opciones)  # Arranque de procesos y carga de modelos
+        t0 = time.perf_counter()
+        pool.mapear(frames, **opciones)
+        return len(frames) / (time.perf_counter() - t0)
+    finally:
+        pool.cerrar()
+
+
+def medir_pickle(frames, procesos):
+    with concurrent.futures.ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        list(pool.map(_eco, frames[:procesos * 2]))
+        t0 = time.perf_counter()
+        list(pool.map(_eco, frames))
+        return len(frames) / (time.perf_counter() - t0)
+
+
+def medir_local(frames, funcion):
+    funcion(frames[0])
+    t0 = time.perf_counter()
+    for frame in frames:
+        funcion(frame)
+    return len(frames) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--size', type=int, nargs=2, default=[640, 480], metavar=('ANCHO', 'ALTO'))
+    parser.add_argument('--tasks', nargs='+', default=['transporte', 'rostros', 'deteccion'],
+                        choices=['transporte', 'rostros', 'deteccion'])
+    parser.add_argument('--weights', default=os.path.join(RAIZ, 'best6.pt'))
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    frames = cargar_frames(args.frames, tuple(args.size))
+    procesos = sorted(set(args.workers))
+    resultados = {'benchmark': 'process_pool', 'cpus': os.cpu_count(), 'frames': len(frames), 'results': []}
+    print(f"{os.cpu_count()} CPU, {len(frames)} frames de {args.size[0]}x{args.size[1]}")
+
+    def registrar(tarea, modo, n, fps, base=None):
+        fila = {'task': tarea, 'mode': modo, 'workers': n, 'fps': round(fps, 1),
+                'speedup': round(fps / base, 2) if base else None}
+        resultados['results'].append(fila)
+        print(f"{tarea:>11} {modo:>9} {n:>3} procesos: {fps:8.1f} frames/s"
+              + (f"  x{fila['speedup']}" if base else ''))
+
+    if 'transporte' in args.tasks:
+        for n in procesos:
+            registrar('transporte', 'memoria', n, medir_pool(frames * 8, n))
+            registrar('transporte', 'pickle', n, medir_pickle(frames * 8, n))
+
+    if 'rostros' in args.tasks:
+        if not disponible('face_recognition'):
+            print("    rostros omitido: face_recognition no está instalado")
+        else:
+            base = medir_local(frames, lambda frame: localizar_y_codificar(frame, 0.5))
+            registrar('rostros', 'local', 1, base)
+            for n in procesos:
+                registrar('rostros', 'pool', n, medir_pool(frames, n, rostros=True, escala=0.5), base)
+
+    if 'deteccion' in args.tasks:
+        if not disponible('ultralytics') or not os.path.exists(args.weights):
+            print("  deteccion omitido: requiere ultralytics y los pesos del modelo")
+        else:
+            from backends import crear_backend
+            modelo = crear_backend('ultralytics', args.weights, hilos=1)
+            base = medir_local(frames, lambda frame: modelo.predict([frame]))
+            registrar('deteccion', 'local', 1, base)
+            for n in procesos:
+                registrar('deteccion', 'pool', n, medir_pool(frames, n, pesos=args.weights, deteccion=True), base)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: tiempo hasta la primera respuesta y hasta /ready del servidor Flask
+
+Arranca `python app.py` como subproceso y sondea http://127.0.0.1:5000/ready:
+mide cuándo responde por primera vez (servidor escuchando) y cuándo informa
+modelo y galería cargados. También mide el tiempo de `import app`.
+
+Uso: python benchmarks/bench_startup.py [--runs 3] [--timeout 120]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URL = 'http://127.0.0.1:5000/ready'
+
+
+def consultar():
+    """(código HTTP, cuerpo) de /ready, o (None, None) si el servidor aún no escucha"""
+    try:
+        with urllib.request.urlopen(URL, timeout=1) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None, None
+
+
+def medir_arranque(timeout):
+    t0 = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, 'app.py'], cwd=RAIZ,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    primera = listo = cuerpo = None
+    try:
+        while time.perf_counter() - t0 < timeout and proceso.poll() is None:
+            codigo, datos = consultar()
+            if codigo is not None and primera is None:
+                primera = time.perf_counter() - t0
+            if codigo == 200:
+                listo, cuerpo = time.perf_counter() - t0, datos
+                break
+            time.sleep(0.02)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+    return {
+        'first_response_s': round(primera, 3) if primera is not None else None,
+        'ready_s': round(listo, 3) if listo is not None else None,
+        'load_ms': cuerpo['load_ms'] if cuerpo else None,
+        'errors': cuerpo['errors'] if cuerpo else None,
+    }
+
+
+def medir_import():
+    codigo = "import time; t = time.perf_counter(); import app; print('import_s', time.perf_counter() - t)"
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True)
+    for linea in salida.stdout.splitlines():
+        if linea.startswith('import_s '):
+            return round(float(linea.split()[1]), 3)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    if consultar()[0] is not None:
+        sys.exit("Ya hay un servidor escuchando en el puerto 5000")
+
+    resultados = []
+    print(f"{'run':>4} {'import s':>9} {'1st resp s':>11} {'ready s':>8}")
+    for i in range(args.runs):
+        resultado = {'import_s': medir_import(), **medir_arranque(args.timeout)}
+        resultados.append(resultado)
+        print(f"{i + 1:>4} {resultado['import_s'] or '-':>9} {resultado['first_response_s'] or '-':>11} "
+              f"{resultado['ready_s'] or '-':>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'startup', 'results': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Benchmark: enjambre de espectadores MJPEG/SSE contra el servidor con hilos (app.py) o ASGI (asgi.py)
+
+Arranca el servidor como subproceso, sube uploads/prueba_epp.mp4 como fuente
+y abre N clientes de /video_feed (una parte de ellos lentos, que leen con
+retardo) y N/4 clientes de /events, todos como corrutinas de un único
+proceso cliente. Mide FPS recibido por espectador (normales y lentos), hilos,
+CPU y memoria del servidor, y la latencia de /get_detection_status mientras
+dura la carga.
+
+Uso: python benchmarks/bench_viewers.py [--mode threaded asgi] [--viewers 8 32 64] [--seconds 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST, PUERTO = '127.0.0.1', 5000
+VIDEO = os.path.join(RAIZ, 'uploads', 'prueba_epp.mp4')
+SERVIDORES = {'threaded': 'app.py', 'asgi': 'asgi.py'}
+
+
+def pedir(ruta, datos=None, cabeceras=None, timeout=5):
+    solicitud = urllib.request.Request(f'http://{HOST}:{PUERTO}{ruta}', data=datos, headers=cabeceras or {})
+    with urllib.request.urlopen(solicitud, timeout=timeout) as r:
+        return r.status, r.read()
+
+
+def esperar_servidor(proceso, timeout):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout and proceso.poll() is None:
+        try:
+            pedir('/get_initial_state', timeout=1)
+            return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.05)
+    return False
+
+
+def subir_video():
+    """POST /upload_file multipart con el video de prueba (queda reproduciéndose como fuente)"""
+    limite = uuid.uuid4().hex
+    with open(VIDEO, 'rb') as f:
+        contenido = f.read()
+    cuerpo = (f'--{limite}\r\nContent-Disposition: form-data; name="file"; filename="prueba_epp.mp4"\r\n'
+              f'Content-Type: video/mp4\r\n\r\n').encode() + contenido + f'\r\n--{limite}--\r\n'.encode()
+    _, respuesta = pedir('/upload_file', cuerpo, {'Content-Type': f'multipart/form-data; boundary={limite}'}, 30)
+    return json.loads(respuesta).get('success', False)
+
+
+def recursos_proceso(pid):
+    """(hilos, segundos de CPU, RSS en MB) del proceso según /proc"""
+    with open(f'/proc/{pid}/status') as f:
+        campos = dict(linea.split(':', 1) for linea in f if ':' in linea)
+    with open(f'/proc/{pid}/stat') as f:
+        stat = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(stat[11]) + int(stat[12])) / os.sysconf('SC_CLK_TCK')
+    return int(campos['Threads']), cpu, int(campos['VmRSS'].split()[0]) / 1024
+
+
+# ====== CLIENTES ======
+
+async def cliente(ruta, marcador, fin, retardo=0.0):
+    """Lee la respuesta hasta `fin` (monotonic) contando apariciones de `marcador`; devuelve (conteo, bytes)"""
+    conteo = total = 0
+    try:
+        lector, escritor = await asyncio.open_connection(HOST, PUERTO)
+    except OSError:
+        return None
+    escritor.write(f'GET {ruta} HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n\r\n'.encode())
+    await escritor.drain()
+    cola = b''
+    try:
+        while time.monotonic() < fin:
+            try:
+                datos = await asyncio.wait_for(lector.read(65536), max(0.01, fin - time.monotonic()))
+            except asyncio.TimeoutError:
+                break
+            if not datos:
+                break
+            total += len(datos)
+            bloque = cola + datos
+            conteo += bloque.count(marcador)
+            cola = bloque[-len(marcador) + 1:]
+            if retardo:
+                await asyncio.sleep(retardo)
+    finally:
+        escritor.close()
+    return conteo, total
+
+
+async def sondeo(fin, periodo=0.2):
+    """Latencias (ms) de /get_detection_status mientras dura la carga"""
+    latencias = []
+    while time.monotonic() < fin:
+        t0 = time.perf_counter()
+        try:
+            await asyncio.to_thread(pedir, '/get_detection_status')
+            latencias.append((time.perf_counter() - t0) * 1000)
+        except (urllib.error.URLError, ConnectionError, OSError):
+            latencias.append(float('nan'))
+        await asyncio.sleep(periodo)
+    return latencias
+
+
+async def muestreo(pid, fin, periodo=0.5):
+    """Máximo de hilos y de RSS del servidor durante la carga"""
+    hilos = rss = 0
+    while time.monotonic() < fin:
+        h, _, r = recursos_proceso(pid)
+        hilos, rss = max(hilos, h), max(rss, r)
+        await asyncio.sleep(periodo)
+    return hilos, rss
+
+
+async def enjambre(pid, espectadores, lentos, segundos):
+    fin = time.monotonic() + segundos
+    tareas = [cliente('/video_feed', b'--frame', fin, 0.25 if i < lentos else 0.0) for i in range(espectadores)]
+    tareas += [cliente('/events', b'event: status', fin) for _ in range(max(1, espectadores // 4))]
+    resultados = await asyncio.gather(muestreo(pid, fin), sondeo(fin), *tareas)
+    return resultados[0], resultados[1], resultados[2:espectadores + 2], resultados[espectadores + 2:]
+
+
+def medir(modo, espectadores, lentos, segundos, pid):
+    hilos0, cpu0, _ = recursos_proceso(pid)
+    (hilos, rss), latencias, mjpeg, sse = asyncio.run(enjambre(pid, espectadores, lentos, segundos))
+    _, cpu, _ = recursos_proceso(pid)
+    fps = [r[0] / segundos if r else 0.0 for r in mjpeg]
+    latencias = np.array(latencias)
+    return {
+        'mode': modo,
+        'viewers': espectadores,
+        'slow_viewers': lentos,
+        'sse_clients': len(sse),
+        'failed': sum(1 for r in mjpeg + sse if r is None),
+        'fps_mean': round(float(np.mean(fps[lentos:])), 2) if espectadores > lentos else None,
+        'fps_min': round(float(np.min(fps[lentos:])), 2) if espectadores > lentos else None,
+        'fps_slow_mean': round(float(np.mean(fps[:lentos])), 2) if lentos else None,
+        'mb_s': round(sum(r[1] for r in mjpeg if r) / segundos / 2 ** 20, 2),
+        'server_threads': hilos,
+        'server_threads_idle': hilos0,
+        'server_cpu_pct': round((cpu - cpu0) / segundos * 100, 1),
+        'server_rss_mb': round(rss, 1),
+        'status_p50_ms': round(float(np.nanpercentile(latencias, 50)), 2) if len(latencias) else None,
+        'status_p95_ms': round(float(np.nanpercentile(latencias, 95)), 2) if len(latencias) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', nargs='+', default=['threaded', 'asgi'], choices=sorted(SERVIDORES))
+    parser.add_argument('--viewers', type=int, nargs='+', default=[8, 32, 64])
+    parser.add_argument('--slow', type=float, default=0.1, help='Fracción de espectadores lentos')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--timeout', type=float, default=60.0, help='Espera máxima al arranque del servidor')
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+
+    try:
+        pedir('/get_initial_state', timeout=1)
+        sys.exit(f"Ya hay un servidor escuchando en el puerto {PUERTO}")
+    except (urllib.error.URLError, ConnectionError, OSError):
+        pass
+
+    resultados = []
+    print(f"{'modo':>9} {'esp':>4} {'fps':>6} {'fps min':>8} {'fps lento':>10} {'hilos':>6} "
+          f"{'cpu %':>6} {'rss MB':>7} {'status p95':>11}")
+    for modo in args.mode:
+        errores = tempfile.TemporaryFile()
+        proceso = subprocess.Popen([sys.executable, SERVIDORES[modo]], cwd=RAIZ,
+                                   stdout=subprocess.DEVNULL, stderr=errores)
+        try:
+            if not esperar_servidor(proceso, args.timeout):
+                errores.seek(0)
+                error = errores.read().decode(errors='replace').strip().splitlines() if proceso.poll() else []
+                motivo = error[-1] if error else 'el servidor no respondió'
+                print(f"{modo:>9} omitido: {motivo}")
+                resultados.append({'mode': modo, 'skipped': motivo})
+                continue
+            if not subir_video():
+                sys.exit("No se pudo iniciar la fuente de video")
+            time.sleep(1.0)
+            for espectadores in args.viewers:
+                r = medir(modo, espectadores, int(espectadores * args.slow), args.seconds, proceso.pid)
+                resultados.append(r)
+                print(f"{modo:>9} {espectadores:>4} {r['fps_mean'] or '-':>6} {r['fps_min'] or '-':>8} "
+                      f"{r['fps_slow_mean'] or '-':>10} {r['server_threads']:>6} {r['server_cpu_pct']:>6} "
+                      f"{r['server_rss_mb']:>7} {r['status_p95_ms'] or '-':>11}")
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+            errores.close()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'viewers', 'results': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compara dos resultados de harness.py (p. ej. antes y después de un cambio)
+
+Empareja escenarios por nombre y parámetros y muestra la variación de FPS,
+p50, p95 y memoria pico. Sale con código 1 si algún escenario empeora más que
+--threshold (por defecto 10 %) en FPS o p95. Los escenarios cuyo p95 base es
+menor que --min-ms se muestran pero no se marcan: a esa escala domina el ruido.
+
+Uso: python benchmarks/compare.py base.json nuevo.json [--threshold 10] [--min-ms 0.5]
+"""
+import argparse
+import json
+import sys
+
+
+def clave(resultado):
+    return resultado['name'], json.dumps(resultado['params'], sort_keys=True)
+
+
+def variacion(antes, despues):
+    if antes in (None, 0) or despues is None:
+        return None
+    return (despues - antes) / antes * 100
+
+
+def formato(valor):
+    return f"{valor:+7.1f}%" if valor is not None else f"{'-':>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Empeoramiento tolerado en %%')
+    parser.add_argument('--min-ms', type=float, default=0.5, help='p95 base mínimo para marcar regresiones')
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.nuevo) as f:
+        nuevo = json.load(f)
+
+    print(f"base:  {base['meta'].get('commit')} ({base['meta'].get('timestamp')})")
+    print(f"nuevo: {nuevo['meta'].get('commit')} ({nuevo['meta'].get('timestamp')})\n")
+
+    anteriores = {clave(r): r for r in base['results'] if 'skipped' not in r}
+    regresiones = []
+    print(f"{'escenario':<24} {'parámetros':<44} {'fps':>8} {'p50':>8} {'p95':>8} {'mem':>8}")
+    for r in nuevo['results']:
+        if 'skipped' in r:
+            continue
+        a = anteriores.get(clave(r))
+        parametros = ','.join(f'{k}={v}' for k, v in r['params'].items())
+        if a is None:
+            print(f"{r['name']:<24} {parametros:<44} (nuevo)")
+            continue
+        fps = variacion(a['fps'], r['fps'])
+        p50 = variacion(a['p50_ms'], r['p50_ms'])
+        p95 = variacion(a['p95_ms'], r['p95_ms'])
+        mem = variacion(a['peak_mem_mb'], r['peak_mem_mb'])
+        marca = ''
+        medible = a['p95_ms'] >= args.min_ms
+        if medible and ((fps is not None and fps < -args.threshold) or (p95 is not None and p95 > args.threshold)):
+            regresiones.append((r['name'], parametros))
+            marca = '  ⚠️'
+        print(f"{r['name']:<24} {parametros:<44} {formato(fps)} {formato(p50)} {formato(p95)} {formato(mem)}{marca}")
+
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} escenario(s) empeoran más de {args.threshold:g} %")
+        sys.exit(1)
+    print(f"\n✅ Sin regresiones mayores a {args.threshold:g} %")
+
+
+if __name__ == '__main__':
+    main()
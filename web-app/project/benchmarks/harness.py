@@ -0,0 +1,360 @@
+"""Banco de pruebas reproducible del pipeline de detección y reconocimiento
+
+Ejecuta sin navegador las funciones del camino caliente de app.py sobre los
+archivos de uploads/ y Personal/ (más galerías sintéticas ampliadas y frames
+con muchas personas) y reporta FPS, percentiles de latencia y memoria pico
+por escenario. El JSON resultante se compara entre commits con compare.py.
+
+Escenarios:
+  procesar_frame          videos de uploads/ con detección (y reconocimiento)
+  realizar_reconocimiento mosaicos de rostros de Personal/ contra galerías de N rostros
+  busqueda_galeria        solo la búsqueda vectorizada en el índice (sin face_recognition)
+  dibujar_detecciones     frames con N cajas sintéticas
+  codificacion_jpeg       codificación compartida que sirve generate_frames()
+  registrar_horario       registro de asistencia de N personas distintas
+
+Uso: python benchmarks/harness.py [--frames 120] [--gallery-sizes 100 1000 10000]
+                                  [--crowd 1 4 9] [--boxes 10 50 200] [--json resultados.json]
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+VIDEOS = ('prueba_epp.mp4', 'video.mp4')
+TAMANO = (640, 480)
+SEMILLA = 1234
+
+
+# ====== ENTORNO ======
+
+def preparar_entorno():
+    """Directorio de trabajo temporal con enlaces a los fixtures (Horario y cachés no tocan el repo)"""
+    directorio = tempfile.mkdtemp(prefix='epp_bench_')
+    for nombre in ('Personal', 'uploads', 'best6.pt', 'modelos_exportados'):
+        origen = os.path.join(RAIZ, nombre)
+        if os.path.exists(origen):
+            os.symlink(origen, os.path.join(directorio, nombre))
+    os.chdir(directorio)
+    return directorio
+
+
+def importar_app(timeout):
+    import app
+    app.iniciar_servidor()
+    for evento in app.recursos_listos.values():
+        evento.wait(timeout)
+    return app
+
+
+def leer_frames(ruta, n):
+    """n frames 640x480 repartidos de forma pareja a lo largo del video"""
+    cap = cv2.VideoCapture(ruta)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or n
+    paso = max(1, total // n)
+    frames, indice = [], 0
+    while len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if indice % paso == 0:
+            frames.append(cv2.resize(frame, TAMANO))
+        indice += 1
+    cap.release()
+    return frames
+
+
+def rostros_personal():
+    carpeta = os.path.join(RAIZ, 'Personal')
+    imagenes = []
+    for archivo in sorted(os.listdir(carpeta)):
+        img = cv2.imread(os.path.join(carpeta, archivo))
+        if img is not None:
+            imagenes.append(img)
+    return imagenes
+
+
+def frame_multitud(rostros, personas):
+    """Mosaico 640x480 con `personas` retratos de Personal/ (frame con mucha gente)"""
+    lado = int(np.ceil(np.sqrt(personas)))
+    ancho, alto = TAMANO[0] // lado, TAMANO[1] // lado
+    frame = np.full((TAMANO[1], TAMANO[0], 3), 90, dtype=np.uint8)
+    for i in range(personas):
+        fila, columna = divmod(i, lado)
+        frame[fila * alto:(fila + 1) * alto, columna * ancho:(columna + 1) * ancho] = \
+            cv2.resize(rostros[i % len(rostros)], (ancho, alto))
+    return frame
+
+
+def detecciones_sinteticas(cajas, num_clases, rng):
+    from detections import Detecciones
+    x1 = rng.uniform(0, TAMANO[0] - 60, cajas)
+    y1 = rng.uniform(0, TAMANO[1] - 60, cajas)
+    xyxy = np.stack([x1, y1, x1 + rng.uniform(20, 60, cajas), y1 + rng.uniform(20, 60, cajas)], axis=1)
+    return Detecciones(xyxy, rng.uniform(0.25, 1.0, cajas), rng.integers(0, num_clases, cajas))
+
+
+# ====== MEDICIÓN ======
+
+REPETICIONES = 3
+CALENTAMIENTO = 5
+
+
+def medir(nombre, parametros, fn, entradas, pasada_memoria=20):
+    """Latencias de fn(entrada) por entrada; la memoria pico se mide en una pasada aparte con tracemalloc.
+
+    Tras unas iteraciones de calentamiento se recorre la entrada REPETICIONES
+    veces y se reporta la pasada de FPS mediano, para que el ruido de una sola
+    pasada no se confunda con una regresión.
+    """
+    for entrada in entradas[:CALENTAMIENTO]:
+        fn(entrada)
+    pasadas = []
+    for _ in range(REPETICIONES):
+        latencias = []
+        t_total = time.perf_counter()
+        for entrada in entradas:
+            t0 = time.perf_counter()
+            fn(entrada)
+            latencias.append((time.perf_counter() - t0) * 1000)
+        pasadas.append((time.perf_counter() - t_total, latencias))
+    pasadas.sort(key=lambda p: p[0])
+    t_total, latencias = pasadas[len(pasadas) // 2]
+
+    tracemalloc.start()
+    for entrada in entradas[:pasada_memoria]:
+        fn(entrada)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencias = np.asarray(latencias)
+    return {
+        'name': nombre,
+        'params': parametros,
+        'n': len(latencias),
+        'repeats': REPETICIONES,
+        'fps': round(len(latencias) / t_total, 2) if t_total else None,
+        'mean_ms': round(float(latencias.mean()), 3),
+        'p50_ms': round(float(np.percentile(latencias, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencias, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencias, 99)), 3),
+        'peak_mem_mb': round(pico / 2 ** 20, 2),
+    }
+
+
+def omitido(nombre, parametros, motivo):
+    return {'name': nombre, 'params': parametros, 'skipped': motivo}
+
+
+# ====== ESCENARIOS ======
+
+def escenario_procesar_frame(app, args):
+    resultados = []
+    for video in VIDEOS:
+        frames = leer_frames(os.path.join(RAIZ, 'uploads', video), args.frames)
+        for reconocimiento in (False, True):
+            parametros = {'video': video, 'detection': True, 'recognition': reconocimiento}
+            if app.model is None:
+                # Sin detector el escenario solo mediría copias de frames: no hay números comparables
+                resultados.append(omitido('procesar_frame', parametros,
+                                          f"modelo no disponible: {app.carga_errores.get('modelo', 'sin cargar')}"))
+                continue
+            if not frames:
+                resultados.append(omitido('procesar_frame', parametros, 'video no disponible'))
+                continue
+            app.seguidor.reiniciar()
+            app.filtro_movimiento.reiniciar()
+            app.state.detection_active = True
+            app.state.recognition_active = reconocimiento
+            resultados.append(medir('procesar_frame', parametros, app.procesar_frame, frames))
+    app.state.detection_active = app.state.recognition_active = False
+    return resultados
+
+
+def escenario_reconocimiento(app, args, rng):
+    from face_index import IndiceRostros
+    resultados = []
+    try:
+        import face_recognition  # noqa: F401
+    except ImportError as e:
+        return [omitido('realizar_reconocimiento', {}, f'face_recognition no disponible: {e}')]
+
+    rostros = rostros_personal()
+    original = app.galeria_rostros
+    reales = np.asarray(app.galeria.codificaciones, dtype=np.float32).reshape(-1, 128)
+    nombres_reales = list(app.galeria.nombres)
+    try:
+        for galeria in args.gallery_sizes:
+            extra = max(0, galeria - len(reales))
+            sinteticas = rng.normal(0, 0.1, (extra, 128)).astype(np.float32)
+            app.galeria_rostros = IndiceRostros(np.vstack([reales, sinteticas]),
+                                                nombres_reales + [f'sintetico_{i}' for i in range(extra)],
+                                                tolerancia=app.app.config['FACE_TOLERANCE'],
+                                                umbral_particion=app.app.config['FACE_INDEX_PARTITION_THRESHOLD'])
+            for personas in args.crowd:
+                frames = [frame_multitud(rostros, personas)] * max(1, args.frames // 10)
+                resultados.append(medir('realizar_reconocimiento', {'gallery': galeria, 'faces': personas},
+                                        app.realizar_reconocimiento, frames))
+    finally:
+        app.galeria_rostros = original
+    return resultados
+
+
+def escenario_busqueda(args, rng):
+    from face_index import IndiceRostros
+    resultados = []
+    for galeria in args.gallery_sizes:
+        indice = IndiceRostros(rng.normal(0, 0.1, (galeria, 128)).astype(np.float32),
+                               [f'p{i}' for i in range(galeria)])
+        for personas in args.crowd:
+            consultas = [rng.normal(0, 0.1, (personas, 128)).astype(np.float32) for _ in range(args.frames)]
+            resultados.append(medir('busqueda_galeria', {'gallery': galeria, 'faces': personas,
+                                                         'partitioned': indice.particionado},
+                                    indice.buscar, consultas))
+    return resultados
+
+
+def escenario_dibujo(app, args, rng, frame):
+    from detections import class_mapping, estilos_clases
+    if not app.estilos_por_clase:
+        # Sin modelo: mismas etiquetas que best6.pt
+        app.estilos_por_clase = estilos_clases(dict(enumerate(class_mapping)))
+    num_clases = len(app.estilos_por_clase)
+    resultados = []
+    for cajas in args.boxes:
+        detecciones = detecciones_sinteticas(cajas, num_clases, rng)
+        resultados.append(medir('dibujar_detecciones', {'boxes': cajas},
+                                lambda f: app.dibujar_detecciones(f.copy(), detecciones), [frame] * args.frames))
+    return resultados
+
+
+def escenario_jpeg(app, args, rng, frame):
+    """Cada publicación codifica una vez el JPEG que generate_frames() reparte a los clientes"""
+    resultados = []
+    for cajas in args.boxes:
+        anotado = app.dibujar_detecciones(frame.copy(), detecciones_sinteticas(cajas, 8, rng))
+        ruido = [np.clip(anotado.astype(np.int16) + rng.integers(-3, 4, anotado.shape), 0, 255).astype(np.uint8)
+                 for _ in range(4)]  # Frames distintos entre sí, como en un video
+        frames = [ruido[i % len(ruido)] for i in range(args.frames)]
+        resultados.append(medir('codificacion_jpeg', {'boxes': cajas, 'quality': app.broadcaster.jpeg_quality},
+                                app.publicar_frame, frames))
+    app.publicar_frame(None)
+    return resultados
+
+
+def escenario_asistencia(app, args):
+    resultados = []
+    for personas in (100, 1000):
+        # Cada llamada usa un nombre nuevo: se mide siempre el camino de una entrada nueva
+        contador = itertools.count()
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            resultado = medir('registrar_horario', {'people': personas},
+                              lambda _: app.registrar_horario(f'persona_{next(contador)}'),
+                              list(range(personas)), pasada_memoria=0)
+        t0 = time.perf_counter()
+        app.registro_asistencia.flush(timeout=60)
+        resultado['flush_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+        resultados.append(resultado)
+    return resultados
+
+
+# ====== PRINCIPAL ======
+
+def metadatos(app):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import resource
+        max_rss = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KB en Linux
+    except ImportError:
+        max_rss = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'model': app.model.info() if app.model else None,
+        'gallery': len(app.galeria_rostros),
+        'motion_gating': app.app.config['MOTION_GATING'],
+        'adaptive_control': app.app.config['ADAPTIVE_CONTROL'],
+        'face_tracking': app.app.config['FACE_TRACKING'],
+        'max_rss_mb': max_rss,
+    }
+
+
+def main():
+    global REPETICIONES
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--gallery-sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--crowd', type=int, nargs='+', default=[1, 4, 9])
+    parser.add_argument('--boxes', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--only', nargs='+', help='Ejecutar solo estos escenarios')
+    parser.add_argument('--repeat', type=int, default=REPETICIONES, help='Pasadas por escenario (se usa la mediana)')
+    parser.add_argument('--gating', action='store_true', help='Mantener el filtro de movimiento activo')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Mantener el control adaptativo (salto de frames e imgsz variables entre corridas)')
+    parser.add_argument('--load-timeout', type=float, default=600.0)
+    parser.add_argument('--json', help='Guardar resultados en este archivo')
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    REPETICIONES = max(1, args.repeat)
+    preparar_entorno()
+    app = importar_app(args.load_timeout)
+    app.app.config['MOTION_GATING'] = args.gating
+    app.app.config['ADAPTIVE_CONTROL'] = args.adaptive
+    rng = np.random.default_rng(SEMILLA)
+    base = leer_frames(os.path.join(RAIZ, 'uploads', VIDEOS[0]), 1)
+    frame = base[0] if base else np.full((TAMANO[1], TAMANO[0], 3), 90, dtype=np.uint8)
+
+    escenarios = {
+        'procesar_frame': lambda: escenario_procesar_frame(app, args),
+        'realizar_reconocimiento': lambda: escenario_reconocimiento(app, args, rng),
+        'busqueda_galeria': lambda: escenario_busqueda(args, rng),
+        'dibujar_detecciones': lambda: escenario_dibujo(app, args, rng, frame),
+        'codificacion_jpeg': lambda: escenario_jpeg(app, args, rng, frame),
+        'registrar_horario': lambda: escenario_asistencia(app, args),
+    }
+
+    resultados = []
+    print(f"{'escenario':<24} {'parámetros':<44} {'fps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mem MB':>7}")
+    for nombre, escenario in escenarios.items():
+        if args.only and nombre not in args.only:
+            continue
+        for r in escenario():
+            resultados.append(r)
+            parametros = ','.join(f'{k}={v}' for k, v in r['params'].items())
+            if 'skipped' in r:
+                print(f"{r['name']:<24} {parametros:<44} omitido: {r['skipped']}")
+            else:
+                print(f"{r['name']:<24} {parametros:<44} {r['fps']:>9.1f} {r['p50_ms']:>8.2f} "
+                      f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['peak_mem_mb']:>7.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'harness', 'meta': metadatos(app), 'results': resultados}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
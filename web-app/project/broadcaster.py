@@ -0,0 +1,115 @@
+"""Difusión MJPEG: cada frame se codifica una sola vez y se reparte a todos los clientes"""
+import threading
+
+import cv2
+
+
+def mjpeg_part(jpeg, seq):
+    """Arma la parte multipart de un frame (una sola vez por frame, no por cliente)"""
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n'
+            b'X-Frame-Seq: ' + str(seq).encode() + b'\r\n\r\n' + jpeg + b'\r\n')
+
+
+class FrameBroadcaster:
+    """Publica frames numerados y los entrega ya codificados a cualquier número de clientes.
+
+    Cada cliente recuerda la última secuencia enviada: si no hay frame nuevo no
+    reenvía nada, y si es lento simplemente salta al más reciente en lugar de
+    frenar al resto. Los oyentes registrados con agregar_oyente() reciben cada
+    publicación (lo usa el modo ASGI para despertar corrutinas sin un hilo
+    por cliente).
+    """
+
+    def __init__(self, jpeg_quality=85):
+        self.jpeg_quality = jpeg_quality
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self.seq = 0
+        self.jpeg = None
+        self._part = None
+        self.encodes = 0
+        self.subscribers = 0
+        self.sent = 0
+        self.skipped = 0
+        self._oyentes = []
+
+    def publish(self, frame, jpeg=None):
+        """Publica un frame; si no viene codificado se codifica aquí, una única vez"""
+        if frame is not None and jpeg is None:
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ret:
+                return
+            jpeg = buffer.tobytes()
+            self.encodes += 1
+        with self._cond:
+            self.seq += 1
+            self.jpeg = jpeg
+            self._part = mjpeg_part(jpeg, self.seq) if jpeg is not None else None
+            seq, part = self.seq, self._part
+            self._cond.notify_all()
+        for oyente in self._oyentes:
+            oyente(seq, part)
+
+    def agregar_oyente(self, oyente):
+        """oyente(seq, parte) se llama después de cada publicación, desde el hilo que publica"""
+        self._oyentes = self._oyentes + [oyente]
+
+    def quitar_oyente(self, oyente):
+        self._oyentes = [o for o in self._oyentes if o is not oyente]
+
+    def clear(self):
+        """Deja de emitir frames hasta la próxima publicación"""
+        self.publish(None)
+
+    def latest(self):
+        """Devuelve (seq, parte multipart) del último frame publicado"""
+        with self._cond:
+            return self.seq, self._part
+
+    def wait(self, last_seq, timeout=None):
+        """Espera un frame con secuencia distinta de last_seq; devuelve (seq, parte) o (last_seq, None)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != last_seq and self._part is not None, timeout)
+            if self.seq == last_seq or self._part is None:
+                return last_seq, None
+            return self.seq, self._part
+
+    def conectar(self):
+        with self._lock:
+            self.subscribers += 1
+
+    def desconectar(self):
+        with self._lock:
+            self.subscribers -= 1
+
+    def registrar_envio(self, seq, last_seq):
+        """Cuenta un frame enviado y los que el cliente se saltó desde last_seq"""
+        with self._lock:
+            self.sent += 1
+            if last_seq and seq - last_seq > 1:
+                self.skipped += seq - last_seq - 1
+
+    def frames(self, timeout=1.0):
+        """Generador de partes MJPEG para un cliente"""
+        self.conectar()
+        last_seq = 0
+        try:
+            while True:
+                seq, part = self.wait(last_seq, timeout)
+                if part is None:
+                    continue
+                self.registrar_envio(seq, last_seq)
+                last_seq = seq
+                yield part
+        finally:
+            self.desconectar()
+
+    def estadisticas(self):
+        return {
+            'seq': self.seq,
+            'encodes': self.encodes,
+            'subscribers': self.subscribers,
+            'sent': self.sent,
+            'skipped': self.skipped,
+        }
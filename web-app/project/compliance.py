@@ -0,0 +1,88 @@
+"""Cumplimiento EPP por persona: cada caja de equipo se asocia a la persona que la contiene"""
+import numpy as np
+
+from detections import CLASES_EPP
+
+EPP_REQUERIDO = ('casco', 'chaleco', 'gafas', 'guantes')
+
+# Nombre de clase del modelo -> elemento EPP ('guante' es singular en best6.pt)
+_ALIAS = {'guante': 'guantes'}
+
+
+def mapa_violaciones(names):
+    """{id de clase 'sin X': elemento X} a partir de model.names"""
+    mapa = {}
+    for class_id, class_name in names.items():
+        nombre = class_name.lower().strip()
+        if nombre.startswith('sin '):
+            elemento = nombre[4:].strip()
+            elemento = _ALIAS.get(elemento, elemento)
+            if elemento in EPP_REQUERIDO:
+                mapa[int(class_id)] = elemento
+    return mapa
+
+
+def contencion_matriz(personas, objetos):
+    """Fracción del área de cada objeto (E) que cae dentro de cada persona (P) -> (P, E)"""
+    x1 = np.maximum(personas[:, None, 0], objetos[None, :, 0])
+    y1 = np.maximum(personas[:, None, 1], objetos[None, :, 1])
+    x2 = np.minimum(personas[:, None, 2], objetos[None, :, 2])
+    y2 = np.minimum(personas[:, None, 3], objetos[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (objetos[:, 2] - objetos[:, 0]) * (objetos[:, 3] - objetos[:, 1])
+    return inter / np.maximum(area, 1e-6)[None, :]
+
+
+class EvaluadorCumplimiento:
+    """Asigna cajas de equipo y de violación ('sin ...') a personas con operaciones matriciales.
+
+    Cada caja se asigna a la persona que más la contiene si la fracción
+    contenida supera `umbral`. Una persona cumple si tiene los cuatro elementos
+    requeridos y ninguna violación asociada.
+    """
+
+    def __init__(self, names, umbral=0.5):
+        self.umbral = umbral
+        num_clases = max([int(k) for k in names] + list(CLASES_EPP.values())) + 1
+        # Tablas de búsqueda clase -> columna del elemento (-1 si no aplica)
+        self.col_equipo = np.full(num_clases, -1, dtype=np.int64)
+        self.col_violacion = np.full(num_clases, -1, dtype=np.int64)
+        for i, elemento in enumerate(EPP_REQUERIDO):
+            self.col_equipo[CLASES_EPP[elemento]] = i
+        for class_id, elemento in mapa_violaciones(names).items():
+            self.col_violacion[class_id] = EPP_REQUERIDO.index(elemento)
+
+    def evaluar(self, detecciones):
+        """Devuelve (registros por persona, número de personas que no cumplen)"""
+        es_persona = detecciones.cls == CLASES_EPP['persona']
+        personas = detecciones.xyxy[es_persona]
+        if len(personas) == 0:
+            return [], 0
+
+        cls = detecciones.cls[~es_persona]
+        objetos = detecciones.xyxy[~es_persona]
+        dentro = cls < len(self.col_equipo)
+        cls, objetos = cls[dentro], objetos[dentro]
+
+        tiene = np.zeros((len(personas), len(EPP_REQUERIDO)), dtype=bool)
+        falta = np.zeros_like(tiene)
+        if len(objetos):
+            contencion = contencion_matriz(personas, objetos)
+            duenio = contencion.argmax(axis=0)
+            asignado = contencion[duenio, np.arange(len(objetos))] >= self.umbral
+
+            col = self.col_equipo[cls]
+            m = asignado & (col >= 0)
+            tiene[duenio[m], col[m]] = True
+            col = self.col_violacion[cls]
+            m = asignado & (col >= 0)
+            falta[duenio[m], col[m]] = True
+
+        cumple = tiene.all(axis=1) & ~falta.any(axis=1)
+        registros = []
+        for i in range(len(personas)):
+            registro = {'id': i, 'box': personas[i].round(1).tolist(), 'cumple': bool(cumple[i])}
+            registro.update({elemento: bool(tiene[i, j]) for j, elemento in enumerate(EPP_REQUERIDO)})
+            registro['violaciones'] = [e for j, e in enumerate(EPP_REQUERIDO) if falta[i, j]]
+            registros.append(registro)
+        return registros, int((~cumple).sum())
@@ -0,0 +1,543 @@
+"""Registro columnar de detecciones particionado por hora, con consultas por rango de tiempo y agregados
+
+Estructura en disco (una carpeta por hora UTC):
+
+    <carpeta>/catalogo.json                  códigos de streams y de nombres de personas
+    <carpeta>/AAAA-MM-DD/HH/manifiesto.json  filas válidas por tabla, rango de tiempo, índice de clases
+                                             y acumulados por stream (por minuto, por clase, por persona)
+    <carpeta>/AAAA-MM-DD/HH/<tabla>.<col>    columna binaria sin encabezado, solo se agrega al final
+
+Tablas: `frames` (una fila por inferencia, ordenadas por tiempo),
+`detecciones` (una por caja) y `personas` (una por persona evaluada); las dos
+últimas apuntan al índice del frame dentro de la partición. El manifiesto se
+reescribe después de agregar los datos y es quien define cuántas filas son
+válidas: una escritura interrumpida no deja filas a medias visibles.
+
+Las consultas usan los acumulados del manifiesto para las horas que caen
+enteras en el rango y solo recorren las columnas de las horas de los bordes.
+"""
+import json
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from compliance import EPP_REQUERIDO
+
+TABLAS = {
+    'frames': (('t', '<u4'),                # ms desde el inicio de la partición
+               ('stream', '<u2'),
+               ('detecciones', '<u2'),
+               ('personas', '<u2'),
+               ('no_conformes', '<u2')),
+    'detecciones': (('frame', '<u4'),
+                    ('cls', 'u1'),
+                    ('conf', '<f2'),
+                    ('caja', '<u2', 4)),    # x1, y1, x2, y2 en píxeles
+    'personas': (('frame', '<u4'),
+                 ('pista', '<i4'),          # -1 sin seguimiento
+                 ('nombre', '<i2'),         # -1 sin identidad
+                 ('tiene', 'u1'),           # bit j: EPP_REQUERIDO[j] presente
+                 ('falta', 'u1'),           # bit j: violación 'sin EPP_REQUERIDO[j]'
+                 ('cumple', 'u1')),
+}
+HORA = 3600
+MINUTO = 60
+DESCONOCIDO = 'Desconocido'
+
+
+def ruta_particion(carpeta, inicio):
+    """Carpeta de la partición que empieza en `inicio` (epoch, múltiplo de una hora)"""
+    fecha = datetime.fromtimestamp(inicio, tz=timezone.utc)
+    return os.path.join(carpeta, fecha.strftime('%Y-%m-%d'), fecha.strftime('%H'))
+
+
+def columnas(tabla):
+    """(nombre, dtype, ancho) de cada columna de una tabla"""
+    for columna in TABLAS[tabla]:
+        yield columna[0], np.dtype(columna[1]), (columna[2] if len(columna) > 2 else 1)
+
+
+def leer_json(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def guardar_json(ruta, datos):
+    """Escritura atómica: archivo temporal y reemplazo"""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, separators=(',', ':'))
+    os.replace(temporal, ruta)
+
+
+def _vacio(filas, dtype, ancho):
+    return np.empty((filas, ancho) if ancho > 1 else filas, dtype)
+
+
+class _Lote:
+    """Búfer de capacidad fija que se llena en el camino caliente y se entrega entero al escritor"""
+
+    def __init__(self, max_frames, max_detecciones, max_personas):
+        self.t = np.empty(max_frames, dtype=np.float64)
+        self.tablas = {
+            'frames': {n: _vacio(max_frames, d, a) for n, d, a in columnas('frames') if n != 't'},
+            'detecciones': {n: _vacio(max_detecciones, d, a) for n, d, a in columnas('detecciones')},
+            'personas': {n: _vacio(max_personas, d, a) for n, d, a in columnas('personas')},
+        }
+        self.filas = {'frames': 0, 'detecciones': 0, 'personas': 0}
+        self.creado = time.monotonic()
+
+    def cabe(self, detecciones, personas):
+        return (self.filas['frames'] < len(self.t)
+                and self.filas['detecciones'] + detecciones <= len(self.tablas['detecciones']['cls'])
+                and self.filas['personas'] + personas <= len(self.tablas['personas']['frame']))
+
+    def recortado(self):
+        """(t, {tabla: {columna: arreglo}}) solo con las filas usadas"""
+        return self.t[:self.filas['frames']], {tabla: {k: v[:self.filas[tabla]] for k, v in cols.items()}
+                                               for tabla, cols in self.tablas.items()}
+
+
+class RegistroDetecciones:
+    """Registro de todas las detecciones con memoria acotada y escritura en segundo plano.
+
+    agregar() copia las detecciones del frame a un lote preasignado; cuando el
+    lote se llena o pasa `intervalo` segundos se entrega al hilo escritor, que
+    lo reparte por hora y agrega cada columna al final de su archivo. Si el
+    escritor se atrasa más de `max_lotes` lotes, los lotes nuevos se descartan
+    (y se cuentan) en lugar de crecer sin límite.
+    """
+
+    def __init__(self, carpeta, intervalo=2.0, max_frames=4096, max_detecciones=65536, max_personas=16384,
+                 max_lotes=8):
+        self.carpeta = carpeta
+        self.intervalo = intervalo
+        self.capacidad = (max_frames, max_detecciones, max_personas)
+        self._lock = threading.Lock()
+        self._lote = _Lote(*self.capacidad)
+        self._cola = queue.Queue(maxsize=max_lotes)
+        self._t_ultimo = 0.0
+        self._manifiestos = {}  # inicio de partición -> manifiesto de las particiones abiertas hace poco
+        self.frames = 0
+        self.lotes_escritos = 0
+        self.lotes_descartados = 0
+        self.frames_descartados = 0
+        self.bytes_escritos = 0
+        self.errores = 0
+
+        self._catalogo = {'streams': [], 'nombres': []}
+        try:
+            self._catalogo.update(leer_json(os.path.join(carpeta, 'catalogo.json')) or {})
+        except Exception as e:
+            print(f"Error leyendo catálogo del registro de detecciones: {e}")
+        self._codigos = {tipo: {v: i for i, v in enumerate(valores)} for tipo, valores in self._catalogo.items()}
+        self._catalogo_modificado = False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _codigo(self, tipo, valor):
+        codigo = self._codigos[tipo].get(valor)
+        if codigo is None:
+            codigo = self._codigos[tipo][valor] = len(self._catalogo[tipo])
+            self._catalogo[tipo] = self._catalogo[tipo] + [valor]
+            self._catalogo_modificado = True
+        return codigo
+
+    # ====== CAMINO CALIENTE ======
+
+    def agregar(self, stream, detecciones, personas=(), pistas=None, t=None):
+        """Agrega un frame: sus Detecciones, los registros por persona del evaluador EPP y,
+        si hay seguimiento, las pistas alineadas con esas personas"""
+        n, m = len(detecciones.cls), len(personas)
+        with self._lock:
+            # El registro es monótono: las consultas buscan por tiempo con búsqueda binaria
+            t = self._t_ultimo = max(time.time() if t is None else t, self._t_ultimo)
+            lote = self._lote
+            if not lote.cabe(n, m) or time.monotonic() - lote.creado >= self.intervalo:
+                self._entregar()
+                lote = self._lote
+                if not lote.cabe(n, m):
+                    return
+
+            i, d, p = lote.filas['frames'], lote.filas['detecciones'], lote.filas['personas']
+            lote.t[i] = t
+            frames = lote.tablas['frames']
+            frames['stream'][i] = self._codigo('streams', stream)
+            frames['detecciones'][i] = n
+            frames['personas'][i] = m
+            frames['no_conformes'][i] = sum(1 for persona in personas if not persona['cumple'])
+
+            cajas = lote.tablas['detecciones']
+            cajas['frame'][d:d + n] = i
+            cajas['cls'][d:d + n] = detecciones.cls
+            cajas['conf'][d:d + n] = detecciones.conf
+            cajas['caja'][d:d + n] = np.clip(detecciones.xyxy, 0, 65535)
+
+            filas = lote.tablas['personas']
+            for j, persona in enumerate(personas, p):
+                pista = pistas[j - p] if pistas is not None and j - p < len(pistas) else None
+                filas['frame'][j] = i
+                filas['pista'][j] = pista.id if pista is not None else -1
+                filas['nombre'][j] = (self._codigo('nombres', pista.nombre)
+                                      if pista is not None and pista.nombre else -1)
+                filas['tiene'][j] = sum(1 << k for k, e in enumerate(EPP_REQUERIDO) if persona[e])
+                filas['falta'][j] = sum(1 << EPP_REQUERIDO.index(e) for e in persona['violaciones'])
+                filas['cumple'][j] = persona['cumple']
+
+            lote.filas['frames'] += 1
+            lote.filas['detecciones'] += n
+            lote.filas['personas'] += m
+            self.frames += 1
+
+    def _entregar(self):
+        """Pasa el lote actual al escritor (con el lock tomado) y empieza uno nuevo"""
+        lote, self._lote = self._lote, _Lote(*self.capacidad)
+        if lote.filas['frames'] == 0:
+            return
+        catalogo = {k: list(v) for k, v in self._catalogo.items()} if self._catalogo_modificado else None
+        try:
+            self._cola.put_nowait((lote, catalogo))
+            self._catalogo_modificado = False
+        except queue.Full:
+            self.lotes_descartados += 1
+            self.frames_descartados += lote.filas['frames']
+
+    # ====== HILO ESCRITOR ======
+
+    def _run(self):
+        while self._running or not self._cola.empty():
+            try:
+                item = self._cola.get(timeout=0.5)
+            except queue.Empty:
+                with self._lock:
+                    if time.monotonic() - self._lote.creado >= self.intervalo:
+                        self._entregar()
+                continue
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            lote, catalogo = item
+            try:
+                os.makedirs(self.carpeta, exist_ok=True)
+                if catalogo is not None:
+                    guardar_json(os.path.join(self.carpeta, 'catalogo.json'), catalogo)
+                self._escribir(*lote.recortado())
+                self.lotes_escritos += 1
+            except Exception as e:
+                self.errores += 1
+                print(f"Error escribiendo registro de detecciones: {e}")
+
+    def _escribir(self, t, tablas):
+        horas = (t // HORA).astype(np.int64) * HORA
+        for inicio in np.unique(horas).tolist():
+            en_hora = horas == inicio
+            manifiesto = self._manifiesto(inicio)
+            # Índice de cada frame del lote dentro de la partición (solo vale para los de esta hora)
+            indice = manifiesto['filas']['frames'] + np.cumsum(en_hora) - 1
+
+            partes = {'frames': {k: v[en_hora] for k, v in tablas['frames'].items()}}
+            partes['frames']['t'] = np.round((t[en_hora] - inicio) * 1000)
+            for tabla in ('detecciones', 'personas'):
+                seleccion = en_hora[tablas[tabla]['frame']]
+                partes[tabla] = {k: v[seleccion] for k, v in tablas[tabla].items()}
+                partes[tabla]['frame'] = indice[partes[tabla]['frame']]
+
+            carpeta = ruta_particion(self.carpeta, inicio)
+            os.makedirs(carpeta, exist_ok=True)
+            for tabla, cols in partes.items():
+                for nombre, dtype, ancho in columnas(tabla):
+                    datos = np.ascontiguousarray(cols[nombre], dtype=dtype)
+                    validos = manifiesto['filas'][tabla] * ancho * dtype.itemsize
+                    with open(os.path.join(carpeta, f'{tabla}.{nombre}'), 'ab') as f:
+                        if f.tell() != validos:
+                            f.truncate(validos)  # Cola a medias de una escritura interrumpida
+                        f.write(datos.tobytes())
+                    self.bytes_escritos += datos.nbytes
+            for tabla, cols in partes.items():
+                manifiesto['filas'][tabla] += len(cols['frame'] if tabla != 'frames' else cols['t'])
+            acumular(manifiesto, t[en_hora], partes)
+            guardar_json(os.path.join(carpeta, 'manifiesto.json'), manifiesto)
+
+    def _manifiesto(self, inicio):
+        manifiesto = self._manifiestos.get(inicio)
+        if manifiesto is None:
+            manifiesto = leer_json(os.path.join(ruta_particion(self.carpeta, inicio), 'manifiesto.json')) or {
+                'inicio': inicio, 'filas': {tabla: 0 for tabla in TABLAS},
+                't_min': None, 't_max': None, 'clases': {}, 'streams': {}}
+            # Solo se escriben la hora actual y, por frames atrasados, la anterior
+            self._manifiestos = {k: v for k, v in self._manifiestos.items() if k >= inicio - HORA}
+            self._manifiestos[inicio] = manifiesto
+        return manifiesto
+
+    # ====== CONSULTA ======
+
+    @property
+    def catalogo(self):
+        with self._lock:
+            return {k: list(v) for k, v in self._catalogo.items()}
+
+    def particiones(self, desde, hasta):
+        """[(inicio, carpeta, manifiesto)] de las horas con datos que tocan [desde, hasta)"""
+        resultado = []
+        for inicio in range(int(desde // HORA) * HORA, int(math.ceil(hasta / HORA)) * HORA, HORA):
+            carpeta = ruta_particion(self.carpeta, inicio)
+            manifiesto = leer_json(os.path.join(carpeta, 'manifiesto.json'))
+            if manifiesto and manifiesto['filas']['frames'] and manifiesto['t_min'] < hasta \
+                    and manifiesto['t_max'] >= desde:
+                resultado.append((inicio, carpeta, manifiesto))
+        return resultado
+
+    def _codigo_stream(self, stream):
+        if stream is None:
+            return None
+        with self._lock:
+            return self._codigos['streams'].get(stream, -1)
+
+    @staticmethod
+    def leer(carpeta, manifiesto, tabla, nombre, desde=0, hasta=None):
+        """Filas [desde, hasta) de una columna, sin pasar de las filas válidas del manifiesto"""
+        _, dtype, ancho = next(c for c in columnas(tabla) if c[0] == nombre)
+        validas = manifiesto['filas'][tabla]
+        hasta = validas if hasta is None else min(hasta, validas)
+        if hasta <= desde:
+            return _vacio(0, dtype, ancho)
+        datos = np.fromfile(os.path.join(carpeta, f'{tabla}.{nombre}'), dtype=dtype,
+                            count=(hasta - desde) * ancho, offset=desde * ancho * dtype.itemsize)
+        return datos.reshape(-1, ancho) if ancho > 1 else datos
+
+    def _rango(self, inicio, carpeta, manifiesto, desde, hasta, stream):
+        """Frames de una partición dentro de [desde, hasta): (primer índice, t absoluto, máscara de stream)"""
+        t = self.leer(carpeta, manifiesto, 'frames', 't')
+        a, b = np.searchsorted(t, [(desde - inicio) * 1000, (hasta - inicio) * 1000]).tolist()
+        seleccion = np.ones(b - a, dtype=bool)
+        if stream is not None:
+            seleccion = self.leer(carpeta, manifiesto, 'frames', 'stream', a, b) == stream
+        return a, inicio + t[a:b] / 1000.0, seleccion
+
+    def _filas_de_frames(self, carpeta, manifiesto, tabla, a, b):
+        """Rango [c, d) de filas de `tabla` que pertenecen a los frames [a, b) y su columna `frame`"""
+        frame = self.leer(carpeta, manifiesto, tabla, 'frame')
+        c, d = np.searchsorted(frame, [a, b]).tolist()
+        return c, d, frame[c:d]
+
+    def serie_cumplimiento(self, desde, hasta, paso=60, stream=None, max_puntos=2000):
+        """Serie de cumplimiento en intervalos de `paso` segundos: frames, personas y % que cumple.
+
+        Con pasos múltiplos de un minuto se usan los acumulados por minuto del
+        manifiesto (el rango se ajusta a minutos enteros) y no se lee ninguna
+        columna. Si el rango tendría más de `max_puntos` intervalos, el paso se
+        agranda.
+        """
+        paso = max(1, int(paso))
+        if (hasta - desde) / paso > max_puntos:
+            paso = int(math.ceil((hasta - desde) / max_puntos / MINUTO)) * MINUTO
+        por_minuto = paso % MINUTO == 0
+        if por_minuto:
+            desde = math.floor(desde / MINUTO) * MINUTO
+            hasta = math.ceil(hasta / MINUTO) * MINUTO
+        n = max(1, int(math.ceil((hasta - desde) / paso)))
+        frames, personas, cumplen = np.zeros(n), np.zeros(n), np.zeros(n)
+        codigo = self._codigo_stream(stream)
+
+        for inicio, carpeta, manifiesto in self.particiones(desde, hasta):
+            if por_minuto:
+                minutos = inicio + MINUTO * np.arange(HORA // MINUTO)
+                dentro = (minutos >= desde) & (minutos < hasta)
+                intervalo = ((minutos[dentro] - desde) // paso).astype(np.int64)
+                for clave, datos in manifiesto['streams'].items():
+                    if codigo is None or int(clave) == codigo:
+                        acumulado = np.asarray(datos['minutos'], dtype=np.float64)[dentro]
+                        frames += np.bincount(intervalo, acumulado[:, 0], n)
+                        personas += np.bincount(intervalo, acumulado[:, 1], n)
+                        cumplen += np.bincount(intervalo, acumulado[:, 2], n)
+                continue
+            a, t, seleccion = self._rango(inicio, carpeta, manifiesto, desde, hasta, codigo)
+            intervalo = ((t[seleccion] - desde) // paso).astype(np.int64)
+            en_frame = self.leer(carpeta, manifiesto, 'frames', 'personas', a, a + len(t))[seleccion]
+            no_conformes = self.leer(carpeta, manifiesto, 'frames', 'no_conformes', a, a + len(t))[seleccion]
+            frames += np.bincount(intervalo, minlength=n)
+            personas += np.bincount(intervalo, en_frame, n)
+            cumplen += np.bincount(intervalo, en_frame.astype(np.int64) - no_conformes, n)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            porcentaje = np.round(cumplen / personas * 100, 1)
+        return {
+            'desde': desde,
+            'paso': paso,
+            't': (desde + paso * np.arange(n)).tolist(),
+            'frames': frames.astype(np.int64).tolist(),
+            'personas': personas.astype(np.int64).tolist(),
+            'cumplimiento': [None if math.isnan(v) else v for v in porcentaje.tolist()],
+        }
+
+    def serie_clase(self, clase, desde, hasta, paso=60, stream=None, max_puntos=2000):
+        """Detecciones de una clase por intervalo; las horas sin esa clase se saltan por el índice del manifiesto"""
+        paso = max(1, int(paso), int(math.ceil((hasta - desde) / max_puntos)))
+        n = max(1, int(math.ceil((hasta - desde) / paso)))
+        conteo = np.zeros(n, dtype=np.int64)
+        codigo = self._codigo_stream(stream)
+        for inicio, carpeta, manifiesto in self.particiones(desde, hasta):
+            if not manifiesto['clases'].get(str(clase)):
+                continue
+            a, t, seleccion = self._rango(inicio, carpeta, manifiesto, desde, hasta, codigo)
+            c, d, frame = self._filas_de_frames(carpeta, manifiesto, 'detecciones', a, a + len(t))
+            frame = frame[self.leer(carpeta, manifiesto, 'detecciones', 'cls', c, d) == clase] - a
+            frame = frame[seleccion[frame]]
+            conteo += np.bincount(((t[frame] - desde) // paso).astype(np.int64), minlength=n)
+        return {'desde': desde, 'paso': paso, 't': (desde + paso * np.arange(n)).tolist(),
+                'conteo': conteo.tolist()}
+
+    def agregados(self, desde, hasta, stream=None):
+        """Totales del rango por clase (detecciones, frames, confianza media) y por persona
+        (observaciones, % de cumplimiento y faltantes por elemento)"""
+        codigo = self._codigo_stream(stream)
+        nombres = self.catalogo['nombres']
+        clases = np.zeros((256, 3))  # detecciones, frames con la clase, suma de confianzas
+        por_persona = np.zeros((len(nombres) + 1, 2 + len(EPP_REQUERIDO)))  # fila 0: sin identidad
+        total_frames = 0
+
+        for inicio, carpeta, manifiesto in self.particiones(desde, hasta):
+            if desde <= inicio and inicio + HORA <= hasta:
+                # Hora completa: alcanzan los acumulados del manifiesto
+                for clave, datos in manifiesto['streams'].items():
+                    if codigo is not None and int(clave) != codigo:
+                        continue
+                    total_frames += datos['frames']
+                    for clase, valores in datos['clases'].items():
+                        clases[int(clase)] += valores
+                    for nombre, valores in datos['personas'].items():
+                        if int(nombre) < len(nombres):
+                            por_persona[int(nombre) + 1] += valores
+                continue
+
+            a, t, seleccion = self._rango(inicio, carpeta, manifiesto, desde, hasta, codigo)
+            total_frames += int(seleccion.sum())
+            c, d, frame = self._filas_de_frames(carpeta, manifiesto, 'detecciones', a, a + len(t))
+            sel = seleccion[frame - a]
+            sumar_clases(clases, frame[sel], self.leer(carpeta, manifiesto, 'detecciones', 'cls', c, d)[sel],
+                         self.leer(carpeta, manifiesto, 'detecciones', 'conf', c, d)[sel])
+            c, d, frame = self._filas_de_frames(carpeta, manifiesto, 'personas', a, a + len(t))
+            sel = seleccion[frame - a]
+            sumar_personas(por_persona, *(self.leer(carpeta, manifiesto, 'personas', col, c, d)[sel]
+                                          for col in ('nombre', 'cumple', 'falta')))
+
+        resultado_clases = {}
+        for clase in np.flatnonzero(clases[:, 0]).tolist():
+            n, en_frames, conf = clases[clase]
+            resultado_clases[clase] = {'detecciones': int(n), 'frames': int(en_frames),
+                                       'confianza_media': round(float(conf / n), 3)}
+        resultado_personas = {}
+        for fila in np.flatnonzero(por_persona[:, 0]).tolist():
+            observaciones, cumple = por_persona[fila, :2]
+            resultado_personas[nombres[fila - 1] if fila else DESCONOCIDO] = {
+                'observaciones': int(observaciones),
+                'cumplimiento': round(float(cumple / observaciones) * 100, 1),
+                'faltantes': {e: int(por_persona[fila, 2 + j]) for j, e in enumerate(EPP_REQUERIDO)},
+            }
+        return {'desde': desde, 'hasta': hasta, 'frames': total_frames,
+                'clases': resultado_clases, 'personas': resultado_personas}
+
+    def estadisticas(self):
+        return {
+            'frames': self.frames,
+            'lotes_escritos': self.lotes_escritos,
+            'lotes_descartados': self.lotes_descartados,
+            'frames_descartados': self.frames_descartados,
+            'pendientes': self._cola.qsize(),
+            'bytes_escritos': self.bytes_escritos,
+            'errores': self.errores,
+        }
+
+    # ====== CONTROL ======
+
+    def flush(self, timeout=10):
+        """Entrega el lote en curso y espera a que el escritor termine lo pendiente"""
+        with self._lock:
+            self._entregar()
+        evento = threading.Event()
+        try:
+            self._cola.put(evento, timeout=timeout)
+        except queue.Full:
+            return False
+        return evento.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self._running = False
+        self._thread.join(timeout=5)
+
+
+# ====== ACUMULADOS ======
+
+def sumar_clases(clases, frame, cls, conf):
+    """Suma a `clases` (256 x 3) detecciones, frames distintos con la clase y confianzas por clase"""
+    cls = cls.astype(np.int64)
+    clases[:, 0] += np.bincount(cls, minlength=256)
+    clases[:, 1] += np.bincount(np.unique(frame.astype(np.int64) * 256 + cls) % 256, minlength=256)
+    clases[:, 2] += np.bincount(cls, conf.astype(np.float64), 256)
+
+
+def sumar_personas(por_persona, nombre, cumple, falta):
+    """Suma a `por_persona` (una fila por nombre + sin identidad) observaciones, cumplimientos y faltantes"""
+    fila = nombre.astype(np.int64) + 1
+    n = len(por_persona)
+    por_persona[:, 0] += np.bincount(fila, minlength=n)[:n]
+    por_persona[:, 1] += np.bincount(fila, cumple, n)[:n]
+    for j in range(len(EPP_REQUERIDO)):
+        por_persona[:, 2 + j] += np.bincount(fila, (falta >> j) & 1, n)[:n]
+
+
+def acumular(manifiesto, t, partes):
+    """Actualiza rango de tiempo, índice de clases y acumulados por stream del manifiesto con las filas nuevas"""
+    frames, detecciones, personas = partes['frames'], partes['detecciones'], partes['personas']
+    manifiesto['t_min'] = min(float(t[0]), manifiesto['t_min'] if manifiesto['t_min'] is not None else math.inf)
+    manifiesto['t_max'] = max(float(t[-1]), manifiesto['t_max'] or 0.0)
+    for clase, n in enumerate(np.bincount(detecciones['cls'], minlength=1).tolist()):
+        if n:
+            manifiesto['clases'][str(clase)] = manifiesto['clases'].get(str(clase), 0) + n
+
+    primero = manifiesto['filas']['frames'] - len(frames['t'])  # Índice en la partición del primer frame nuevo
+    stream_det = frames['stream'][detecciones['frame'] - primero]
+    stream_per = frames['stream'][personas['frame'] - primero]
+    minuto = (frames['t'] // (MINUTO * 1000)).astype(np.int64)
+    minutos = HORA // MINUTO
+    for stream in np.unique(frames['stream']).tolist():
+        datos = manifiesto['streams'].setdefault(str(stream), {
+            'frames': 0, 'minutos': [[0, 0, 0]] * minutos, 'clases': {}, 'personas': {}})
+        es = frames['stream'] == stream
+        datos['frames'] += int(es.sum())
+
+        # Por minuto: [frames, personas, personas que cumplen]
+        acumulado = np.asarray(datos['minutos'], dtype=np.int64)
+        en_frame = frames['personas'][es].astype(np.int64)
+        acumulado[:, 0] += np.bincount(minuto[es], minlength=minutos)
+        acumulado[:, 1] += np.bincount(minuto[es], en_frame, minutos).astype(np.int64)
+        acumulado[:, 2] += np.bincount(minuto[es], en_frame - frames['no_conformes'][es], minutos).astype(np.int64)
+        datos['minutos'] = acumulado.tolist()
+
+        clases = np.zeros((256, 3))
+        sel = stream_det == stream
+        sumar_clases(clases, detecciones['frame'][sel], detecciones['cls'][sel], detecciones['conf'][sel])
+        for clase in np.flatnonzero(clases[:, 0]).tolist():
+            previo = datos['clases'].get(str(clase), [0, 0, 0.0])
+            datos['clases'][str(clase)] = [previo[0] + int(clases[clase, 0]), previo[1] + int(clases[clase, 1]),
+                                           round(previo[2] + float(clases[clase, 2]), 3)]
+
+        sel = stream_per == stream
+        if sel.any():
+            nombres = personas['nombre'][sel]
+            por_persona = np.zeros((int(nombres.max()) + 2, 2 + len(EPP_REQUERIDO)))
+            sumar_personas(por_persona, nombres, personas['cumple'][sel], personas['falta'][sel])
+            for fila in np.flatnonzero(por_persona[:, 0]).tolist():
+                previo = datos['personas'].get(str(fila - 1), [0] * por_persona.shape[1])
+                datos['personas'][str(fila - 1)] = [a + int(b) for a, b in zip(previo, por_persona[fila])]
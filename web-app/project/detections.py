@@ -0,0 +1,124 @@
+"""Registro compacto de detecciones: arreglos NumPy (xyxy, conf, cls) por frame"""
+import cv2
+import numpy as np
+
+# Índices de clase del modelo best6.pt usados para el estado EPP
+CLASES_EPP = {
+    'casco': 0,
+    'chaleco': 1,
+    'gafas': 2,
+    'guantes': 3,
+    'persona': 4
+}
+
+# Mapeo de clases del modelo
+class_mapping = {
+    'casco': 'Casco',
+    'sin casco': 'Sin Casco',
+    'chaleco': 'Chaleco',
+    'sin chaleco': 'Sin Chaleco',
+    'gafas': 'Gafas',
+    'sin gafas': 'Sin Gafas',
+    'guante': 'Guantes',
+    'persona': 'Persona'
+}
+
+
+def estilos_clases(names):
+    """Etiqueta y color de dibujo para cada id de clase del modelo"""
+    estilos = {}
+    for class_id, class_name in names.items():
+        label = class_mapping.get(class_name, "Desconocido")
+        # Rojo para elementos faltantes, verde para elementos detectados
+        color = (0, 0, 255) if 'sin' in class_name.lower() else (0, 255, 0)
+        estilos[class_id] = (label, color)
+    return estilos
+
+
+def dibujar_cajas(frame, detecciones, estilos):
+    """Dibuja cajas y etiquetas usando las coordenadas enteras precalculadas"""
+    cajas = detecciones.coordenadas_enteras()
+    for (x1, y1, x2, y2), class_id, confidence in zip(cajas.tolist(), detecciones.cls.tolist(),
+                                                       detecciones.conf.tolist()):
+        estilo = estilos.get(class_id)
+        if estilo is None:
+            continue
+        label, color = estilo
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{label} ({confidence:.2f})",
+                    (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return frame
+
+
+class Detecciones:
+    """Detecciones de un frame en forma columnar.
+
+    xyxy: (N, 4) float32, conf: (N,) float32, cls: (N,) int32. Se construye una
+    sola vez por frame a partir de los resultados de YOLO y de aquí se derivan
+    el estado EPP, los conteos por clase y las coordenadas de dibujo.
+    """
+    __slots__ = ('xyxy', 'conf', 'cls')
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.ascontiguousarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.ascontiguousarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.ascontiguousarray(cls, dtype=np.int32).reshape(-1)
+
+    @classmethod
+    def vacias(cls):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_result(cls, result):
+        """Convierte un Results de ultralytics (una transferencia por tensor, no por caja)"""
+        boxes = getattr(result, 'boxes', None)
+        if boxes is None or len(boxes) == 0:
+            return cls.vacias()
+        return cls(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+
+    @classmethod
+    def from_results(cls, results):
+        """Une en un solo registro la lista de Results devuelta por model(frame)"""
+        partes = [cls.from_result(result) for result in results]
+        if len(partes) == 1:
+            return partes[0]
+        return cls.concatenar(partes)
+
+    @classmethod
+    def concatenar(cls, partes):
+        if not partes:
+            return cls.vacias()
+        return cls(np.concatenate([p.xyxy for p in partes]),
+                   np.concatenate([p.conf for p in partes]),
+                   np.concatenate([p.cls for p in partes]))
+
+    def __len__(self):
+        return len(self.cls)
+
+    def filtrar(self, mascara):
+        return Detecciones(self.xyxy[mascara], self.conf[mascara], self.cls[mascara])
+
+    def conteos(self, num_clases):
+        """Cantidad de cajas por clase (arreglo de largo num_clases)"""
+        if len(self.cls) == 0:
+            return np.zeros(num_clases, dtype=np.int64)
+        return np.bincount(self.cls, minlength=num_clases)[:num_clases]
+
+    def presentes(self, class_ids):
+        """Arreglo booleano: para cada id de class_ids, si hay al menos una caja"""
+        class_ids = np.asarray(class_ids, dtype=np.int32)
+        return np.isin(class_ids, self.cls)
+
+    def coordenadas_enteras(self):
+        return self.xyxy.astype(np.int32)
+
+    def to_dict(self, names=None):
+        """Versión serializable a JSON"""
+        data = {
+            'xyxy': self.xyxy.round(1).tolist(),
+            'conf': self.conf.round(3).tolist(),
+            'cls': self.cls.tolist()
+        }
+        if names is not None:
+            data['names'] = [names.get(int(c), str(c)) for c in self.cls]
+        return data
@@ -0,0 +1,90 @@
+"""Canal de eventos (Server-Sent Events) para empujar el estado EPP a los navegadores"""
+import json
+import threading
+
+
+def formatear_evento(evento, datos):
+    return f"event: {evento}\ndata: {json.dumps(datos, separators=(',', ':'))}\n\n"
+
+
+def evento_cambios(enviado, estado):
+    """Mensaje SSE con las claves de `estado` que difieren de `enviado` (None si no cambió nada)"""
+    delta = {k: v for k, v in estado.items() if enviado.get(k) != v}
+    return formatear_evento('status', {'full': False, 'status': delta}) if delta else None
+
+
+class StatusHub:
+    """Productor único de estado compartido por todos los suscriptores.
+
+    publicar() solo incrementa la versión si el estado cambió. Cada suscriptor
+    recibe primero el estado completo y luego únicamente las claves que
+    cambiaron desde lo último que se le envió; si no hay cambios durante
+    `heartbeat` segundos se envía un comentario SSE para mantener viva la conexión.
+    Los oyentes registrados con agregar_oyente() reciben cada versión nueva.
+    """
+
+    def __init__(self, heartbeat=15.0):
+        self.heartbeat = heartbeat
+        self._cond = threading.Condition()
+        self._estado = {}
+        self.version = 0
+        self.subscribers = 0
+        self._oyentes = []
+
+    def publicar(self, estado):
+        with self._cond:
+            if estado == self._estado:
+                return False
+            self._estado = dict(estado)
+            self.version += 1
+            version, estado = self.version, self._estado
+            self._cond.notify_all()
+        for oyente in self._oyentes:
+            oyente(version, estado)
+        return True
+
+    def agregar_oyente(self, oyente):
+        """oyente(version, estado) se llama con cada estado nuevo, desde el hilo que publica"""
+        self._oyentes = self._oyentes + [oyente]
+
+    def quitar_oyente(self, oyente):
+        self._oyentes = [o for o in self._oyentes if o is not oyente]
+
+    def conectar(self):
+        with self._cond:
+            self.subscribers += 1
+
+    def desconectar(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def snapshot(self):
+        with self._cond:
+            return self.version, self._estado
+
+    def esperar(self, version, timeout=None):
+        """Espera una versión distinta de `version`; devuelve (version, estado) o (version, None)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            if self.version == version:
+                return version, None
+            return self.version, self._estado
+
+    def eventos(self):
+        """Generador de mensajes SSE para un cliente"""
+        self.conectar()
+        try:
+            version, estado = self.snapshot()
+            enviado = estado
+            yield formatear_evento('status', {'full': True, 'status': estado})
+            while True:
+                version, estado = self.esperar(version, self.heartbeat)
+                if estado is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                mensaje = evento_cambios(enviado, estado)
+                enviado = estado
+                if mensaje:
+                    yield mensaje
+        finally:
+            self.desconectar()
@@ -0,0 +1,162 @@
+"""Caché persistente de codificaciones faciales de la galería Personal/"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+EXTENSIONES = ('.jpg', '.jpeg', '.png', '.bmp')
+DIMENSION = 128
+
+
+def sha1_archivo(ruta):
+    h = hashlib.sha1()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class CacheRostros:
+    """Codificaciones de 128 dimensiones guardadas en un .npy (cargado con mmap) más un manifiesto.
+
+    El manifiesto se indexa por ruta relativa y guarda tamaño, mtime, sha1,
+    nombre y fila del arreglo. refrescar() solo vuelve a codificar las imágenes
+    nuevas o cuyo contenido cambió; renombrar o tocar un archivo no obliga a
+    recalcular su codificación.
+    """
+
+    MANIFIESTO = 'manifest.json'
+
+    def __init__(self, carpeta, carpeta_cache='.cache_rostros', codificar=None):
+        self.carpeta = carpeta
+        self.carpeta_cache = carpeta_cache
+        self.codificar = codificar  # imagen BGR -> vector de 128 o None si no hay rostro
+        self.codificaciones = np.empty((0, DIMENSION), dtype=np.float64)
+        self.nombres = []
+        self._entradas = {}
+        self._archivo_codificaciones = None
+        self._lock = threading.Lock()
+        os.makedirs(self.carpeta_cache, exist_ok=True)
+        self._cargar()
+
+    # ====== LECTURA / ESCRITURA DE LA CACHÉ ======
+
+    def _cargar(self):
+        ruta_manifiesto = os.path.join(self.carpeta_cache, self.MANIFIESTO)
+        if not os.path.exists(ruta_manifiesto):
+            return
+        try:
+            with open(ruta_manifiesto, encoding='utf-8') as f:
+                manifiesto = json.load(f)
+            archivo = manifiesto.get('encodings_file')
+            codificaciones = np.empty((0, DIMENSION), dtype=np.float64)
+            if archivo:
+                codificaciones = np.load(os.path.join(self.carpeta_cache, archivo), mmap_mode='r')
+            self._entradas = manifiesto.get('entries', {})
+            self._archivo_codificaciones = archivo
+            self._publicar(codificaciones)
+        except Exception as e:
+            print(f"⚠️ Caché de rostros inválida, se regenerará: {e}")
+            self._entradas = {}
+
+    def _publicar(self, codificaciones):
+        """Actualiza codificaciones y nombres en el orden de las filas del arreglo"""
+        con_rostro = sorted((e['row'], e['nombre']) for e in self._entradas.values() if e.get('row') is not None)
+        self.nombres = [nombre for _, nombre in con_rostro]
+        self.codificaciones = codificaciones
+
+    def _guardar(self, codificaciones):
+        """Escribe un .npy nuevo y luego reemplaza el manifiesto de forma atómica"""
+        anterior = self._archivo_codificaciones
+        archivo = f"encodings-{uuid.uuid4().hex[:8]}.npy"
+        np.save(os.path.join(self.carpeta_cache, archivo), codificaciones)
+
+        ruta_manifiesto = os.path.join(self.carpeta_cache, self.MANIFIESTO)
+        with open(ruta_manifiesto + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'encodings_file': archivo, 'entries': self._entradas}, f, indent=1)
+        os.replace(ruta_manifiesto + '.tmp', ruta_manifiesto)
+        self._archivo_codificaciones = archivo
+
+        if anterior:
+            try:
+                os.remove(os.path.join(self.carpeta_cache, anterior))
+            except OSError:
+                pass  # Puede seguir mapeado (Windows); se limpia en el próximo guardado
+
+    # ====== REFRESCO INCREMENTAL ======
+
+    def refrescar(self):
+        """Sincroniza la caché con la carpeta; devuelve un resumen de lo hecho"""
+        with self._lock:
+            t0 = time.perf_counter()
+            resumen = {'reutilizadas': 0, 'codificadas': 0, 'sin_rostro': 0, 'eliminadas': 0}
+            if not os.path.exists(self.carpeta):
+                print("⚠️ Directorio Personal no encontrado")
+                return resumen
+
+            anteriores = self._entradas
+            por_hash = {e['sha1']: e for e in anteriores.values()}
+            vectores, entradas = [], {}
+
+            for archivo in sorted(os.listdir(self.carpeta)):
+                if not archivo.lower().endswith(EXTENSIONES):
+                    continue
+                ruta = os.path.join(self.carpeta, archivo)
+                try:
+                    info = os.stat(ruta)
+                    previa = anteriores.get(archivo)
+                    if previa and previa['size'] == info.st_size and previa['mtime_ns'] == info.st_mtime_ns:
+                        sha1 = previa['sha1']
+                    else:
+                        sha1 = sha1_archivo(ruta)
+                        previa = por_hash.get(sha1)  # Mismo contenido (tocado o renombrado)
+
+                    if previa is not None:
+                        vector = self.codificaciones[previa['row']] if previa.get('row') is not None else None
+                        resumen['reutilizadas'] += 1
+                    else:
+                        vector = self._codificar(ruta)
+                        resumen['codificadas'] += 1
+                except Exception as e:
+                    print(f"Error cargando {archivo}: {e}")
+                    continue
+
+                entrada = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns, 'sha1': sha1,
+                           'nombre': os.path.splitext(archivo)[0], 'row': None}
+                if vector is None:
+                    resumen['sin_rostro'] += 1
+                else:
+                    entrada['row'] = len(vectores)
+                    vectores.append(np.asarray(vector, dtype=np.float64))
+                entradas[archivo] = entrada
+
+            resumen['eliminadas'] = len(set(anteriores) - set(entradas))
+            cambio = resumen['codificadas'] or resumen['eliminadas'] or entradas != anteriores
+            codificaciones = np.stack(vectores) if vectores else np.empty((0, DIMENSION), dtype=np.float64)
+
+            self._entradas = entradas
+            if cambio:
+                self._guardar(codificaciones)
+                # Volver a mapear desde disco para no retener la copia en memoria
+                codificaciones = np.load(os.path.join(self.carpeta_cache, self._archivo_codificaciones),
+                                         mmap_mode='r')
+            else:
+                codificaciones = self.codificaciones
+            self._publicar(codificaciones)
+
+            resumen['rostros'] = len(self.nombres)
+            resumen['ms'] = round((time.perf_counter() - t0) * 1000, 1)
+            return resumen
+
+    def _codificar(self, ruta):
+        if self.codificar is None:
+            return None
+        img = cv2.imread(ruta)
+        if img is None:
+            raise ValueError('imagen ilegible')
+        return self.codificar(img)
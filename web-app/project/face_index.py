@@ -0,0 +1,102 @@
+"""Índice de la galería de rostros: vecino más cercano vectorizado y particionado opcional"""
+import numpy as np
+
+
+class IndiceRostros:
+    """Galería apilada en una matriz float32 contigua.
+
+    buscar() compara todos los rostros de un frame contra toda la galería en una
+    sola operación matricial y devuelve el más cercano (no el primero bajo la
+    tolerancia). Con galerías grandes (>= umbral_particion) se agrupa la galería
+    en particiones con k-means y solo se revisan las `sondas` más cercanas.
+    """
+
+    def __init__(self, codificaciones, nombres, tolerancia=0.6, umbral_particion=2000, sondas=4):
+        self.matriz = np.ascontiguousarray(np.asarray(codificaciones, dtype=np.float32).reshape(-1, 128))
+        self.normas = np.einsum('ij,ij->i', self.matriz, self.matriz)
+        self.nombres = list(nombres)
+        self.tolerancia = tolerancia
+        self.sondas = sondas
+        self.centroides = None
+        self.listas = None
+        if len(self.nombres) >= umbral_particion:
+            self._particionar()
+
+    def __len__(self):
+        return len(self.nombres)
+
+    @property
+    def particionado(self):
+        return self.centroides is not None
+
+    # ====== DISTANCIAS ======
+
+    @staticmethod
+    def _distancias(consultas, matriz, normas):
+        """Distancias euclidianas (M, N) con ||q||² + ||g||² - 2·q·gᵀ"""
+        q2 = np.einsum('ij,ij->i', consultas, consultas)[:, None]
+        d2 = q2 + normas[None, :] - 2.0 * (consultas @ matriz.T)
+        return np.sqrt(np.maximum(d2, 0.0, out=d2), out=d2)
+
+    def distancias(self, consultas):
+        consultas = np.asarray(consultas, dtype=np.float32).reshape(-1, 128)
+        return self._distancias(consultas, self.matriz, self.normas)
+
+    # ====== BÚSQUEDA ======
+
+    def buscar(self, consultas):
+        """Devuelve [(nombre o None, distancia, índice)] para cada codificación consultada"""
+        consultas = np.asarray(consultas, dtype=np.float32).reshape(-1, 128)
+        if len(consultas) == 0 or len(self) == 0:
+            return [(None, float('inf'), -1) for _ in range(len(consultas))]
+
+        if self.particionado:
+            indices, mejores = self._buscar_particionado(consultas)
+        else:
+            d = self._distancias(consultas, self.matriz, self.normas)
+            indices = d.argmin(axis=1)
+            mejores = d[np.arange(len(consultas)), indices]
+
+        return [(self.nombres[i] if dist <= self.tolerancia else None, float(dist), int(i))
+                for i, dist in zip(indices.tolist(), mejores.tolist())]
+
+    def _buscar_particionado(self, consultas):
+        sondas = min(self.sondas, len(self.centroides))
+        d_centroides = self._distancias(consultas, self.centroides, self.normas_centroides)
+        cercanas = np.argpartition(d_centroides, sondas - 1, axis=1)[:, :sondas]
+
+        indices = np.empty(len(consultas), dtype=np.int64)
+        mejores = np.empty(len(consultas), dtype=np.float32)
+        for q, particiones in enumerate(cercanas):
+            candidatos = np.concatenate([self.listas[p] for p in particiones])
+            d = self._distancias(consultas[q:q + 1], self.matriz[candidatos], self.normas[candidatos])[0]
+            j = d.argmin()
+            indices[q], mejores[q] = candidatos[j], d[j]
+        return indices, mejores
+
+    def _particionar(self, iteraciones=10, semilla=0):
+        """k-means (k ≈ √N) sobre la galería; cada partición guarda los índices de sus filas"""
+        n = len(self.matriz)
+        k = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(semilla)
+        centroides = self.matriz[rng.choice(n, k, replace=False)].copy()
+        for _ in range(iteraciones):
+            normas_c = np.einsum('ij,ij->i', centroides, centroides)
+            asignacion = self._distancias(self.matriz, centroides, normas_c).argmin(axis=1)
+            conteos = np.bincount(asignacion, minlength=k)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, self.matriz)
+            vacias = conteos == 0
+            centroides[~vacias] = sumas[~vacias] / conteos[~vacias, None]
+
+        normas_c = np.einsum('ij,ij->i', centroides, centroides)
+        asignacion = self._distancias(self.matriz, centroides, normas_c).argmin(axis=1)
+        orden = np.argsort(asignacion, kind='stable')
+        cortes = np.cumsum(np.bincount(asignacion, minlength=k))[:-1]
+        listas = np.split(orden, cortes)
+
+        # Descartar particiones vacías para no sondearlas
+        llenas = [i for i, lista in enumerate(listas) if len(lista)]
+        self.centroides = centroides[llenas]
+        self.normas_centroides = normas_c[llenas]
+        self.listas = [listas[i] for i in llenas]
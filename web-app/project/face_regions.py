@@ -0,0 +1,136 @@
+"""Búsqueda de rostros solo en la parte superior de las cajas 'persona' (recortes en un mosaico)"""
+import contextlib
+
+import cv2
+import numpy as np
+
+
+def regiones_cabeza(cajas, ancho, alto, fraccion=0.45, margen=0.15, lado_min=12):
+    """Parte superior de cada caja persona (xyxy) ampliada un margen; devuelve (regiones int (N, 4), índices)"""
+    cajas = np.asarray(cajas, dtype=np.float32).reshape(-1, 4)
+    w = cajas[:, 2] - cajas[:, 0]
+    h = cajas[:, 3] - cajas[:, 1]
+    regiones = np.stack([
+        cajas[:, 0] - w * margen,
+        cajas[:, 1] - h * margen * 0.5,
+        cajas[:, 2] + w * margen,
+        cajas[:, 1] + h * fraccion,
+    ], axis=1)
+    np.clip(regiones, 0, [ancho, alto, ancho, alto], out=regiones)
+    regiones = regiones.round().astype(np.int32)
+    validas = ((regiones[:, 2] - regiones[:, 0]) >= lado_min) & ((regiones[:, 3] - regiones[:, 1]) >= lado_min)
+    return regiones[validas], np.flatnonzero(validas)
+
+
+def armar_mosaico(frame, regiones, alto=160, separacion=16, ancho_max=1280):
+    """Copia cada región (a resolución completa) reescalada a `alto` px en un único lienzo.
+
+    Las regiones se acomodan en filas de hasta `ancho_max` px separadas por
+    `separacion` px de fondo negro, de modo que un solo paso de detección
+    recorre todas las personas. Una región más ancha que `ancho_max` se
+    reduce con la misma escala en ambos ejes (queda más baja, con relleno
+    negro debajo) para no deformar los rostros. Devuelve (lienzo, teselas)
+    con una tesela (x, y, ancho, alto, escala) por región.
+    """
+    teselas, x, y, ancho_usado = [], 0, 0, 0
+    for x1, y1, x2, y2 in regiones.tolist():
+        escala = min(alto / (y2 - y1), ancho_max / (x2 - x1))
+        ancho = min(ancho_max, max(1, int(round((x2 - x1) * escala))))
+        alto_t = min(alto, max(1, int(round((y2 - y1) * escala))))
+        if x and x + ancho > ancho_max:
+            x, y = 0, y + alto + separacion
+        teselas.append((x, y, ancho, alto_t, escala))
+        x += ancho + separacion
+        ancho_usado = max(ancho_usado, x)
+
+    lienzo = np.zeros((y + alto, max(1, ancho_usado - separacion), 3), dtype=np.uint8) if teselas else None
+    for (x1, y1, x2, y2), (tx, ty, ancho, alto_t, _) in zip(regiones.tolist(), teselas):
+        lienzo[ty:ty + alto_t, tx:tx + ancho] = cv2.resize(frame[y1:y2, x1:x2], (ancho, alto_t),
+                                                            interpolation=cv2.INTER_LINEAR)
+    return lienzo, teselas
+
+
+def asignar_rostros(ubicaciones, teselas, regiones):
+    """Mapea rostros (top, right, bottom, left) del mosaico al frame; se queda con el mayor por región.
+
+    Devuelve [(índice de región, posición en `ubicaciones`, (top, right, bottom, left) en el frame)].
+    """
+    mejores = {}
+    for i, (top, right, bottom, left) in enumerate(ubicaciones):
+        cx, cy = (left + right) / 2, (top + bottom) / 2
+        for r, (tx, ty, ancho, alto, escala) in enumerate(teselas):
+            if tx <= cx < tx + ancho and ty <= cy < ty + alto:
+                area = (right - left) * (bottom - top)
+                if r not in mejores or area > mejores[r][0]:
+                    x0, y0 = regiones[r][0], regiones[r][1]
+                    en_frame = (int(y0 + (max(top, ty) - ty) / escala),
+                                int(x0 + (min(right, tx + ancho) - tx) / escala),
+                                int(y0 + (min(bottom, ty + alto) - ty) / escala),
+                                int(x0 + (max(left, tx) - tx) / escala))
+                    mejores[r] = (area, i, en_frame)
+                break
+    return [(r, i, en_frame) for r, (_, i, en_frame) in sorted(mejores.items())]
+
+
+def sin_duplicados(asignados, umbral=0.5):
+    """Descarta rostros que se solapan con uno ya aceptado (personas superpuestas comparten rostro)"""
+    aceptados = []
+    for asignado in asignados:
+        top, right, bottom, left = asignado[2]
+        repetido = False
+        for _, _, (t, r, b, l) in aceptados:
+            inter = max(0, min(right, r) - max(left, l)) * max(0, min(bottom, b) - max(top, t))
+            union = (right - left) * (bottom - top) + (r - l) * (b - t) - inter
+            if union > 0 and inter / union > umbral:
+                repetido = True
+                break
+        if not repetido:
+            aceptados.append(asignado)
+    return aceptados
+
+
+def _sin_medir(etapa):
+    return contextlib.nullcontext()
+
+
+def localizar_y_codificar(frame, escala=0.25, medir=None):
+    """Ubica y codifica rostros del frame completo a escala reducida.
+
+    Devuelve (ubicaciones a escala completa, codificaciones). `medir(etapa)` es
+    un context manager opcional para cronometrar cada paso.
+    """
+    import face_recognition as fr
+    medir = medir or _sin_medir
+    with medir('rostros_ubicar'):
+        pequeño = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=escala, fy=escala), cv2.COLOR_BGR2RGB)
+        ubicaciones = fr.face_locations(pequeño, model='hog')
+    with medir('rostros_codificar'):
+        codificaciones = fr.face_encodings(pequeño, ubicaciones, num_jitters=1)
+    return [tuple(int(v / escala) for v in ubicacion) for ubicacion in ubicaciones], codificaciones
+
+
+def localizar_y_codificar_en_personas(frame, cajas, fraccion=0.45, alto=256, medir=None):
+    """Ubica y codifica rostros solo en la parte superior de cada caja persona, a resolución completa.
+
+    Las regiones se reúnen en un mosaico para ubicar y codificar todos los
+    rostros en una sola pasada. Devuelve ([(índice de caja, (top, right,
+    bottom, left), codificación)] con a lo sumo un rostro por caja, regiones
+    recorridas).
+    """
+    import face_recognition as fr
+    medir = medir or _sin_medir
+    with medir('rostros_ubicar'):
+        regiones, indices = regiones_cabeza(cajas, frame.shape[1], frame.shape[0], fraccion=fraccion)
+        if not len(regiones):
+            return [], 0
+        mosaico, teselas = armar_mosaico(frame, regiones, alto=alto)
+        mosaico = cv2.cvtColor(mosaico, cv2.COLOR_BGR2RGB)
+        # Las regiones ya vienen ampliadas: HOG sin sobremuestreo adicional
+        ubicaciones = fr.face_locations(mosaico, number_of_times_to_upsample=0, model='hog')
+        asignados = sin_duplicados(asignar_rostros(ubicaciones, teselas, regiones))
+    if not asignados:
+        return [], len(regiones)
+    with medir('rostros_codificar'):
+        codificaciones = fr.face_encodings(mosaico, [ubicaciones[i] for _, i, _ in asignados], num_jitters=1)
+    return [(int(indices[r]), ubicacion, codificacion)
+            for (r, _, ubicacion), codificacion in zip(asignados, codificaciones)], len(regiones)
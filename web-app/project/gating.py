@@ -0,0 +1,59 @@
+"""Filtro de movimiento: evita inferir sobre frames en los que la escena no cambió"""
+import time
+
+import cv2
+import numpy as np
+
+
+class FiltroMovimiento:
+    """Compara una miniatura en grises del frame con la del último frame inferido.
+
+    Si la fracción de píxeles que cambiaron más de `umbral_pixel` niveles es
+    menor que `umbral_cambio`, se reutilizan las detecciones anteriores. Aun sin
+    cambios se fuerza una inferencia cada `intervalo_max` segundos.
+    """
+
+    def __init__(self, tamano=(64, 48), umbral_pixel=18, umbral_cambio=0.01, intervalo_max=2.0):
+        self.tamano = tamano
+        self.umbral_pixel = umbral_pixel
+        self.umbral_cambio = umbral_cambio
+        self.intervalo_max = intervalo_max
+        self.evaluados = 0
+        self.omitidos = 0
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida la referencia: el próximo frame siempre se infiere"""
+        self._referencia = None
+        self._t_referencia = 0.0
+        self.ultimo_cambio = None
+
+    def miniatura(self, frame):
+        gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        pequeña = cv2.resize(gris, self.tamano, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(pequeña, (3, 3), 0)
+
+    def necesita_inferencia(self, frame):
+        """True si el frame debe pasar por el modelo (y pasa a ser la nueva referencia)"""
+        self.evaluados += 1
+        miniatura = self.miniatura(frame)
+        ahora = time.monotonic()
+
+        if self._referencia is not None and ahora - self._t_referencia < self.intervalo_max:
+            diferencia = cv2.absdiff(miniatura, self._referencia)
+            self.ultimo_cambio = float(np.count_nonzero(diferencia > self.umbral_pixel)) / diferencia.size
+            if self.ultimo_cambio < self.umbral_cambio:
+                self.omitidos += 1
+                return False
+
+        self._referencia = miniatura
+        self._t_referencia = ahora
+        return True
+
+    def estadisticas(self):
+        return {
+            'evaluados': self.evaluados,
+            'omitidos': self.omitidos,
+            'skip_ratio': round(self.omitidos / self.evaluados, 3) if self.evaluados else 0.0,
+            'ultimo_cambio': round(self.ultimo_cambio, 4) if self.ultimo_cambio is not None else None,
+        }
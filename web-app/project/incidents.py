@@ -0,0 +1,292 @@
+"""Incidentes de EPP: búfer circular de JPEG por stream y clips con pre/post-roll escritos en segundo plano"""
+import collections
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from broadcaster import mjpeg_part
+from detections import CLASES_EPP
+
+
+class BufferFrames:
+    """Últimos frames codificados de un stream, acotados por antigüedad y por bytes.
+
+    Guarda referencias a los mismos bytes JPEG que ya se publicaron: no se
+    copia ni se recodifica nada.
+    """
+
+    def __init__(self, segundos=10.0, max_bytes=32 * 1024 * 1024):
+        self.segundos = segundos
+        self.max_bytes = max_bytes
+        self._frames = collections.deque()  # (t, jpeg)
+        self.bytes = 0
+        self.descartados = 0
+
+    def agregar(self, t, jpeg):
+        self._frames.append((t, jpeg))
+        self.bytes += len(jpeg)
+        while self._frames and (self._frames[0][0] < t - self.segundos or self.bytes > self.max_bytes):
+            _, viejo = self._frames.popleft()
+            self.bytes -= len(viejo)
+            self.descartados += 1
+
+    def desde(self, t):
+        """Frames con marca de tiempo >= t (en orden)"""
+        return [frame for frame in self._frames if frame[0] >= t]
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class Incidente:
+    """Violación confirmada en un stream mientras se completa su post-roll"""
+
+    def __init__(self, stream, elementos, t_inicio, frames):
+        self.stream = stream
+        self.elementos = set(elementos)
+        self.t_inicio = t_inicio       # Primer frame con la violación (monotonic)
+        self.t_ultimo = t_inicio       # Último frame con la violación
+        self.inicio = datetime.now() - timedelta(seconds=time.monotonic() - t_inicio)
+        self.frames = frames           # [(t, jpeg)] desde el pre-roll
+        self.frames_violacion = 0
+        self.max_personas = 0
+
+
+class MotorIncidentes:
+    """Convierte violaciones persistentes en clips de evidencia y registros JSONL.
+
+    observar() corre en el camino caliente: agrega el JPEG al búfer del stream
+    y cuenta los frames consecutivos con alguna clase de violación vigilada.
+    Al llegar a `frames_min` se abre un incidente con los frames de los
+    últimos `pre_roll` segundos previos a la primera violación; sigue sumando
+    frames hasta `post_roll` segundos después de la última (o hasta
+    `duracion_max`) y entonces pasa al hilo escritor, que guarda el clip
+    (.mjpeg, los JPEG concatenados tal cual) y agrega una línea a
+    incidentes.jsonl.
+    """
+
+    def __init__(self, carpeta, frames_min=15, pre_roll=5.0, post_roll=5.0, duracion_max=60.0,
+                 max_bytes=32 * 1024 * 1024, historial=200):
+        self.carpeta = carpeta
+        self.archivo_registro = os.path.join(carpeta, 'incidentes.jsonl')
+        self.frames_min = frames_min
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.duracion_max = duracion_max
+        self.max_bytes = max_bytes
+        self.clases = {}  # {id de clase de violación: elemento}; se fija al cargar el modelo
+        self._ids_clases = np.empty(0, dtype=np.int32)
+        self._buffers = {}
+        self._racha = collections.defaultdict(int)   # Frames consecutivos con violación por stream
+        self._t_racha = {}                            # Primer frame de la racha actual
+        self._activos = {}
+        self._recientes = collections.deque(maxlen=historial)
+        self._lock = threading.Lock()
+        self._cola = queue.Queue()
+        self._secuencia = 0
+        self.abiertos = 0
+        self.escritos = 0
+        self.bytes_escritos = 0
+        self.errores = 0
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def fijar_clases(self, clases):
+        """{id de clase: elemento} de las violaciones que generan incidentes"""
+        self.clases = dict(clases)
+        self._ids_clases = np.array(sorted(self.clases), dtype=np.int32)
+
+    # ====== CAMINO CALIENTE ======
+
+    def observar(self, stream, jpeg, detecciones=None):
+        """Registra un frame publicado y sus detecciones (None si la detección está apagada)"""
+        if jpeg is None:
+            return
+        t = time.monotonic()
+        with self._lock:
+            buffer = self._buffers.get(stream)
+            if buffer is None:
+                buffer = self._buffers[stream] = BufferFrames(self.pre_roll + 10.0, self.max_bytes)
+            buffer.agregar(t, jpeg)
+
+            elementos = ()
+            if detecciones is not None and len(self._ids_clases) and len(detecciones.cls):
+                presentes = np.unique(detecciones.cls[np.isin(detecciones.cls, self._ids_clases)])
+                elementos = [self.clases[int(c)] for c in presentes]
+            personas = int(np.count_nonzero(detecciones.cls == CLASES_EPP['persona'])) if elementos else 0
+
+            if elementos:
+                if self._racha[stream] == 0:
+                    self._t_racha[stream] = t
+                self._racha[stream] += 1
+            else:
+                self._racha[stream] = 0
+
+            incidente = self._activos.get(stream)
+            if incidente is None:
+                if self._racha[stream] >= self.frames_min:
+                    t_racha = self._t_racha[stream]
+                    incidente = Incidente(stream, elementos, t_racha, buffer.desde(t_racha - self.pre_roll))
+                    incidente.frames_violacion = self._racha[stream]
+                    incidente.max_personas = personas
+                    self._activos[stream] = incidente
+                    self.abiertos += 1
+                    print(f"⚠️ Incidente en stream {stream}: sin {', '.join(sorted(incidente.elementos))}")
+                return
+
+            incidente.frames.append((t, jpeg))
+            if elementos:
+                incidente.elementos.update(elementos)
+                incidente.t_ultimo = t
+                incidente.frames_violacion += 1
+                incidente.max_personas = max(incidente.max_personas, personas)
+            if t - incidente.t_ultimo >= self.post_roll or t - incidente.t_inicio >= self.duracion_max:
+                del self._activos[stream]
+                self._racha[stream] = 0
+                self._cola.put(incidente)
+
+    # ====== HILO ESCRITOR ======
+
+    def _cargar_registro(self):
+        """Recupera los últimos registros de ejecuciones anteriores"""
+        try:
+            if os.path.exists(self.archivo_registro):
+                with open(self.archivo_registro, encoding='utf-8') as f:
+                    registros = [json.loads(linea) for linea in f if linea.strip()]
+                with self._lock:
+                    self._recientes.extendleft(reversed(registros[-self._recientes.maxlen:]))
+        except Exception as e:
+            print(f"Error leyendo {self.archivo_registro}: {e}")
+
+    def _run(self):
+        self._cargar_registro()
+        while self._running or not self._cola.empty():
+            try:
+                item = self._cola.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if isinstance(item, threading.Event):
+                item.set()
+            else:
+                self._escribir(item)
+
+    def _escribir(self, incidente):
+        with self._lock:
+            self._secuencia += 1
+            secuencia = self._secuencia
+        incidente_id = f"{incidente.stream}_{incidente.inicio.strftime('%Y%m%d_%H%M%S')}_{secuencia}"
+        archivo = f"{incidente_id}.mjpeg"
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            with open(os.path.join(self.carpeta, archivo), 'wb') as f:
+                for _, jpeg in incidente.frames:
+                    f.write(jpeg)
+            t0 = incidente.frames[0][0]
+            duracion = incidente.frames[-1][0] - t0
+            registro = {
+                'id': incidente_id,
+                'stream': incidente.stream,
+                'elementos': sorted(incidente.elementos),
+                'inicio': incidente.inicio.isoformat(timespec='seconds'),
+                'violacion_s': round(incidente.t_ultimo - incidente.t_inicio, 2),
+                'frames_violacion': incidente.frames_violacion,
+                'max_personas': incidente.max_personas,
+                'clip': archivo,
+                'frames': len(incidente.frames),
+                'duracion_s': round(duracion, 2),
+                'pre_roll_s': round(incidente.t_inicio - t0, 2),
+                'fps': round((len(incidente.frames) - 1) / duracion, 2) if duracion > 0 else 0.0,
+                'bytes': sum(len(jpeg) for _, jpeg in incidente.frames),
+            }
+            with open(self.archivo_registro, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        except Exception as e:
+            self.errores += 1
+            print(f"Error escribiendo incidente {incidente_id}: {e}")
+            return
+        with self._lock:
+            self.escritos += 1
+            self.bytes_escritos += registro['bytes']
+            self._recientes.append(registro)
+        print(f"✅ Incidente guardado: {archivo} ({registro['frames']} frames, {registro['duracion_s']} s)")
+
+    # ====== CONSULTA ======
+
+    def recientes(self, n=50):
+        """Registros de los últimos incidentes (más reciente primero)"""
+        with self._lock:
+            return list(self._recientes)[::-1][:n]
+
+    def buscar(self, incidente_id):
+        for registro in self.recientes(self._recientes.maxlen):
+            if registro['id'] == incidente_id:
+                return registro
+        return None
+
+    def leer_clip(self, registro, velocidad=1.0):
+        """(lista de JPEG del clip, segundos entre frames para reproducirlo a su velocidad original)"""
+        with open(os.path.join(self.carpeta, registro['clip']), 'rb') as f:
+            datos = f.read()
+        jpegs, inicio = [], 0
+        while True:
+            # Cada JPEG va de SOI (FFD8) a EOI (FFD9); OpenCV no incluye miniaturas
+            fin = datos.find(b'\xff\xd9', inicio)
+            if fin < 0:
+                break
+            jpegs.append(datos[inicio:fin + 2])
+            inicio = fin + 2
+        periodo = 1.0 / (registro['fps'] * velocidad) if registro['fps'] else 0.0
+        return jpegs, periodo
+
+    def reproducir(self, registro, velocidad=1.0):
+        """Generador de partes MJPEG del clip a su velocidad original"""
+        jpegs, periodo = self.leer_clip(registro, velocidad)
+        for seq, jpeg in enumerate(jpegs, 1):
+            yield mjpeg_part(jpeg, seq)
+            if periodo:
+                time.sleep(periodo)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'clases': sorted(set(self.clases.values())),
+                'activos': sorted(self._activos),
+                'abiertos': self.abiertos,
+                'escritos': self.escritos,
+                'pendientes': self._cola.qsize(),
+                'bytes_escritos': self.bytes_escritos,
+                'errores': self.errores,
+                'buffers': {stream: {'frames': len(b), 'bytes': b.bytes, 'descartados': b.descartados}
+                            for stream, b in self._buffers.items()},
+            }
+
+    # ====== CONTROL ======
+
+    def cerrar_activos(self, stream=None):
+        """Envía al escritor los incidentes abiertos de un stream, o de todos (p. ej. al detener la fuente)"""
+        with self._lock:
+            streams = [stream] if stream is not None else list(self._activos)
+            activos = [self._activos.pop(s) for s in streams if s in self._activos]
+            for s in streams:
+                self._racha[s] = 0
+                self._buffers.pop(s, None)
+        for incidente in activos:
+            self._cola.put(incidente)
+
+    def flush(self, timeout=10):
+        evento = threading.Event()
+        self._cola.put(evento)
+        return evento.wait(timeout)
+
+    def close(self):
+        self.cerrar_activos()
+        self.flush()
+        self._running = False
+        self._thread.join(timeout=5)
@@ -0,0 +1,145 @@
+"""Métricas de rendimiento: latencias por etapa, FPS, contadores y medidores por stream"""
+import collections
+import contextlib
+import threading
+import time
+
+import cv2
+
+from pipeline import StageStats
+
+PREFIJO = 'epp'
+CUANTILES = (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms'))
+
+
+def _etiquetas(**etiquetas):
+    pares = ','.join(f'{k}="{str(v).replace(chr(34), "")}"' for k, v in etiquetas.items())
+    return '{' + pares + '}' if pares else ''
+
+
+class Metricas:
+    """Registro en memoria de las mediciones del camino caliente.
+
+    Las latencias se guardan como ventanas móviles (StageStats) por (stream,
+    etapa); los contadores son acumulados y los medidores guardan el último
+    valor. El FPS de cada stream se calcula sobre los frames de los últimos
+    `ventana_fps` segundos. prometheus() produce el formato de texto de
+    exposición de Prometheus.
+    """
+
+    def __init__(self, ventana=300, ventana_fps=5.0):
+        self.ventana = ventana
+        self.ventana_fps = ventana_fps
+        self._lock = threading.Lock()
+        self._etapas = {}
+        self._contadores = collections.defaultdict(int)
+        self._medidores = {}
+        self._frames = {}
+
+    # ====== REGISTRO ======
+
+    def observar(self, etapa, ms, stream='principal'):
+        clave = (stream, etapa)
+        stats = self._etapas.get(clave)
+        if stats is None:
+            with self._lock:
+                stats = self._etapas.setdefault(clave, StageStats(self.ventana))
+        stats.add(ms)
+
+    @contextlib.contextmanager
+    def medir(self, etapa, stream='principal'):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(etapa, (time.perf_counter() - t0) * 1000, stream)
+
+    def contar(self, nombre, n=1, stream='principal', **etiquetas):
+        with self._lock:
+            self._contadores[(nombre, stream, tuple(sorted(etiquetas.items())))] += n
+
+    def fijar(self, nombre, valor, stream='principal', **etiquetas):
+        with self._lock:
+            self._medidores[(nombre, stream, tuple(sorted(etiquetas.items())))] = valor
+
+    def frame(self, stream='principal'):
+        """Registra un frame publicado (para FPS y el total de frames)"""
+        ahora = time.monotonic()
+        with self._lock:
+            marcas = self._frames.setdefault(stream, collections.deque())
+            marcas.append(ahora)
+            while marcas[0] < ahora - self.ventana_fps:
+                marcas.popleft()
+            self._contadores[('frames', stream, ())] += 1
+
+    def fps(self, stream='principal'):
+        ahora = time.monotonic()
+        with self._lock:
+            marcas = self._frames.get(stream)
+            if not marcas:
+                return 0.0
+            recientes = [t for t in marcas if t >= ahora - self.ventana_fps]
+        if len(recientes) < 2:
+            return 0.0
+        return (len(recientes) - 1) / max(ahora - recientes[0], 1e-6)
+
+    # ====== LECTURA ======
+
+    def resumen(self, stream='principal'):
+        """Latencias por etapa y FPS de un stream"""
+        with self._lock:
+            etapas = {etapa: stats for (s, etapa), stats in self._etapas.items() if s == stream}
+        return {
+            'fps': round(self.fps(stream), 2),
+            'stages': {etapa: stats.summary() for etapa, stats in sorted(etapas.items())},
+        }
+
+    def prometheus(self):
+        """Texto de exposición de Prometheus con todas las series registradas"""
+        with self._lock:
+            etapas = sorted(self._etapas.items())
+            contadores = sorted(self._contadores.items())
+            medidores = sorted(self._medidores.items())
+            streams = sorted(self._frames)
+
+        lineas = [f'# HELP {PREFIJO}_stage_latency_ms Latencia por etapa (ventana móvil)',
+                  f'# TYPE {PREFIJO}_stage_latency_ms summary']
+        for (stream, etapa), stats in etapas:
+            resumen = stats.summary()
+            for cuantil, clave in CUANTILES:
+                if resumen[clave] is not None:
+                    lineas.append(f'{PREFIJO}_stage_latency_ms'
+                                  f'{_etiquetas(stream=stream, stage=etapa, quantile=cuantil)} {resumen[clave]}')
+            lineas.append(f'{PREFIJO}_stage_latency_ms_sum{_etiquetas(stream=stream, stage=etapa)} {resumen["sum_ms"]}')
+            lineas.append(f'{PREFIJO}_stage_latency_ms_count{_etiquetas(stream=stream, stage=etapa)} {resumen["count"]}')
+
+        lineas += [f'# HELP {PREFIJO}_fps Frames publicados por segundo',
+                   f'# TYPE {PREFIJO}_fps gauge']
+        lineas += [f'{PREFIJO}_fps{_etiquetas(stream=stream)} {self.fps(stream):.2f}' for stream in streams]
+
+        tipos_vistos = set()
+        for tipo, series in (('counter', contadores), ('gauge', medidores)):
+            for (nombre, stream, extra), valor in series:
+                metrica = f'{PREFIJO}_{nombre}_total' if tipo == 'counter' else f'{PREFIJO}_{nombre}'
+                if metrica not in tipos_vistos:
+                    tipos_vistos.add(metrica)
+                    lineas.append(f'# TYPE {metrica} {tipo}')
+                lineas.append(f'{metrica}{_etiquetas(stream=stream, **dict(extra))} {valor}')
+        return '\n'.join(lineas) + '\n'
+
+    # ====== OVERLAY ======
+
+    def dibujar(self, frame, stream='principal', etapas=('captura', 'yolo', 'rostros_ubicar',
+                                                          'rostros_codificar', 'dibujo', 'jpeg')):
+        """Escribe FPS y p50/p95 de las etapas principales en la esquina superior izquierda"""
+        resumen = self.resumen(stream)
+        lineas = [f"FPS {resumen['fps']:.1f}"]
+        for etapa in etapas:
+            stats = resumen['stages'].get(etapa)
+            if stats and stats['p50_ms'] is not None:
+                lineas.append(f"{etapa} {stats['p50_ms']:.1f}/{stats['p95_ms']:.1f} ms")
+        for i, linea in enumerate(lineas):
+            y = 18 + i * 16
+            cv2.putText(frame, linea, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 3)
+            cv2.putText(frame, linea, (8, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0), 1)
+        return frame
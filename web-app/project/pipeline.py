@@ -0,0 +1,282 @@
+"""Pipeline por etapas (captura, inferencia, anotación/codificación) conectadas por colas acotadas"""
+import collections
+import threading
+import time
+
+import cv2
+
+FIN = object()  # Lo devuelve LatestQueue.get() cuando la fuente terminó y ya no quedan elementos
+
+
+class LatestQueue:
+    """Cola acotada en la que el elemento más reciente reemplaza a los antiguos"""
+
+    def __init__(self, maxsize=1):
+        self._items = collections.deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._finished = False
+        self.dropped = 0
+
+    def put(self, item):
+        """Inserta sin bloquear; si la cola está llena se descarta el elemento más viejo"""
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Devuelve el elemento más antiguo pendiente, FIN si la entrada terminó y se vació,
+        o None si la cola se cerró / expiró"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed or self._finished, timeout)
+            if self._items:
+                return self._items.popleft()
+            if self._finished and not self._closed:
+                return FIN
+            return None
+
+    def finish(self):
+        """No habrá más elementos: los pendientes se entregan y después get() devuelve FIN"""
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageStats:
+    """Latencias recientes (ms) de una etapa"""
+
+    def __init__(self, window=120):
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0  # Acumulado desde el inicio (no solo la ventana)
+
+    def add(self, ms):
+        with self._lock:
+            self._samples.append(ms)
+            self.count += 1
+            self.total_ms += ms
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total_ms = self.count, self.total_ms
+        if not samples:
+            return {'count': count, 'sum_ms': round(total_ms, 2), 'mean_ms': None,
+                    'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+        ultimo = len(samples) - 1
+        return {
+            'count': count,
+            'sum_ms': round(total_ms, 2),
+            'mean_ms': round(sum(samples) / len(samples), 2),
+            'p50_ms': round(samples[len(samples) // 2], 2),
+            'p95_ms': round(samples[min(ultimo, int(len(samples) * 0.95))], 2),
+            'p99_ms': round(samples[min(ultimo, int(len(samples) * 0.99))], 2),
+        }
+
+
+class Paquete:
+    """Frame en tránsito por el pipeline con sus marcas de tiempo"""
+    __slots__ = ('seq', 'frame', 't_captura', 'inferencia')
+
+    def __init__(self, seq, frame, t_captura):
+        self.seq = seq
+        self.frame = frame
+        self.t_captura = t_captura
+        self.inferencia = None
+
+
+class FramePipeline:
+    """Captura, inferencia y anotación/JPEG en hilos separados.
+
+    La captura nunca espera al modelo: cada etapa se comunica con la siguiente
+    mediante una LatestQueue de tamaño 1, por lo que los frames viejos se
+    descartan en lugar de acumularse.
+
+    Con `despachar` y `completar` la inferencia corre fuera de este proceso
+    (p. ej. en un PoolProcesos): la etapa mantiene hasta `en_vuelo` frames
+    enviados y los completa en el orden de captura.
+
+    Cuando la fuente se agota, el fin recorre las colas y cada etapa termina
+    lo pendiente antes de salir (el último frame de un archivo se publica);
+    solo stop() descarta los frames en tránsito.
+    """
+
+    STAGES = ('captura', 'inferencia', 'anotacion', 'codificacion', 'total')
+
+    def __init__(self, capturar, inferir, anotar, publicar, keep_running=None,
+                 fps_fuente=None, jpeg_quality=85, despachar=None, completar=None, en_vuelo=1):
+        self.capturar = capturar          # () -> frame | None (fin de la fuente)
+        self.inferir = inferir            # frame -> (frame, inferencia)
+        self.anotar = anotar              # (frame, inferencia) -> frame
+        self.publicar = publicar          # (frame, jpeg_bytes, paquete) -> None
+        self.keep_running = keep_running or (lambda: True)
+        self.fps_fuente = fps_fuente      # Solo para archivos: ritmo de lectura
+        self.jpeg_quality = jpeg_quality
+        self.despachar = despachar        # frame -> Future (inferencia en otro proceso)
+        self.completar = completar        # (frame, Future) -> (frame, inferencia)
+        self.en_vuelo = max(1, en_vuelo)  # Frames despachados sin completar como máximo
+
+        self.q_inferencia = LatestQueue(1)
+        self.q_anotacion = LatestQueue(1)
+        self.stats = {name: StageStats() for name in self.STAGES}
+        self.running = False
+        self._t_inicio = None
+        self._publicados = 0
+
+    # ====== ETAPAS ======
+
+    def _loop_captura(self):
+        """Lee frames hasta agotar la fuente (devuelve True) o hasta que se pida detener (False)"""
+        seq = 0
+        periodo = 1.0 / self.fps_fuente if self.fps_fuente else None
+        proximo = time.perf_counter()
+        while self.running and self.keep_running():
+            t0 = time.perf_counter()
+            try:
+                frame = self.capturar()
+            except Exception as e:
+                print(f"Error en captura: {e}")
+                frame = None
+            if frame is None:
+                self.q_inferencia.finish()
+                return True
+            self.stats['captura'].add((time.perf_counter() - t0) * 1000)
+            seq += 1
+            self.q_inferencia.put(Paquete(seq, frame, t0))
+
+            if periodo:
+                # Reproducir archivos a su velocidad nominal sin bloquear a las demás etapas
+                proximo += periodo
+                espera = proximo - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                else:
+                    proximo = time.perf_counter()
+        return False
+
+    def _loop_inferencia(self):
+        while self.running:
+            paquete = self.q_inferencia.get(timeout=0.5)
+            if paquete is FIN:
+                self.q_anotacion.finish()
+                return
+            if paquete is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                paquete.frame, paquete.inferencia = self.inferir(paquete.frame)
+            except Exception as e:
+                print(f"Error en inferencia: {e}")
+                continue
+            self.stats['inferencia'].add((time.perf_counter() - t0) * 1000)
+            self.q_anotacion.put(paquete)
+
+    def _loop_despacho(self):
+        """Inferencia en otros procesos: envía frames mientras haya lugar y los completa en orden"""
+        pendientes = collections.deque()  # (paquete, futuro, t0) en orden de captura
+        fin = False
+        while self.running:
+            if fin and not pendientes:
+                self.q_anotacion.finish()
+                return
+            if pendientes and (fin or pendientes[0][1].done() or len(pendientes) >= self.en_vuelo):
+                paquete, futuro, t0 = pendientes.popleft()
+                try:
+                    paquete.frame, paquete.inferencia = self.completar(paquete.frame, futuro)
+                except Exception as e:
+                    print(f"Error en inferencia: {e}")
+                    continue
+                self.stats['inferencia'].add((time.perf_counter() - t0) * 1000)
+                self.q_anotacion.put(paquete)
+                continue
+            paquete = self.q_inferencia.get(timeout=0.005 if pendientes else 0.5)
+            if paquete is FIN:
+                fin = True
+                continue
+            if paquete is None:
+                continue
+            t0 = time.perf_counter()
+            try:
+                pendientes.append((paquete, self.despachar(paquete.frame), t0))
+            except Exception as e:
+                print(f"Error enviando frame a inferencia: {e}")
+
+    def _loop_anotacion(self):
+        while self.running:
+            paquete = self.q_anotacion.get(timeout=0.5)
+            if paquete is FIN:
+                return
+            if paquete is None:
+                continue
+            try:
+                t0 = time.perf_counter()
+                frame = self.anotar(paquete.frame, paquete.inferencia)
+                t1 = time.perf_counter()
+                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                t2 = time.perf_counter()
+                if not ret:
+                    continue
+                self.publicar(frame, buffer.tobytes(), paquete)
+            except Exception as e:
+                print(f"Error en anotación/codificación: {e}")
+                continue
+            self.stats['anotacion'].add((t1 - t0) * 1000)
+            self.stats['codificacion'].add((t2 - t1) * 1000)
+            self.stats['total'].add((time.perf_counter() - paquete.t_captura) * 1000)
+            self._publicados += 1
+
+    # ====== CONTROL ======
+
+    def run(self):
+        """Ejecuta el pipeline; la captura corre en el hilo llamador hasta agotar la fuente"""
+        self.running = True
+        self._t_inicio = time.perf_counter()
+        workers = [
+            threading.Thread(target=self._loop_despacho if self.despachar else self._loop_inferencia, daemon=True),
+            threading.Thread(target=self._loop_anotacion, daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            if self._loop_captura():
+                # Fin de la fuente: esperar a que las etapas publiquen lo pendiente (salvo que se pida detener)
+                for worker in workers:
+                    while worker.is_alive() and self.keep_running():
+                        worker.join(timeout=0.1)
+        finally:
+            self.stop()
+            for worker in workers:
+                worker.join(timeout=2)
+
+    def stop(self):
+        self.running = False
+        self.q_inferencia.close()
+        self.q_anotacion.close()
+
+    def estadisticas(self):
+        """Resumen de latencias por etapa, FPS de salida y frames descartados"""
+        transcurrido = time.perf_counter() - self._t_inicio if self._t_inicio else 0
+        return {
+            'running': self.running,
+            'fps': round(self._publicados / transcurrido, 2) if transcurrido else 0.0,
+            'stages': {name: stats.summary() for name, stats in self.stats.items()},
+            'dropped': {
+                'inferencia': self.q_inferencia.dropped,
+                'anotacion': self.q_anotacion.dropped,
+            },
+            'queues': {
+                'inferencia': len(self.q_inferencia),
+                'anotacion': len(self.q_anotacion),
+            },
+        }
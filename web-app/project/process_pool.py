@@ -0,0 +1,209 @@
+"""Pool de procesos para la detección EPP y la codificación de rostros, con frames en memoria compartida"""
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from backends import crear_backend, preparar_modelo
+from detections import CLASES_EPP
+from face_regions import localizar_y_codificar, localizar_y_codificar_en_personas
+
+# ====== PROCESO TRABAJADOR ======
+
+_modelo = None
+_memoria = None
+_tam_ranura = 0
+
+
+def _adjuntar(nombre):
+    """Abre la memoria compartida del proceso principal sin hacerse cargo de borrarla"""
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        # Python < 3.13: los procesos hijos comparten el resource_tracker del principal, que la borra al cerrar
+        return shared_memory.SharedMemory(name=nombre)
+
+
+def _iniciar_trabajador(nombre_memoria, tam_ranura, pesos, backend, hilos):
+    """Se conecta a las ranuras de frames y carga el modelo una sola vez por proceso"""
+    global _modelo, _memoria, _tam_ranura
+    cv2.setNumThreads(1)
+    _memoria = _adjuntar(nombre_memoria)
+    _tam_ranura = tam_ranura
+    if pesos is not None:
+        tipo, imgsz, precision, carpeta, calibracion = backend
+        _modelo = crear_backend(tipo, pesos, imgsz=imgsz, hilos=hilos, precision=precision, carpeta=carpeta,
+                                calibracion=calibracion)
+
+
+def _procesar(tarea):
+    """Detección y/o rostros del frame de una ranura; no devuelve nada que apunte a la memoria compartida"""
+    t0 = time.perf_counter()
+    frame = np.ndarray(tarea['forma'], dtype=tarea['tipo'], buffer=_memoria.buf,
+                       offset=tarea['ranura'] * _tam_ranura)
+    detecciones = rostros = None
+    cajas = tarea['cajas']
+    regiones = 0
+    try:
+        if tarea['deteccion'] and _modelo is not None:
+            detecciones = _modelo.predict([frame], conf=tarea['conf'], imgsz=tarea['imgsz'])[0]
+            if cajas is None:
+                cajas = detecciones.xyxy[detecciones.cls == CLASES_EPP['persona']]
+        if tarea['rostros'] and tarea['por_personas']:
+            # Sin cajas no hay regiones: el proceso principal decide qué hacer
+            if cajas is not None:
+                rostros, regiones = localizar_y_codificar_en_personas(frame, cajas, tarea['fraccion'],
+                                                                      tarea['alto'])
+        elif tarea['rostros']:
+            ubicaciones, codificaciones = localizar_y_codificar(frame, tarea['escala'])
+            rostros = [(-1, ubicacion, codificacion) for ubicacion, codificacion in zip(ubicaciones, codificaciones)]
+    finally:
+        del frame
+    return {
+        'contexto': tarea['contexto'],
+        'detecciones': detecciones,
+        'rostros': rostros,
+        'regiones': regiones,
+        'segundos': time.perf_counter() - t0,
+        'pid': os.getpid(),
+    }
+
+
+# ====== POOL ======
+
+class PoolProcesos:
+    """Procesos que ejecutan YOLO y la codificación de rostros fuera del GIL del servidor.
+
+    Cada frame se copia a una ranura de un bloque de memoria compartida y al
+    proceso solo viajan la ranura, la forma y los parámetros; de vuelta llegan
+    detecciones y codificaciones, que son pequeñas. Hay `ranuras_por_proceso`
+    ranuras por proceso: si todas están ocupadas, enviar() espera, así que los
+    frames en vuelo quedan acotados. Los Future terminan en cualquier orden;
+    quien los consume los recorre en el orden de envío.
+
+    Con 'spawn' cada proceso vuelve a importar el módulo principal: el
+    servidor solo debe crear hilos, registros y pools dentro de
+    iniciar_servidor() (ver app.py), nunca al importarse.
+    """
+
+    def __init__(self, procesos=None, tam_ranura=1920 * 1080 * 3, ranuras_por_proceso=2, contexto='spawn'):
+        self.procesos = procesos or max(1, (os.cpu_count() or 2) - 1)
+        self.tam_ranura = tam_ranura
+        self.n_ranuras = self.procesos * ranuras_por_proceso
+        self.contexto = contexto
+        self._executor = None
+        self._memoria = None
+        self._libres = queue.Queue()
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.completados = 0
+        self.errores = 0
+        self.segundos = 0.0
+        self.con_modelo = False
+
+    def iniciar(self, pesos=None, backend=None):
+        """Arranca (o reinicia) los procesos; con `pesos`, cada uno carga su propio detector.
+        `backend` es (tipo, imgsz, precision, carpeta, calibracion); el modelo se exporta aquí una vez"""
+        if multiprocessing.parent_process() is not None:
+            # Un trabajador que reimporta el servidor no debe lanzar su propio pool
+            raise RuntimeError('El pool de procesos solo se inicia desde el proceso del servidor')
+        if pesos is not None:
+            tipo, imgsz, precision, carpeta, calibracion = backend
+            preparar_modelo(tipo, pesos, imgsz, precision, carpeta, calibracion)
+        self.cerrar()
+        with self._lock:
+            self._memoria = shared_memory.SharedMemory(create=True, size=self.tam_ranura * self.n_ranuras)
+            self._libres = queue.Queue()
+            for ranura in range(self.n_ranuras):
+                self._libres.put(ranura)
+            hilos = max(1, (os.cpu_count() or 1) // self.procesos)
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.procesos,
+                mp_context=multiprocessing.get_context(self.contexto),
+                initializer=_iniciar_trabajador,
+                initargs=(self._memoria.name, self.tam_ranura, pesos, backend, hilos))
+            self.con_modelo = pesos is not None
+        print(f"✅ Pool de {self.procesos} procesos listo ({self.n_ranuras} ranuras de "
+              f"{self.tam_ranura // 1024} KB en memoria compartida)")
+
+    @property
+    def activo(self):
+        return self._executor is not None
+
+    def enviar(self, frame, deteccion=False, rostros=False, por_personas=False, conf=0.25, imgsz=None,
+               escala=0.25, fraccion=0.45, alto=256, cajas=None, contexto=None, timeout=5.0):
+        """Copia el frame a una ranura libre y lo encola; devuelve el Future del resultado.
+
+        `cajas` limita los rostros por persona a esas cajas (si no, las personas detectadas).
+        `contexto` vuelve tal cual en el resultado (datos del llamador para completar el frame).
+        """
+        executor, memoria = self._executor, self._memoria
+        if executor is None:
+            raise RuntimeError('Pool de procesos no iniciado')
+        frame = np.ascontiguousarray(frame)
+        if frame.nbytes > self.tam_ranura:
+            raise ValueError(f'Frame de {frame.nbytes} bytes no cabe en una ranura de {self.tam_ranura}')
+        ranura = self._libres.get(timeout=timeout)
+        try:
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=memoria.buf, offset=ranura * self.tam_ranura)[...] = frame
+            futuro = executor.submit(_procesar, {
+                'ranura': ranura, 'forma': frame.shape, 'tipo': frame.dtype.str,
+                'deteccion': deteccion, 'rostros': rostros, 'por_personas': por_personas,
+                'conf': conf, 'imgsz': imgsz, 'escala': escala, 'fraccion': fraccion, 'alto': alto,
+                'cajas': None if cajas is None else np.asarray(cajas, dtype=np.float32),
+                'contexto': contexto,
+            })
+        except Exception:
+            self._libres.put(ranura)
+            raise
+        with self._lock:
+            self.enviados += 1
+        futuro.add_done_callback(lambda f: self._terminado(f, ranura))
+        return futuro
+
+    def _terminado(self, futuro, ranura):
+        # La ranura se libera recién cuando el proceso terminó de leerla
+        self._libres.put(ranura)
+        with self._lock:
+            if futuro.cancelled() or futuro.exception() is not None:
+                self.errores += 1
+            else:
+                self.completados += 1
+                self.segundos += futuro.result()['segundos']
+
+    def mapear(self, frames, **opciones):
+        """Resultados de varios frames en el mismo orden (se procesan en paralelo)"""
+        futuros = [self.enviar(frame, **opciones) for frame in frames]
+        return [futuro.result() for futuro in futuros]
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'activo': self.activo,
+                'procesos': self.procesos,
+                'con_modelo': self.con_modelo,
+                'ranuras': self.n_ranuras,
+                'ranuras_libres': self._libres.qsize(),
+                'tam_ranura': self.tam_ranura,
+                'enviados': self.enviados,
+                'completados': self.completados,
+                'errores': self.errores,
+                'en_vuelo': self.enviados - self.completados - self.errores,
+                'ms_medio_proceso': round(self.segundos / self.completados * 1000, 2) if self.completados else None,
+            }
+
+    def cerrar(self):
+        with self._lock:
+            executor, memoria = self._executor, self._memoria
+            self._executor = self._memoria = None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if memoria is not None:
+            memoria.close()
+            memoria.unlink()
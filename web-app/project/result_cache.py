@@ -0,0 +1,99 @@
+"""Caché de resultados por contenido para imágenes subidas (detecciones + JPEG anotados)"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def huella_contenido(datos):
+    """sha1 de los bytes de la imagen"""
+    return hashlib.sha1(datos).hexdigest()
+
+
+def clave_contenido(huella, modelo_id, conf):
+    """Clave de caché: huella de la imagen + modelo + umbral de confianza"""
+    return f"{huella}:{modelo_id}:{conf:g}"
+
+
+class ResultadoImagen:
+    """Detecciones crudas de una imagen y sus JPEG ya codificados por variante de overlay"""
+    __slots__ = ('detecciones', 'jpegs')
+
+    def __init__(self, detecciones):
+        self.detecciones = detecciones
+        self.jpegs = {}
+
+    @property
+    def nbytes(self):
+        d = self.detecciones
+        return d.xyxy.nbytes + d.conf.nbytes + d.cls.nbytes + sum(len(j) for j in self.jpegs.values())
+
+
+class CacheResultados:
+    """LRU acotada por bytes: al superar `max_bytes` se descartan las entradas menos usadas"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.descartes = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada
+
+    def guardar(self, clave, detecciones):
+        """Registra las detecciones de una imagen y devuelve su entrada"""
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= anterior.nbytes
+            entrada = ResultadoImagen(detecciones)
+            self._entradas[clave] = entrada
+            self.bytes += entrada.nbytes
+            self._recortar()
+            return entrada
+
+    def guardar_jpeg(self, clave, variante, jpeg):
+        """Agrega el JPEG de una variante ('original', 'deteccion') a una entrada existente"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return
+            self.bytes -= entrada.nbytes
+            entrada.jpegs[variante] = jpeg
+            self.bytes += entrada.nbytes
+            self._recortar()
+
+    def _recortar(self):
+        # La entrada más reciente se conserva aunque por sí sola supere el límite
+        while self.bytes > self.max_bytes and len(self._entradas) > 1:
+            _, entrada = self._entradas.popitem(last=False)
+            self.bytes -= entrada.nbytes
+            self.descartes += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'descartes': self.descartes,
+                'hit_ratio': round(self.aciertos / consultas, 3) if consultas else 0.0
+            }
@@ -0,0 +1,108 @@
+"""Estado compartido entre hilos: snapshots inmutables por frame y ciclo de vida de la fuente principal"""
+import collections
+import threading
+import time
+
+
+class FrameSnapshot(collections.namedtuple('FrameSnapshot', 'seq t fuente frame jpeg detecciones epp_status')):
+    """Resultado publicado de un frame: frame anotado (solo lectura), su JPEG, detecciones y estado EPP.
+
+    Nunca se modifica después de publicarse; quien lo lee puede conservarlo
+    sin copiar aunque el hilo de la cámara ya haya publicado otro.
+    """
+    __slots__ = ()
+
+
+class CanalSnapshots:
+    """Último FrameSnapshot publicado.
+
+    Los lectores toman `actual` sin bloqueo (es un solo reemplazo de
+    referencia); quien necesite el siguiente frame espera en una condición en
+    lugar de sondear.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.actual = None
+        self.seq = 0
+
+    def publicar(self, fuente, frame, jpeg=None, detecciones=None, epp_status=None):
+        if frame is not None:
+            frame.flags.writeable = False
+        with self._cond:
+            self.seq += 1
+            snapshot = FrameSnapshot(self.seq, time.time(), fuente, frame, jpeg, detecciones, epp_status)
+            self.actual = snapshot
+            self._cond.notify_all()
+        return snapshot
+
+    def esperar(self, seq, timeout=None):
+        """Espera un snapshot posterior a `seq`; devuelve el snapshot o None al vencer el timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > seq, timeout):
+                return None
+            return self.actual
+
+
+class CicloFuente:
+    """Arranque y parada de la fuente principal (cámara, video o imagen), una operación a la vez.
+
+    Cada arranque recibe su propia captura y su propio evento de parada: un
+    hilo viejo nunca lee una captura nueva, y la captura la libera su propio
+    hilo al terminar, nunca mientras otro la está leyendo. Las rutas que
+    combinan varias operaciones (parar, abrir, arrancar) las agrupan con
+    `with fuente.lock`.
+    """
+
+    def __init__(self, espera_parada=2.0):
+        self.lock = threading.RLock()
+        self.espera_parada = espera_parada
+        self.tipo = None  # 'camera', 'image', 'video'
+        self.cap = None
+        self.hilo = None
+        self._parar = threading.Event()
+        self.arranques = 0
+
+    def iniciar(self, tipo, cap=None, trabajador=None):
+        """Detiene la fuente anterior y arranca la nueva; trabajador(cap, parar) corre en su propio hilo"""
+        with self.lock:
+            self._detener()
+            self.tipo, self.cap = tipo, cap
+            self._parar = parar = threading.Event()
+            if trabajador is not None:
+                self.hilo = threading.Thread(target=self._ejecutar, args=(trabajador, cap, parar), daemon=True)
+                self.hilo.start()
+            self.arranques += 1
+
+    @staticmethod
+    def _ejecutar(trabajador, cap, parar):
+        try:
+            trabajador(cap, parar)
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def detener(self):
+        with self.lock:
+            self._detener()
+            self.tipo = None
+
+    def _detener(self):
+        self._parar.set()
+        hilo, cap = self.hilo, self.cap
+        self.hilo = self.cap = None
+        if hilo is None:
+            if cap is not None:
+                cap.release()
+        elif hilo is not threading.current_thread():
+            hilo.join(timeout=self.espera_parada)
+            if hilo.is_alive():
+                print("⚠️ El hilo de la fuente anterior no terminó a tiempo (liberará su captura al salir)")
+
+    @property
+    def corriendo(self):
+        hilo = self.hilo
+        return hilo is not None and hilo.is_alive()
+
+    def estadisticas(self):
+        return {'tipo': self.tipo, 'corriendo': self.corriendo, 'arranques': self.arranques}
@@ -53,8 +53,13 @@ function updateEPPStatus(status) {
     updateChart(detectedCount, 4);
     
     if (status.persona && detectionActive) {
-        logActivity(detectedCount === 4 ? 'success' : 'warning', 
-                   detectedCount === 4 ? 'EPP completo detectado' : `EPP incompleto (${detectedCount}/4)`);
+        const noConformes = status.no_conformes || 0;
+        if (noConformes > 0) {
+            logActivity('warning', `${noConformes} persona(s) sin EPP completo`);
+        } else {
+            logActivity(detectedCount === 4 ? 'success' : 'warning', 
+                       detectedCount === 4 ? 'EPP completo detectado' : `EPP incompleto (${detectedCount}/4)`);
+        }
     }
 }
 
@@ -149,6 +154,25 @@ async function pollStatus() {
     }
 }
 
+function startStatusStream() {
+    // Sin soporte de SSE: volver al sondeo cada segundo
+    if (!window.EventSource) {
+        setInterval(pollStatus, 1000);
+        return;
+    }
+    
+    let status = {};
+    const source = new EventSource('/events');
+    
+    source.addEventListener('status', (e) => {
+        const message = JSON.parse(e.data);
+        status = message.full ? message.status : Object.assign(status, message.status);
+        if (detectionActive) updateEPPStatus(status);
+    });
+    
+    source.onerror = () => console.warn('Canal de eventos interrumpido, reconectando...');
+}
+
 function flashEffect() {
     const flash = document.createElement('div');
     flash.style.cssText = `
@@ -388,8 +412,8 @@ document.addEventListener('DOMContentLoaded', async () => {
     // Inicializar estados
     resetEPP();
     
-    // Iniciar polling
-    setInterval(pollStatus, 1000);
+    // Recibir estado EPP por eventos del servidor
+    startStatusStream();
     
     // Mensaje de bienvenida
     setTimeout(() => {
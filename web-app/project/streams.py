@@ -0,0 +1,255 @@
+"""Modo multi-cámara: un lector por fuente y una única inferencia por lote para todas"""
+import threading
+import time
+
+import cv2
+
+from broadcaster import FrameBroadcaster
+from pipeline import StageStats
+
+
+def parse_source(source):
+    """Convierte '0', '1'... en índice de dispositivo; rutas y URLs (rtsp://, http://) se dejan igual"""
+    if isinstance(source, int):
+        return source
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+class StreamReader:
+    """Hilo lector de una fuente que conserva solo el frame más reciente"""
+
+    def __init__(self, source, size=(640, 480), loop=False, on_frame=None):
+        self.source = parse_source(source)
+        self.size = size
+        self.loop = loop
+        self.on_frame = on_frame or (lambda: None)
+        self.cap = None
+        self.thread = None
+        self.running = False
+        self.ended = False
+        self.error = None
+        self.frames_read = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._frame = None
+
+    @property
+    def is_file(self):
+        return isinstance(self.source, str) and '://' not in self.source
+
+    def start(self):
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            self.error = 'No se pudo abrir la fuente'
+            self.cap.release()
+            self.cap = None
+            return False
+        if not self.is_file:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    def _run(self):
+        # Los archivos se leen a su velocidad nominal; cámaras y URLs bloquean en read()
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+        periodo = 1.0 / fps if fps else None
+        proximo = time.perf_counter()
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                if self.loop and self.is_file:
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                self.ended = True
+                break
+            frame = cv2.resize(frame, self.size)
+            with self._lock:
+                self._seq += 1
+                self._frame = frame
+            self.frames_read += 1
+            self.on_frame()
+
+            if periodo:
+                proximo += periodo
+                espera = proximo - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                else:
+                    proximo = time.perf_counter()
+        self.running = False
+
+    def latest(self, last_seq):
+        """Devuelve (seq, frame) si hay un frame más nuevo que last_seq, si no None"""
+        with self._lock:
+            if self._frame is None or self._seq == last_seq:
+                return None
+            return self._seq, self._frame
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+
+class Stream:
+    """Fuente registrada en el servidor multi-cámara con su propio stream y estado"""
+
+    def __init__(self, stream_id, reader):
+        self.id = stream_id
+        self.reader = reader
+        self.broadcaster = FrameBroadcaster()
+        self.last_seq = 0
+        self.processed = 0
+        self.epp_status = {}
+        self.t_inicio = time.perf_counter()
+
+    def status(self):
+        transcurrido = time.perf_counter() - self.t_inicio
+        return {
+            'id': self.id,
+            'source': self.reader.source,
+            'running': self.reader.running,
+            'ended': self.reader.ended,
+            'error': self.reader.error,
+            'frames_read': self.reader.frames_read,
+            'frames_processed': self.processed,
+            'fps': round(self.processed / transcurrido, 2) if transcurrido else 0.0,
+            'epp_status': self.epp_status,
+        }
+
+
+class MultiStreamServer:
+    """Reúne el último frame de cada fuente y ejecuta una sola llamada al modelo por tick.
+
+    infer_batch(frames) -> lista de resultados (uno por frame, en el mismo orden)
+    annotate(frame, resultado) -> frame anotado
+    estado(resultado) -> diccionario de estado EPP del frame
+    observar(stream_id, jpeg, resultado) -> None, opcional: recibe cada frame ya publicado
+    """
+
+    def __init__(self, infer_batch, annotate, estado, max_batch=16, size=(640, 480), observar=None):
+        self.infer_batch = infer_batch
+        self.annotate = annotate
+        self.estado = estado
+        self.observar = observar
+        self.max_batch = max_batch
+        self.size = size
+        self.streams = {}
+        self.running = False
+        self.thread = None
+        self._lock = threading.Lock()
+        self._hay_frames = threading.Event()
+        self._next_id = 1
+        self.batches = 0
+        self.frames_inferred = 0
+        self.batch_ms = StageStats()
+
+    # ====== FUENTES ======
+
+    def add_stream(self, source, stream_id=None, loop=False):
+        """Registra y arranca una fuente; devuelve su id o None si no pudo abrirse"""
+        reader = StreamReader(source, size=self.size, loop=loop, on_frame=self._hay_frames.set)
+        if not reader.start():
+            return None
+        with self._lock:
+            if stream_id is None or stream_id in self.streams:
+                while str(self._next_id) in self.streams:
+                    self._next_id += 1
+                stream_id = str(self._next_id)
+                self._next_id += 1
+            self.streams[stream_id] = Stream(stream_id, reader)
+        self.start()
+        return stream_id
+
+    def remove_stream(self, stream_id):
+        with self._lock:
+            stream = self.streams.pop(stream_id, None)
+        if stream is None:
+            return False
+        stream.reader.stop()
+        stream.broadcaster.clear()
+        return True
+
+    def get(self, stream_id):
+        with self._lock:
+            return self.streams.get(stream_id)
+
+    # ====== INFERENCIA POR LOTES ======
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._hay_frames.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        with self._lock:
+            ids = list(self.streams)
+        for stream_id in ids:
+            self.remove_stream(stream_id)
+
+    def _recolectar(self):
+        """Toma el frame pendiente más reciente de cada fuente (como mucho uno por fuente)"""
+        with self._lock:
+            streams = list(self.streams.values())
+        lote = []
+        for stream in streams:
+            nuevo = stream.reader.latest(stream.last_seq)
+            if nuevo is not None:
+                stream.last_seq, frame = nuevo
+                lote.append((stream, frame))
+        return lote
+
+    def _run(self):
+        while self.running:
+            self._hay_frames.wait(timeout=0.5)
+            self._hay_frames.clear()
+            lote = self._recolectar()
+            for i in range(0, len(lote), self.max_batch):
+                self._procesar_lote(lote[i:i + self.max_batch])
+
+    def _procesar_lote(self, lote):
+        frames = [frame for _, frame in lote]
+        t0 = time.perf_counter()
+        try:
+            resultados = self.infer_batch(frames)
+        except Exception as e:
+            print(f"Error en inferencia por lotes: {e}")
+            return
+        self.batch_ms.add((time.perf_counter() - t0) * 1000)
+        self.batches += 1
+        self.frames_inferred += len(frames)
+
+        # Cada resultado vuelve a la fuente de la que salió su frame
+        for (stream, frame), resultado in zip(lote, resultados):
+            try:
+                stream.epp_status = self.estado(resultado)
+                stream.broadcaster.publish(self.annotate(frame.copy(), resultado))
+                stream.processed += 1
+                if self.observar is not None:
+                    self.observar(stream.id, stream.broadcaster.jpeg, resultado)
+            except Exception as e:
+                print(f"Error publicando stream {stream.id}: {e}")
+
+    def status(self):
+        with self._lock:
+            streams = list(self.streams.values())
+        return {
+            'running': self.running,
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'mean_batch_size': round(self.frames_inferred / self.batches, 2) if self.batches else 0.0,
+            'batch_latency': self.batch_ms.summary(),
+            'streams': [stream.status() for stream in streams],
+        }
@@ -0,0 +1,23 @@
+"""Las pruebas importan los módulos del proyecto como lo hace app.py (imports planos)"""
+import importlib
+import os
+import sys
+import threading
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture
+def aplicacion(tmp_path, monkeypatch):
+    """app.py importado en un directorio vacío (crea sus carpetas relativas ahí)"""
+    monkeypatch.chdir(tmp_path)
+    if 'app' not in sys.modules:
+        hilos = set(threading.enumerate())
+        app = importlib.import_module('app')
+        # Estado justo después del primer import, antes de que otra prueba haga peticiones
+        app.hilos_al_importar = set(threading.enumerate()) - hilos
+        app.iniciado_al_importar = app.servidor_iniciado
+    return importlib.import_module('app')
@@ -0,0 +1,20 @@
+"""ControladorAdaptativo: el costo medido es el de los frames inferidos, repartido entre los del salto"""
+from adaptive import ControladorAdaptativo
+
+
+def test_costo_amortizado_sobre_el_salto_de_frames():
+    niveles = ({'imgsz': 640, 'escala_rostros': 0.25, 'paso': 1},
+               {'imgsz': 320, 'escala_rostros': 0.25, 'paso': 3})
+    controlador = ControladorAdaptativo(fps_objetivo=10, niveles=niveles, nivel_inicial=1, ventana=4,
+                                        enfriamiento=0.0, reintento=1e9)
+    # 0.24 s por inferencia en uno de cada 3 frames son 0.08 s por frame: dentro de 0.1 s pero sin margen
+    for _ in range(8):
+        assert controlador.debe_inferir()
+        controlador.registrar(0.24)
+        assert not controlador.debe_inferir() and not controlador.debe_inferir()
+    assert controlador.nivel == 1 and abs(controlador.costos[1] - 0.08) < 1e-9
+
+    # Con margen de verdad sube de nivel; los frames reutilizados no cuentan como costo nulo
+    for _ in range(4):
+        controlador.registrar(0.03)
+    assert controlador.nivel == 0
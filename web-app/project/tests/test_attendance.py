@@ -0,0 +1,100 @@
+"""RegistroAsistencia: recuperación del diario, volcado atómico y registrar() sin bloqueo"""
+import csv
+import os
+import threading
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+
+from attendance import ENCABEZADO, RegistroAsistencia
+
+CUANDO = datetime(2026, 3, 2, 8, 15, 0)
+
+
+def filas_excel(ruta):
+    wb = load_workbook(ruta, read_only=True)
+    filas = [tuple(f) for f in wb.active.iter_rows(min_row=2, values_only=True)]
+    wb.close()
+    return filas
+
+
+def escribir_excel(ruta, filas):
+    wb = Workbook()
+    wb.active.append(ENCABEZADO)
+    for fila in filas:
+        wb.active.append(list(fila))
+    wb.save(ruta)
+
+
+def escribir_diario(ruta, filas):
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(filas)
+
+
+def rutas(tmp_path):
+    return str(tmp_path / 'Horario.xlsx'), str(tmp_path / 'Horario.journal.csv')
+
+
+def test_recupera_el_diario_de_una_ejecucion_anterior(tmp_path):
+    excel, diario = rutas(tmp_path)
+    escribir_diario(diario, [('Fabricio', '2026-03-02', '08:00:00')])
+
+    registro = RegistroAsistencia(excel, diario, intervalo_volcado=3600)
+    assert registro.cargado.wait(5)
+    assert registro.ya_registrado('Fabricio', '2026-03-02')
+    assert not registro.registrar('Fabricio', CUANDO)
+    registro.close()
+
+    assert filas_excel(excel) == [('Fabricio', '2026-03-02', '08:00:00')]
+    assert os.path.getsize(diario) == 0
+
+
+def test_no_duplica_si_cae_entre_el_volcado_y_el_vaciado_del_diario(tmp_path):
+    """El Excel ya tiene las filas pero el diario no llegó a vaciarse"""
+    excel, diario = rutas(tmp_path)
+    filas = [('Fabricio', '2026-03-02', '08:00:00'), ('Jose Moreno', '2026-03-02', '08:01:00')]
+    escribir_excel(excel, filas)
+    escribir_diario(diario, filas)
+
+    registro = RegistroAsistencia(excel, diario, intervalo_volcado=3600)
+    registro.registrar('Ana', CUANDO)
+    registro.close()
+
+    assert filas_excel(excel) == filas + [('Ana', '2026-03-02', '08:15:00')]
+
+
+def test_volcado_reemplaza_el_excel_sin_dejar_temporales(tmp_path):
+    excel, diario = rutas(tmp_path)
+    escribir_excel(excel, [('Fabricio', '2026-03-01', '09:00:00')])
+
+    registro = RegistroAsistencia(excel, diario, intervalo_volcado=3600)
+    assert registro.registrar('Fabricio', CUANDO)
+    assert registro.flush()
+    assert filas_excel(excel) == [('Fabricio', '2026-03-01', '09:00:00'), ('Fabricio', '2026-03-02', '08:15:00')]
+    assert not os.path.exists(excel + '.tmp')
+    registro.close()
+
+
+def test_registrar_no_espera_la_carga_inicial(tmp_path, monkeypatch):
+    excel, diario = rutas(tmp_path)
+    escribir_excel(excel, [('Fabricio', '2026-03-02', '07:00:00')])
+    liberar = threading.Event()
+    cargar = RegistroAsistencia._cargar
+
+    def carga_lenta(self):
+        liberar.wait(5)
+        cargar(self)
+
+    monkeypatch.setattr(RegistroAsistencia, '_cargar', carga_lenta)
+    registro = RegistroAsistencia(excel, diario, intervalo_volcado=3600)
+
+    # Sin índice todavía: ambas se encolan de inmediato y una repetida se descarta en el acto
+    assert registro.registrar('Fabricio', CUANDO)
+    assert registro.registrar('Ana', CUANDO)
+    assert not registro.registrar('Ana', CUANDO)
+    assert not registro.cargado.is_set()
+
+    liberar.set()
+    registro.close()
+    # El escritor descarta la de Fabricio porque el Excel ya la tenía
+    assert filas_excel(excel) == [('Fabricio', '2026-03-02', '07:00:00'), ('Ana', '2026-03-02', '08:15:00')]
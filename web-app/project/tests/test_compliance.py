@@ -0,0 +1,55 @@
+"""EvaluadorCumplimiento: cada caja de EPP cuenta para la persona que la contiene"""
+import numpy as np
+
+from compliance import EvaluadorCumplimiento, mapa_violaciones
+from detections import Detecciones
+
+# Mismas clases que best6.pt
+NOMBRES = {0: 'casco', 1: 'chaleco', 2: 'gafas', 3: 'guante', 4: 'persona',
+           5: 'sin casco', 6: 'sin chaleco', 7: 'sin gafas'}
+
+
+def detecciones(*cajas):
+    """cajas: (clase, x1, y1, x2, y2)"""
+    cls = np.array([c[0] for c in cajas], dtype=np.int64)
+    xyxy = np.array([c[1:] for c in cajas], dtype=np.float32).reshape(-1, 4)
+    return Detecciones(xyxy, np.ones(len(cajas), dtype=np.float32), cls)
+
+
+def test_mapa_violaciones():
+    assert mapa_violaciones(NOMBRES) == {5: 'casco', 6: 'chaleco', 7: 'gafas'}
+
+
+def test_cada_caja_va_a_la_persona_que_la_contiene():
+    evaluador = EvaluadorCumplimiento(NOMBRES)
+    registros, sin_cumplir = evaluador.evaluar(detecciones(
+        (4, 0, 0, 100, 300),      # Persona 0: equipo completo
+        (4, 200, 0, 300, 300),    # Persona 1: solo casco y un 'sin chaleco'
+        (0, 20, 0, 80, 40), (1, 10, 80, 90, 180), (2, 35, 20, 65, 35), (3, 0, 200, 30, 240),
+        (0, 220, 0, 280, 40), (6, 210, 80, 290, 180),
+    ))
+    assert sin_cumplir == 1
+    assert registros[0]['cumple'] and registros[0]['violaciones'] == []
+    assert all(registros[0][e] for e in ('casco', 'chaleco', 'gafas', 'guantes'))
+    assert registros[1]['casco'] and not registros[1]['chaleco']
+    assert registros[1]['violaciones'] == ['chaleco'] and not registros[1]['cumple']
+
+
+def test_caja_compartida_va_a_quien_mas_la_contiene():
+    evaluador = EvaluadorCumplimiento(NOMBRES)
+    # Casco entre dos personas solapadas: 80 % dentro de la segunda
+    registros, _ = evaluador.evaluar(detecciones(
+        (4, 0, 0, 100, 300), (4, 90, 0, 200, 300), (0, 80, 0, 130, 40)))
+    assert not registros[0]['casco'] and registros[1]['casco']
+
+
+def test_caja_fuera_de_toda_persona_no_cuenta():
+    evaluador = EvaluadorCumplimiento(NOMBRES, umbral=0.5)
+    registros, sin_cumplir = evaluador.evaluar(detecciones(
+        (4, 0, 0, 100, 300), (0, 80, 0, 180, 40), (5, 400, 0, 450, 40)))
+    assert not registros[0]['casco'] and registros[0]['violaciones'] == []
+    assert sin_cumplir == 1
+
+
+def test_sin_personas():
+    assert EvaluadorCumplimiento(NOMBRES).evaluar(detecciones((0, 0, 0, 10, 10))) == ([], 0)
@@ -0,0 +1,140 @@
+"""RegistroDetecciones: consultas que cruzan varias horas coinciden con un recorrido completo de los frames"""
+import math
+
+import numpy as np
+import pytest
+
+from compliance import EPP_REQUERIDO
+from detection_log import HORA, RegistroDetecciones
+from detections import Detecciones
+
+NOMBRES = ['Fabricio', 'Jose Moreno', None]
+
+
+class Pista:
+    def __init__(self, pista_id, nombre):
+        self.id = pista_id
+        self.nombre = nombre
+
+
+def frames_sinteticos(inicio, duracion, paso=2.5, semilla=0):
+    """Frames de dos cámaras con marcas de tiempo exactas en ms: (t, stream, cls, conf, personas, pistas)"""
+    rng = np.random.default_rng(semilla)
+    frames = []
+    for k in range(int(duracion / paso)):
+        n = int(rng.integers(0, 5))
+        cls = rng.integers(0, 8, n)
+        conf = rng.uniform(0.25, 1.0, n).astype(np.float32)
+        personas, pistas = [], []
+        for j in range(int(rng.integers(0, 3))):
+            tiene = rng.random(len(EPP_REQUERIDO)) < 0.7
+            registro = {e: bool(x) for e, x in zip(EPP_REQUERIDO, tiene)}
+            registro['violaciones'] = [e for e, x in zip(EPP_REQUERIDO[:2], tiene[:2]) if not x]
+            registro['cumple'] = bool(tiene.all())
+            personas.append(registro)
+            pistas.append(Pista(j, NOMBRES[int(rng.integers(len(NOMBRES)))]))
+        frames.append((inicio + k * paso, f'cam{k % 2}', cls, conf, personas, pistas))
+    return frames
+
+
+@pytest.fixture(scope='module')
+def registro(tmp_path_factory):
+    """Tres horas y media de datos desde la mitad de una hora (cuatro particiones)"""
+    inicio = (1_700_000_000 // HORA) * HORA + HORA / 2
+    frames = frames_sinteticos(inicio, 3.5 * HORA)
+    registro = RegistroDetecciones(str(tmp_path_factory.mktemp('registro')), max_lotes=1024)
+    for t, stream, cls, conf, personas, pistas in frames:
+        xyxy = np.tile(np.array([[10, 20, 110, 220]], dtype=np.float32), (len(cls), 1))
+        registro.agregar(stream, Detecciones(xyxy, conf, cls), personas, pistas, t=t)
+    registro.flush()
+    yield registro, frames, inicio
+    registro.close()
+
+
+def en_rango(frames, desde, hasta, stream=None):
+    return [f for f in frames if desde <= f[0] < hasta and (stream is None or f[1] == stream)]
+
+
+def test_particiones_por_hora(registro):
+    registro, _, inicio = registro
+    assert len(registro.particiones(inicio, inicio + 3.5 * HORA)) == 4
+    assert registro.estadisticas()['lotes_descartados'] == 0
+
+
+@pytest.mark.parametrize('paso,stream', [(60, None), (900, 'cam1'), (45, None), (37, 'cam0')])
+def test_serie_cumplimiento_coincide_con_recorrido(registro, paso, stream):
+    registro, frames, inicio = registro
+    desde, hasta = inicio + 1200, inicio + 3 * HORA - 600  # Cruza tres cambios de hora (en minutos enteros)
+    serie = registro.serie_cumplimiento(desde, hasta, paso, stream)
+    n = len(serie['t'])
+    esperado_frames, esperado_personas, esperado_cumplen = np.zeros(n), np.zeros(n), np.zeros(n)
+    for t, _, _, _, personas, _ in en_rango(frames, desde, hasta, stream):
+        k = int((t - serie['desde']) // paso)
+        esperado_frames[k] += 1
+        esperado_personas[k] += len(personas)
+        esperado_cumplen[k] += sum(p['cumple'] for p in personas)
+    assert serie['frames'] == esperado_frames.astype(int).tolist()
+    assert serie['personas'] == esperado_personas.astype(int).tolist()
+    for valor, cumplen, personas in zip(serie['cumplimiento'], esperado_cumplen, esperado_personas):
+        assert valor == (None if personas == 0 else round(cumplen / personas * 100, 1))
+
+
+def test_serie_clase_coincide_con_recorrido(registro):
+    registro, frames, inicio = registro
+    desde, hasta = inicio + 100.5, inicio + 2 * HORA + 77
+    serie = registro.serie_clase(3, desde, hasta, paso=300)
+    esperado = np.zeros(len(serie['t']), dtype=int)
+    for t, _, cls, _, _, _ in en_rango(frames, desde, hasta):
+        esperado[int((t - desde) // 300)] += int((cls == 3).sum())
+    assert serie['conteo'] == esperado.tolist()
+
+
+@pytest.mark.parametrize('desde,hasta,stream', [
+    (1234.5, 3 * HORA - 1234.5, None),   # Bordes parciales y dos horas completas por manifiesto
+    (HORA / 2, 2.5 * HORA, 'cam0'),      # Horas completas solamente
+    (0, 3.5 * HORA, 'cam1'),             # Todo el registro
+])
+def test_agregados_coinciden_con_recorrido(registro, desde, hasta, stream):
+    registro, frames, inicio = registro
+    agregados = registro.agregados(inicio + desde, inicio + hasta, stream)
+    seleccion = en_rango(frames, inicio + desde, inicio + hasta, stream)
+    assert agregados['frames'] == len(seleccion)
+
+    clases = {}
+    for _, _, cls, conf, _, _ in seleccion:
+        for clase in set(cls.tolist()):
+            datos = clases.setdefault(clase, [0, 0, 0.0])
+            en_frame = cls == clase
+            datos[0] += int(en_frame.sum())
+            datos[1] += 1
+            datos[2] += float(conf[en_frame].astype(np.float16).astype(np.float64).sum())
+    assert set(agregados['clases']) == set(clases)
+    for clase, (n, en_frames, suma) in clases.items():
+        resultado = agregados['clases'][clase]
+        assert (resultado['detecciones'], resultado['frames']) == (n, en_frames)
+        assert math.isclose(resultado['confianza_media'], suma / n, abs_tol=1e-3)
+
+    personas = {}
+    for _, _, _, _, registros, pistas in seleccion:
+        for persona, pista in zip(registros, pistas):
+            datos = personas.setdefault(pista.nombre or 'Desconocido', [0, 0] + [0] * len(EPP_REQUERIDO))
+            datos[0] += 1
+            datos[1] += persona['cumple']
+            for j, elemento in enumerate(EPP_REQUERIDO):
+                datos[2 + j] += elemento in persona['violaciones']
+    assert set(agregados['personas']) == set(personas)
+    for nombre, (observaciones, cumplen, *faltantes) in personas.items():
+        resultado = agregados['personas'][nombre]
+        assert resultado['observaciones'] == observaciones
+        assert resultado['cumplimiento'] == round(cumplen / observaciones * 100, 1)
+        assert list(resultado['faltantes'].values()) == faltantes
+
+
+def test_registro_es_monotono(tmp_path):
+    registro = RegistroDetecciones(str(tmp_path))
+    vacias = Detecciones.vacias()
+    for t in (1000.0, 999.0, 1001.0):  # Un reloj que retrocede no desordena el registro
+        registro.agregar('cam0', vacias, t=t)
+    registro.close()
+    serie = registro.serie_cumplimiento(990, 1010, paso=10)
+    assert serie['frames'] == [0, 3]  # 999 queda en 1000
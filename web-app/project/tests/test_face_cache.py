@@ -0,0 +1,71 @@
+"""CacheRostros: refresco incremental de la galería Personal/ con un codificador simulado"""
+import os
+
+import cv2
+import numpy as np
+
+from face_cache import DIMENSION, CacheRostros
+
+
+class CodificadorFalso:
+    """Reemplaza a face_recognition: el vector depende solo del color de la imagen"""
+
+    def __init__(self):
+        self.llamadas = 0
+
+    def __call__(self, img):
+        self.llamadas += 1
+        if img.mean() == 0:
+            return None  # Imagen negra: sin rostro
+        return np.full(DIMENSION, img[0, 0, 0] / 255.0)
+
+
+def imagen(ruta, color, tam=16):
+    cv2.imwrite(str(ruta), np.full((tam, tam, 3), color, dtype=np.uint8))
+
+
+def test_refresco_incremental(tmp_path):
+    personal, cache = tmp_path / 'Personal', str(tmp_path / 'cache_rostros')
+    personal.mkdir()
+    imagen(personal / 'Fabricio.jpg', 50)
+    imagen(personal / 'Jose Moreno.png', 100)
+    imagen(personal / 'Sin rostro.png', 0)
+    (personal / 'notas.txt').write_text('no es imagen')
+    codificar = CodificadorFalso()
+    galeria = CacheRostros(str(personal), cache, codificar=codificar)
+
+    # Alta inicial: se codifica todo una vez
+    resumen = galeria.refrescar()
+    assert (resumen['codificadas'], resumen['sin_rostro'], resumen['rostros']) == (3, 1, 2)
+    assert galeria.nombres == ['Fabricio', 'Jose Moreno']
+
+    # Sin cambios: nada se recalcula
+    assert galeria.refrescar()['codificadas'] == 0 and codificar.llamadas == 3
+
+    # Renombrar reutiliza la codificación por hash
+    os.rename(personal / 'Jose Moreno.png', personal / 'Jose.png')
+    resumen = galeria.refrescar()
+    assert (resumen['codificadas'], resumen['eliminadas']) == (0, 1)
+    assert galeria.nombres == ['Fabricio', 'Jose']
+    np.testing.assert_allclose(galeria.codificaciones[1], 100 / 255.0)
+
+    # Modificar el contenido obliga a recodificar solo esa imagen
+    imagen(personal / 'Fabricio.jpg', 200, tam=24)
+    resumen = galeria.refrescar()
+    assert resumen['codificadas'] == 1 and codificar.llamadas == 4
+    np.testing.assert_allclose(galeria.codificaciones[0], 200 / 255.0, atol=0.02)
+
+    # Agregar y borrar
+    imagen(personal / 'Ana.png', 150)
+    os.remove(personal / 'Jose.png')
+    resumen = galeria.refrescar()
+    assert (resumen['codificadas'], resumen['eliminadas']) == (1, 1)
+    assert galeria.nombres == ['Ana', 'Fabricio']
+
+    # Una instancia nueva carga la caché con mmap y no codifica nada
+    otra = CacheRostros(str(personal), cache, codificar=CodificadorFalso())
+    assert isinstance(otra.codificaciones, np.memmap)
+    assert otra.nombres == galeria.nombres
+    np.testing.assert_array_equal(otra.codificaciones, galeria.codificaciones)
+    assert otra.refrescar()['codificadas'] == 0 and otra.codificar.llamadas == 0
+    assert len([a for a in os.listdir(cache) if a.endswith('.npy')]) == 1
@@ -0,0 +1,60 @@
+"""IndiceRostros: la búsqueda particionada coincide con la fuerza bruta"""
+import numpy as np
+
+from face_index import IndiceRostros
+
+
+def galeria_agrupada(n, grupos=40, semilla=0):
+    """Rostros sintéticos agrupados como los de personas distintas (centros separados, poca dispersión)"""
+    rng = np.random.default_rng(semilla)
+    centros = rng.normal(0, 1.0, (grupos, 128))
+    codificaciones = centros[rng.integers(0, grupos, n)] + rng.normal(0, 0.05, (n, 128))
+    return codificaciones.astype(np.float32), [f'p{i}' for i in range(n)]
+
+
+def fuerza_bruta(codificaciones, consultas):
+    d = np.linalg.norm(consultas[:, None, :] - codificaciones[None, :, :], axis=2)
+    return d.argmin(axis=1), d.min(axis=1)
+
+
+def test_sin_particionar_devuelve_el_mas_cercano():
+    codificaciones, nombres = galeria_agrupada(300)
+    indice = IndiceRostros(codificaciones, nombres, tolerancia=10.0)
+    assert not indice.particionado
+    consultas = codificaciones[::7] + 0.01
+    esperados, distancias = fuerza_bruta(codificaciones, consultas)
+    for (nombre, distancia, i), esperado, d in zip(indice.buscar(consultas), esperados, distancias):
+        assert i == esperado and nombre == nombres[esperado]
+        # ||q||² + ||g||² - 2·q·gᵀ en float32: error de redondeo del orden de 1e-3
+        assert np.isclose(distancia, d, atol=2e-3)
+
+
+def test_particionado_coincide_con_fuerza_bruta():
+    codificaciones, nombres = galeria_agrupada(3000)
+    indice = IndiceRostros(codificaciones, nombres, tolerancia=10.0, umbral_particion=2000)
+    assert indice.particionado
+    rng = np.random.default_rng(1)
+    consultas = codificaciones[rng.choice(len(codificaciones), 200, replace=False)]
+    consultas = consultas + rng.normal(0, 0.02, consultas.shape).astype(np.float32)
+    esperados, distancias = fuerza_bruta(codificaciones, consultas)
+    resultados = indice.buscar(consultas)
+    assert [i for _, _, i in resultados] == esperados.tolist()
+    assert np.allclose([d for _, d, _ in resultados], distancias, atol=2e-3)
+
+
+def test_sondear_todas_las_particiones_es_exacto():
+    codificaciones, nombres = galeria_agrupada(2500)
+    indice = IndiceRostros(codificaciones, nombres, umbral_particion=2000)
+    indice.sondas = len(indice.centroides)
+    consultas = np.random.default_rng(2).normal(0, 1.0, (50, 128)).astype(np.float32)
+    esperados, _ = fuerza_bruta(codificaciones, consultas)
+    assert [i for _, _, i in indice.buscar(consultas)] == esperados.tolist()
+
+
+def test_tolerancia_y_galeria_vacia():
+    codificaciones, nombres = galeria_agrupada(10)
+    indice = IndiceRostros(codificaciones, nombres, tolerancia=0.6)
+    lejos = codificaciones[:1] + 5.0
+    assert indice.buscar(lejos)[0][0] is None
+    assert indice.buscar(codificaciones[:1])[0][0] == nombres[0]
+    assert IndiceRostros([], []).buscar(codificaciones[:2]) == [(None, float('inf'), -1)] * 2
@@ -0,0 +1,25 @@
+"""Mosaico de regiones de cabeza: los rostros vuelven a las coordenadas del frame sin deformarse"""
+import numpy as np
+
+from face_regions import armar_mosaico, asignar_rostros
+
+
+def test_region_mas_ancha_que_el_mosaico():
+    frame = np.zeros((400, 1000, 3), dtype=np.uint8)
+    regiones = np.array([[0, 100, 1000, 300],    # 1000 x 200: más ancha que ancho_max a alto 160
+                         [200, 0, 300, 100]], dtype=np.int32)
+    lienzo, teselas = armar_mosaico(frame, regiones, alto=160, ancho_max=400)
+
+    # La escala es la misma en ambos ejes: 400 / 1000 = 0.4
+    x, y, ancho, alto, escala = teselas[0]
+    assert (x, y, ancho, alto) == (0, 0, 400, 80) and escala == 0.4
+    assert lienzo.shape[1] <= 400
+
+    # Un rostro de 40x40 en (x 500, y 150) del frame aparece de 16x16 en el mosaico y vuelve igual
+    top, left = y + (150 - 100) * escala, x + 500 * escala
+    ubicaciones = [(int(top), int(left + 16), int(top + 16), int(left))]
+    assert asignar_rostros(ubicaciones, teselas, regiones) == [(0, 0, (150, 540, 190, 500))]
+
+    # La segunda región cabe a alto completo en la fila siguiente
+    x, y, ancho, alto, escala = teselas[1]
+    assert (x, y, ancho, alto) == (0, 176, 160, 160) and escala == 1.6
@@ -0,0 +1,23 @@
+"""Con flask run o gunicorn nadie llama a iniciar_servidor(): la primera petición crea los registros"""
+
+
+def test_rutas_sin_iniciar_servidor(aplicacion):
+    cliente = aplicacion.app.test_client()
+
+    respuesta = cliente.get('/metrics')
+    assert respuesta.status_code == 200
+    assert aplicacion.servidor_iniciado and aplicacion.registro_asistencia is not None
+
+    respuesta = cliente.get('/incidents')
+    assert respuesta.status_code == 200 and respuesta.get_json()['success']
+    assert cliente.get('/detection_log/stats').get_json()['success']
+
+
+def test_iniciar_servidor_es_idempotente(aplicacion):
+    aplicacion.iniciar_servidor()
+    registros = (aplicacion.motor_incidentes, aplicacion.registro_detecciones,
+                 aplicacion.registro_asistencia, aplicacion.galeria)
+    aplicacion.iniciar_servidor()
+    aplicacion.app.test_client().get('/metrics')
+    assert (aplicacion.motor_incidentes, aplicacion.registro_detecciones,
+            aplicacion.registro_asistencia, aplicacion.galeria) == registros
@@ -0,0 +1,70 @@
+"""Análisis por lotes: línea de tiempo por segundo, rutas aceptadas por /jobs e import sin efectos"""
+import numpy as np
+
+from batch_jobs import GestorTrabajos, resumen_por_segundo
+
+
+def test_resumen_por_segundo():
+    columnas = {
+        'tiempo': np.array([0.0, 0.5, 1.0, 1.5, 2.2], dtype=np.float32),
+        'casco': np.array([1, 1, 0, 1, 1], dtype=bool),
+        'chaleco': np.ones(5, dtype=bool),
+        'gafas': np.zeros(5, dtype=bool),
+        'guantes': np.ones(5, dtype=bool),
+        'persona': np.ones(5, dtype=bool),
+        'safe': np.array([1, 0, 0, 0, 1], dtype=bool),
+        'personas': np.array([1, 1, 2, 2, 3], dtype=np.int16),
+        'no_conformes': np.array([0, 1, 2, 1, 0], dtype=np.int16),
+    }
+    resumen = resumen_por_segundo(columnas)
+    assert resumen['segundo'] == [0, 1, 2] and resumen['frames'] == [2, 2, 1]
+    assert resumen['casco_ratio'] == [1.0, 0.5, 1.0]
+    assert resumen['safe_ratio'] == [0.5, 0.0, 1.0]
+    assert resumen['personas_media'] == [1.0, 2.0, 3.0]
+    assert resumen['no_conformes_max'] == [1, 2, 0]
+
+
+def test_expandir_rutas(tmp_path):
+    (tmp_path / 'b.mp4').write_bytes(b'')
+    (tmp_path / 'a.MOV').write_bytes(b'')
+    (tmp_path / 'notas.txt').write_text('x')
+    videos = GestorTrabajos.expandir_rutas([str(tmp_path), str(tmp_path / 'no_existe.mp4')])
+    assert [v.rsplit('/', 1)[1] for v in videos] == ['a.MOV', 'b.mp4']
+
+
+def test_importar_app_no_arranca_el_servidor(aplicacion):
+    # Los procesos 'spawn' de los pools reimportan app.py: no deben crear hilos ni registros
+    assert not aplicacion.iniciado_al_importar
+    assert aplicacion.hilos_al_importar == set()
+
+
+def test_jobs_solo_acepta_rutas_de_la_carpeta_de_entrada(aplicacion, tmp_path, monkeypatch):
+    entrada = tmp_path / 'entrada'
+    entrada.mkdir()
+    (entrada / 'obra.mp4').write_bytes(b'')
+    (tmp_path / 'secreto.mp4').write_bytes(b'')
+    enviados = []
+
+    class Trabajo:
+        id = 'prueba'
+
+    def enviar(rutas, **parametros):
+        enviados.append(rutas)
+        trabajo = Trabajo()
+        trabajo.rutas = rutas
+        return trabajo
+
+    monkeypatch.setitem(aplicacion.app.config, 'JOBS_INPUT_FOLDER', str(entrada))
+    monkeypatch.setattr(aplicacion.gestor_trabajos, 'enviar', enviar)
+    cliente = aplicacion.app.test_client()
+
+    for cuerpo in ({'path': str(tmp_path / 'secreto.mp4')}, {'path': str(entrada / '..' / 'secreto.mp4')},
+                   {'paths': [str(entrada), '/etc']}):
+        respuesta = cliente.post('/jobs', json=cuerpo)
+        assert respuesta.status_code == 400 and not respuesta.get_json()['success']
+    assert enviados == []
+
+    # Un solo string en 'paths' es una ruta, no una lista de caracteres (JSON y formulario)
+    assert cliente.post('/jobs', json={'paths': str(entrada / 'obra.mp4')}).get_json()['success']
+    assert cliente.post('/jobs', data={'paths': [str(entrada), str(entrada / 'obra.mp4')]}).get_json()['success']
+    assert enviados == [[str(entrada / 'obra.mp4')], [str(entrada), str(entrada / 'obra.mp4')]]
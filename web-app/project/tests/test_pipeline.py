@@ -0,0 +1,60 @@
+"""FramePipeline: al agotarse la fuente se publica lo pendiente; stop() descarta"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from pipeline import FIN, FramePipeline, LatestQueue
+
+
+def test_latest_queue_entrega_lo_pendiente_y_despues_fin():
+    cola = LatestQueue(1)
+    cola.put(1)
+    cola.put(2)  # Reemplaza al 1
+    cola.finish()
+    assert cola.get(timeout=0.1) == 2
+    assert cola.get(timeout=0.1) is FIN
+    cola.close()
+    assert cola.get(timeout=0.1) is None
+
+
+@pytest.mark.parametrize('despacho', [False, True])
+def test_fin_de_fuente_publica_el_ultimo_frame(despacho):
+    frames = iter([np.full((8, 8, 3), i, np.uint8) for i in range(5)])
+    publicados = []
+
+    def inferir(frame):
+        time.sleep(0.05)  # Más lento que la captura: la fuente se agota con frames en tránsito
+        return frame, int(frame[0, 0, 0])
+
+    with ThreadPoolExecutor(2) as executor:
+        pipeline = FramePipeline(lambda: next(frames, None), inferir, lambda frame, inferencia: frame,
+                                 lambda frame, jpeg, paquete: publicados.append(paquete.inferencia),
+                                 despachar=(lambda frame: executor.submit(inferir, frame)) if despacho else None,
+                                 completar=lambda frame, futuro: futuro.result(), en_vuelo=2)
+        pipeline.run()
+    assert publicados and publicados[-1] == 4
+    assert publicados == sorted(publicados)
+
+
+def test_detener_no_espera_a_las_etapas():
+    parar = threading.Event()
+    publicados = []
+
+    def capturar():
+        parar.set()
+        return np.zeros((8, 8, 3), np.uint8)
+
+    def inferir(frame):
+        time.sleep(0.3)
+        return frame, None
+
+    pipeline = FramePipeline(capturar, inferir, lambda frame, inferencia: frame,
+                             lambda frame, jpeg, paquete: publicados.append(paquete),
+                             keep_running=lambda: not parar.is_set())
+    t0 = time.perf_counter()
+    pipeline.run()
+    assert time.perf_counter() - t0 < 1.0
+    assert publicados == []
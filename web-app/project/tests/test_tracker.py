@@ -0,0 +1,64 @@
+"""SeguidorPersonas: ids estables entre frames y calendario de reconocimiento"""
+import numpy as np
+
+from tracker import SeguidorPersonas, iou_matriz
+
+
+def test_iou_matriz():
+    a = np.array([[0, 0, 10, 10]])
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    assert np.allclose(iou_matriz(a, b), [[1.0, 50 / 150, 0.0]])
+
+
+def test_ids_estables_con_movimiento_y_orden_cambiante():
+    seguidor = SeguidorPersonas()
+    ids = {}
+    for t in range(30):
+        izquierda = [10 + 3 * t, 100, 90 + 3 * t, 300]
+        derecha = [400 - 2 * t, 120, 480 - 2 * t, 320]
+        cajas = [izquierda, derecha] if t % 2 else [derecha, izquierda]
+        pistas = seguidor.actualizar(cajas)
+        por_lado = dict(zip(('izquierda', 'derecha') if t % 2 else ('derecha', 'izquierda'), pistas))
+        for lado, pista in por_lado.items():
+            assert ids.setdefault(lado, pista.id) == pista.id
+    assert ids['izquierda'] != ids['derecha']
+    assert len(seguidor.pistas) == 2
+
+
+def test_movimiento_rapido_se_asocia_por_centroide():
+    seguidor = SeguidorPersonas()
+    primera = seguidor.actualizar([[100, 100, 200, 300]])[0]
+    # IoU 0.14 (< umbral_iou) pero centro a 0.45 diagonales de la caja anterior
+    segunda = seguidor.actualizar([[160, 180, 260, 380]])[0]
+    assert segunda is primera
+
+
+def test_pista_perdida_se_descarta_y_vuelve_con_otro_id():
+    seguidor = SeguidorPersonas(max_perdidos=3)
+    pista = seguidor.actualizar([[0, 0, 50, 100]])[0]
+    for _ in range(2):
+        seguidor.actualizar([])
+    assert seguidor.actualizar([[2, 0, 52, 100]])[0] is pista  # Breve oclusión: misma pista
+    for _ in range(4):
+        seguidor.actualizar([])
+    assert seguidor.actualizar([[2, 0, 52, 100]])[0].id != pista.id
+
+
+def test_reconocer_una_vez_por_pista():
+    seguidor = SeguidorPersonas(revalidar_cada=5, reintentar_cada=2)
+    caja = [[0, 0, 50, 100]]
+    pista = seguidor.actualizar(caja)[0]
+    assert seguidor.necesita_reconocimiento(pista)
+    seguidor.marcar_intento(pista)
+    seguidor.actualizar(caja)
+    assert not seguidor.necesita_reconocimiento(pista)
+    seguidor.actualizar(caja)
+    assert seguidor.necesita_reconocimiento(pista)  # Sin identidad: reintento cada 2 frames
+
+    seguidor.marcar_intento(pista)
+    seguidor.asignar_identidad(pista, 'Fabricio', 0.3)
+    pendientes = 0
+    for _ in range(5):
+        seguidor.actualizar(caja)
+        pendientes += seguidor.necesita_reconocimiento(pista)
+    assert pendientes == 1 and pista.etiqueta == f'#{pista.id} Fabricio'
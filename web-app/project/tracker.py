@@ -0,0 +1,140 @@
+"""Seguimiento de personas entre frames (IoU / centroides) con identidad en caché por pista"""
+import numpy as np
+
+
+def iou_matriz(a, b):
+    """IoU entre cada caja de a (N, 4) y cada caja de b (M, 4) en formato xyxy -> (N, M)"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def asociacion_voraz(puntaje, umbral, mayor_es_mejor=True):
+    """Empareja filas y columnas de mejor a peor puntaje; devuelve [(fila, columna)]"""
+    if puntaje.size == 0:
+        return []
+    orden = np.argsort(-puntaje if mayor_es_mejor else puntaje, axis=None)
+    filas, columnas = np.unravel_index(orden, puntaje.shape)
+    valores = puntaje[filas, columnas]
+    validos = valores >= umbral if mayor_es_mejor else valores <= umbral
+    usadas_f, usadas_c, pares = set(), set(), []
+    for f, c in zip(filas[validos].tolist(), columnas[validos].tolist()):
+        if f not in usadas_f and c not in usadas_c:
+            usadas_f.add(f)
+            usadas_c.add(c)
+            pares.append((f, c))
+    return pares
+
+
+class Pista:
+    """Persona seguida: caja actual e identidad reconocida (si la hay)"""
+    __slots__ = ('id', 'caja', 'ultimo_frame', 'nombre', 'distancia', 'frame_reconocido')
+
+    def __init__(self, pista_id, caja, frame):
+        self.id = pista_id
+        self.caja = caja
+        self.ultimo_frame = frame
+        self.nombre = None
+        self.distancia = None
+        self.frame_reconocido = None
+
+    @property
+    def etiqueta(self):
+        return f"#{self.id} {self.nombre or 'Desconocido'}"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'box': [round(float(v), 1) for v in self.caja],
+            'nombre': self.nombre,
+            'distancia': round(self.distancia, 3) if self.distancia is not None else None
+        }
+
+
+class SeguidorPersonas:
+    """Asigna ids estables a las cajas 'persona' y decide cuándo volver a reconocer.
+
+    Una pista sin identidad se reintenta cada `reintentar_cada` frames; una pista
+    ya reconocida solo se revalida cada `revalidar_cada` frames. Las pistas que
+    no aparecen durante `max_perdidos` frames se descartan.
+    """
+
+    def __init__(self, umbral_iou=0.3, distancia_centroide=0.5, max_perdidos=15,
+                 revalidar_cada=150, reintentar_cada=10):
+        self.umbral_iou = umbral_iou
+        self.distancia_centroide = distancia_centroide  # Relativa a la diagonal de la caja
+        self.max_perdidos = max_perdidos
+        self.revalidar_cada = revalidar_cada
+        self.reintentar_cada = reintentar_cada
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.pistas = []
+        self.frame = 0
+        self._siguiente_id = 1
+        self.reconocimientos = 0
+
+    def actualizar(self, cajas):
+        """Asocia las cajas del frame a las pistas existentes; devuelve las pistas en el orden de cajas"""
+        self.frame += 1
+        cajas = np.asarray(cajas, dtype=np.float32).reshape(-1, 4)
+        asignadas = [None] * len(cajas)
+
+        if self.pistas and len(cajas):
+            previas = np.stack([p.caja for p in self.pistas])
+            pares = asociacion_voraz(iou_matriz(previas, cajas), self.umbral_iou)
+            for f, c in pares:
+                asignadas[c] = self.pistas[f]
+
+            # Segunda pasada por cercanía de centroides para movimientos rápidos (IoU bajo)
+            libres_p = [i for i, p in enumerate(self.pistas) if p not in asignadas]
+            libres_c = [i for i, a in enumerate(asignadas) if a is None]
+            if libres_p and libres_c:
+                cp = (previas[libres_p, :2] + previas[libres_p, 2:]) / 2
+                cc = (cajas[libres_c, :2] + cajas[libres_c, 2:]) / 2
+                diag = np.linalg.norm(previas[libres_p, 2:] - previas[libres_p, :2], axis=1)
+                dist = np.linalg.norm(cp[:, None, :] - cc[None, :, :], axis=2) / np.maximum(diag[:, None], 1.0)
+                for f, c in asociacion_voraz(dist, self.distancia_centroide, mayor_es_mejor=False):
+                    asignadas[libres_c[c]] = self.pistas[libres_p[f]]
+
+        for i, caja in enumerate(cajas):
+            pista = asignadas[i]
+            if pista is None:
+                pista = Pista(self._siguiente_id, caja, self.frame)
+                self._siguiente_id += 1
+                self.pistas.append(pista)
+                asignadas[i] = pista
+            pista.caja = caja
+            pista.ultimo_frame = self.frame
+
+        self.pistas = [p for p in self.pistas if self.frame - p.ultimo_frame <= self.max_perdidos]
+        return asignadas
+
+    def necesita_reconocimiento(self, pista):
+        if pista.frame_reconocido is None:
+            return True
+        intervalo = self.revalidar_cada if pista.nombre else self.reintentar_cada
+        return self.frame - pista.frame_reconocido >= intervalo
+
+    def marcar_intento(self, pista):
+        pista.frame_reconocido = self.frame
+        self.reconocimientos += 1
+
+    def asignar_identidad(self, pista, nombre, distancia):
+        pista.nombre = nombre
+        pista.distancia = distancia
+
+    def estadisticas(self):
+        return {
+            'frames': self.frame,
+            'reconocimientos': self.reconocimientos,
+            'pistas': [p.to_dict() for p in self.pistas]
+        }